@@ -143,7 +143,7 @@ function App() {
 
   const fetchHistory = async () => {
     try {
-      let url = `${API_URL}/api/history?limit=50`
+      let url = `${API_URL}/api/history?limit=50&fields=summary`
       if (searchTerm) url += `&team=${encodeURIComponent(searchTerm)}`
       if (filterWon !== null) url += `&won=${filterWon}`
       
@@ -0,0 +1,743 @@
+"""Vectorized batch engine for FootballMatchSimulator.
+
+Every match keeps its own random streams, the main stream and the player
+substream, seeded exactly like the scalar simulator's generators
+(`random.Random` Mersenne Twisters, NumPy PCG64/Philox generators or
+counter-based SHA-256 streams), so
+a batch run reproduces the scalar simulator's event timeline for the same
+seed and backend, player picks included. The streams are advanced in
+lockstep with NumPy and results are returned in struct-of-arrays form.
+"""
+import random
+from typing import Dict, List, Optional, Sequence, Union
+
+import numpy as np
+
+from app.event_codec import (
+    KIND_BUILDUP_ATTACK, KIND_BUILDUP_PASS, KIND_CORNER, KIND_EVENT_TYPES, KIND_FOUL, KIND_FULLTIME,
+    KIND_GOAL, KIND_GOAL_SHOT, KIND_HALFTIME, KIND_KICKOFF, KIND_OFFSIDE, KIND_PASS, KIND_SAVE, KIND_SHOT,
+    TEAM_AWAY, TEAM_HOME, TEAM_NONE, render_events
+)
+from app.match_simulator import (
+    _OPPONENT_STATS_BY_EVENT_TYPE, _TEAM_STATS_BY_EVENT_TYPE, DEFAULT_EVENT_RATE, DEFAULT_GOAL_SCHEDULE,
+    DEFAULT_TIMELINE, FULLTIME_MINUTE, GOAL_MINUTES, HALF_NAMES, HALFTIME_MINUTE, POSSESSION_EVENT_TYPES,
+    REGULAR_EVENT_CHOICES, REGULAR_EVENT_SAMPLER, STAT_NAMES, event_gap_table, format_match_stats, validate_engine
+)
+from app.models import EventType, MatchEvent, ScoreProbability
+from app.rng_engine import (
+    DEFAULT_RNG_BACKEND, PLAYER_STREAM, ProbabilityEngine, make_random, new_seed, substream_seed
+)
+
+
+_MT_N = 624
+_MT_M = 397
+_MASK_32 = 0xFFFFFFFF
+
+_FIRST_GOAL_MINUTE = GOAL_MINUTES[0]
+_GOAL_MINUTE_SLOTS = len(GOAL_MINUTES)
+
+_REGULAR_KINDS = np.array([KIND_PASS, KIND_SHOT, KIND_CORNER, KIND_FOUL, KIND_OFFSIDE, KIND_SAVE], dtype=np.uint8)
+_REGULAR_WEIGHT_TOTAL = REGULAR_EVENT_SAMPLER.total
+_REGULAR_CUMULATIVE = np.array(REGULAR_EVENT_SAMPLER.cumulative)
+
+# Player numbers drawn by `_get_random_player`: forwards + midfielders are
+# players 1-7, midfielders 4-7.
+_POSITION_POOLS = {"forward": (1, 7), "midfielder": (4, 4)}
+_REGULAR_POOL_START = np.array(
+    [_POSITION_POOLS[choice[2] if len(choice) > 2 else "midfielder"][0] for choice, _ in REGULAR_EVENT_CHOICES]
+)
+_REGULAR_POOL_SIZE = np.array(
+    [_POSITION_POOLS[choice[2] if len(choice) > 2 else "midfielder"][1] for choice, _ in REGULAR_EVENT_CHOICES]
+)
+
+
+def _kind_mask(*event_types: EventType) -> np.ndarray:
+    return np.array([event_type in event_types for event_type in KIND_EVENT_TYPES])
+
+
+_TEAM_STAT_KINDS = {
+    stat: _kind_mask(*[event_type for event_type, stats in _TEAM_STATS_BY_EVENT_TYPE.items() if stat in stats])
+    for stat in STAT_NAMES
+}
+_OPPONENT_STAT_KINDS = {
+    stat: _kind_mask(*[event_type for event_type, stats in _OPPONENT_STATS_BY_EVENT_TYPE.items() if stat in stats])
+    for stat in STAT_NAMES
+}
+_POSSESSION_KINDS = _kind_mask(*POSSESSION_EVENT_TYPES)
+
+
+def _init_genrand(seed: int) -> List[int]:
+    mt = [seed]
+    for i in range(1, _MT_N):
+        mt.append((1812433253 * (mt[i - 1] ^ (mt[i - 1] >> 30)) + i) & _MASK_32)
+    return mt
+
+
+_INIT_BY_ARRAY_BASE = np.array(_init_genrand(19650218), dtype=np.uint32)
+
+
+def _key_words(seed: int) -> List[int]:
+    """init_by_array key CPython derives from an int seed: 32-bit words of abs(seed)."""
+    seed = abs(seed)
+    words = [(seed >> shift) & _MASK_32 for shift in range(0, max(seed.bit_length(), 1), 32)]
+    return words
+
+
+def _init_by_array(keys: np.ndarray) -> np.ndarray:
+    """CPython's init_by_array for many equal-length keys (key_length x n) at once.
+
+    uint32 arithmetic wraps exactly like the C code.
+    """
+    key_length, n = keys.shape
+    mt = np.repeat(_INIT_BY_ARRAY_BASE[:, None], n, axis=1)
+    scratch = np.empty(n, dtype=np.uint32)
+
+    def mix_previous(i, multiplier):
+        np.right_shift(mt[i - 1], 30, out=scratch)
+        np.bitwise_xor(scratch, mt[i - 1], out=scratch)
+        np.multiply(scratch, np.uint32(multiplier), out=scratch)
+        np.bitwise_xor(mt[i], scratch, out=mt[i])
+
+    i, j = 1, 0
+    for _ in range(max(_MT_N, key_length)):
+        mix_previous(i, 1664525)
+        np.add(mt[i], keys[j], out=mt[i])
+        np.add(mt[i], np.uint32(j), out=mt[i])
+        i += 1
+        j += 1
+        if i >= _MT_N:
+            mt[0] = mt[_MT_N - 1]
+            i = 1
+        if j >= key_length:
+            j = 0
+    for _ in range(_MT_N - 1):
+        mix_previous(i, 1566083941)
+        np.subtract(mt[i], np.uint32(i), out=mt[i])
+        i += 1
+        if i >= _MT_N:
+            mt[0] = mt[_MT_N - 1]
+            i = 1
+    mt[0] = 0x80000000
+    return mt
+
+
+def _seed_states(seeds: Sequence[int]) -> np.ndarray:
+    """MT19937 states (624 x n) matching `random.Random(seed)` for each seed."""
+    state = np.empty((_MT_N, len(seeds)), dtype=np.uint32)
+
+    by_length: Dict[int, List[int]] = {}
+    keys = [_key_words(seed) for seed in seeds]
+    for i, key in enumerate(keys):
+        by_length.setdefault(len(key), []).append(i)
+
+    for key_length, members in by_length.items():
+        if key_length > _MT_N:
+            for i in members:
+                state[:, i] = random.Random(seeds[i]).getstate()[1][:_MT_N]
+        else:
+            key = np.array([keys[i] for i in members], dtype=np.uint32).T
+            state[:, members] = _init_by_array(key)
+
+    return state
+
+
+def _mix(current: np.ndarray, following: np.ndarray, far: np.ndarray) -> np.ndarray:
+    y = (current & np.uint32(0x80000000)) | (following & np.uint32(0x7FFFFFFF))
+    return far ^ (y >> 1) ^ ((y & 1) * np.uint32(0x9908B0DF))
+
+
+def _twist(mt: np.ndarray):
+    split = _MT_N - _MT_M
+    mt[:split] = _mix(mt[:split], mt[1:split + 1], mt[_MT_M:])
+    mt[split:2 * split] = _mix(mt[split:2 * split], mt[split + 1:2 * split + 1], mt[:split])
+    mt[2 * split:_MT_N - 1] = _mix(mt[2 * split:_MT_N - 1], mt[2 * split + 1:], mt[split:_MT_M - 1])
+    mt[_MT_N - 1] = _mix(mt[_MT_N - 1], mt[0], mt[_MT_M - 1])
+
+
+def _temper(mt: np.ndarray) -> np.ndarray:
+    y = mt ^ (mt >> 11)
+    y ^= (y << 7) & np.uint32(0x9D2C5680)
+    y ^= (y << 15) & np.uint32(0xEFC60000)
+    y ^= y >> 18
+    return y
+
+
+def _to_double(first: np.ndarray, second: np.ndarray) -> np.ndarray:
+    # genrand_res53: 27 + 26 bits of two consecutive outputs
+    a = (first >> 5).astype(np.float64)
+    b = (second >> 6).astype(np.float64)
+    return (a * 67108864.0 + b) * (1.0 / 9007199254740992.0)
+
+
+class MT19937Streams:
+    """Independent `random.Random`-compatible streams advanced with NumPy."""
+
+    def __init__(self, seeds: Sequence[int]):
+        self._state = _seed_states(seeds)
+        # Tempered outputs, one column per stream
+        self._words = np.empty((0, len(seeds)), dtype=np.uint32)
+        self._pos = np.zeros(len(seeds), dtype=np.intp)
+
+    def _refill(self):
+        consumed = self._pos.min()
+        _twist(self._state)
+        block = _temper(self._state)
+        if consumed < self._words.shape[0]:
+            block = np.vstack([self._words[consumed:], block])
+        self._words = block
+        self._pos -= consumed
+
+    def _take(self, rows: np.ndarray, count: int) -> np.ndarray:
+        if rows.size == 0:
+            return np.empty((0, count), dtype=np.uint32)
+        start = self._pos[rows]
+        while start.max() + count > self._words.shape[0]:
+            self._refill()
+            start = self._pos[rows]
+        self._pos[rows] = start + count
+        if count == 1:
+            return self._words[start, rows][:, None]
+        return self._words[start[:, None] + np.arange(count), rows[:, None]]
+
+    def random(self, rows: np.ndarray) -> np.ndarray:
+        words = self._take(rows, 2)
+        return _to_double(words[:, 0], words[:, 1])
+
+    def randbelow(self, rows: np.ndarray, n: int) -> np.ndarray:
+        shift = 32 - n.bit_length()
+        result = np.empty(rows.size, dtype=np.intp)
+        pending = np.arange(rows.size)
+        while pending.size:
+            values = (self._take(rows[pending], 1)[:, 0] >> shift).astype(np.intp)
+            accepted = values < n
+            result[pending[accepted]] = values[accepted]
+            pending = pending[~accepted]
+        return result
+
+
+class UniformStreams:
+    """Per-match `UniformStream` streams (NumPy or counter-based), drawn in blocks.
+
+    Matches the scalar streams draw for draw: every value is one double
+    from the stream and an int below n is floor(u * n).
+    """
+
+    BLOCK_SIZE = 256
+
+    def __init__(self, backend: str, seeds: Sequence[int], stream: int = 0):
+        self._streams = [make_random(backend, seed, stream) for seed in seeds]
+        self._values = np.empty((len(seeds), self.BLOCK_SIZE))
+        self._pos = np.full(len(seeds), self.BLOCK_SIZE, dtype=np.intp)
+
+    def random(self, rows: np.ndarray) -> np.ndarray:
+        exhausted = rows[self._pos[rows] == self.BLOCK_SIZE]
+        for row in exhausted.tolist():
+            self._values[row] = self._streams[row].random_array(self.BLOCK_SIZE)
+        self._pos[exhausted] = 0
+        values = self._values[rows, self._pos[rows]]
+        self._pos[rows] += 1
+        return values
+
+    def randbelow(self, rows: np.ndarray, n: int) -> np.ndarray:
+        return (self.random(rows) * n).astype(np.intp)
+
+
+def _streams(backend: str, seeds: Sequence[int], stream: int = 0):
+    if backend == "mt19937":
+        return MT19937Streams([substream_seed(seed, stream) if stream else seed for seed in seeds])
+    return UniformStreams(backend, seeds, stream)
+
+
+def first_draws(backend: str, seeds: Sequence[int]) -> np.ndarray:
+    """The first double of each seed's main stream, as FootballRNG(seed, backend).next_random() draws it"""
+    if backend == "mt19937":
+        # Only the first two words of the first twist are needed
+        mt = _seed_states(seeds)
+        words = _temper(_mix(mt[:2], mt[1:3], mt[_MT_M:_MT_M + 2]))
+        return _to_double(words[0], words[1])
+    return np.array([make_random(backend, seed).random() for seed in seeds])
+
+
+class BatchSimulationResult:
+    """Struct-of-arrays results for a batch of simulated matches.
+
+    Goals and events are flattened across matches; match `i` owns
+    `goal_minute[goal_offsets[i]:goal_offsets[i + 1]]` and likewise for
+    the `event_*` arrays with `event_offsets`.
+    """
+
+    def __init__(self, home_teams: List[str], away_teams: List[str], seeds: List[int],
+                 home_score: np.ndarray, away_score: np.ndarray,
+                 home_goals_target: np.ndarray, away_goals_target: np.ndarray,
+                 goal_offsets: np.ndarray, goal_minute: np.ndarray, goal_team: np.ndarray,
+                 event_offsets: np.ndarray, event_minute: np.ndarray, event_kind: np.ndarray,
+                 event_team: np.ndarray, event_player: np.ndarray):
+        self.home_teams = home_teams
+        self.away_teams = away_teams
+        self.seeds = seeds
+        self.home_score = home_score
+        self.away_score = away_score
+        self.home_goals_target = home_goals_target
+        self.away_goals_target = away_goals_target
+        self.goal_offsets = goal_offsets
+        self.goal_minute = goal_minute
+        self.goal_team = goal_team
+        self.event_offsets = event_offsets
+        self.event_minute = event_minute
+        self.event_kind = event_kind
+        self.event_team = event_team
+        self.event_player = event_player
+        self._stats = None
+
+    def __len__(self) -> int:
+        return len(self.seeds)
+
+    @property
+    def event_type(self) -> np.ndarray:
+        """Event codes indexing `list(EventType)`."""
+        codes = np.array([list(EventType).index(event_type) for event_type in KIND_EVENT_TYPES], dtype=np.uint8)
+        return codes[self.event_kind]
+
+    @property
+    def total_events(self) -> np.ndarray:
+        return np.diff(self.event_offsets)
+
+    def final_score(self, index: int) -> Dict[str, int]:
+        return {
+            self.home_teams[index]: int(self.home_score[index]),
+            self.away_teams[index]: int(self.away_score[index])
+        }
+
+    def events(self, index: int) -> List[MatchEvent]:
+        start, end = self.event_offsets[index], self.event_offsets[index + 1]
+        return [
+            MatchEvent(minute=minute, event_type=event_type, team=team, player=player, description=description)
+            for minute, event_type, team, player, description in render_events(
+                self.home_teams[index], self.away_teams[index],
+                self.event_minute[start:end].tolist(), self.event_kind[start:end].tolist(),
+                self.event_team[start:end].tolist(), self.event_player[start:end].tolist()
+            )
+        ]
+
+    def stats_arrays(self) -> Dict[str, np.ndarray]:
+        """Per-match counters keyed '<half>_<stat>_<home|away>' plus
+        '<half>_possession_home' / '<half>_possession_total', in one pass
+        over the flattened events per counter."""
+        if self._stats is None:
+            match_index = np.repeat(np.arange(len(self)), self.total_events)
+            same_team = np.array([h == a for h, a in zip(self.home_teams, self.away_teams)], dtype=bool)
+            # Stats compare team names, so identical names count for both sides
+            is_home = (self.event_team == TEAM_HOME) | ((self.event_team == TEAM_AWAY) & same_team[match_index])
+            is_away = (self.event_team == TEAM_AWAY) | ((self.event_team == TEAM_HOME) & same_team[match_index])
+            first_half = self.event_minute <= HALFTIME_MINUTE
+
+            def count(selected):
+                return np.bincount(match_index, weights=selected, minlength=len(self)).astype(np.int64)
+
+            self._stats = {}
+            for half, in_half in zip(HALF_NAMES, (first_half, ~first_half)):
+                for stat in STAT_NAMES:
+                    team_kinds = _TEAM_STAT_KINDS[stat][self.event_kind] & in_half
+                    opponent_kinds = _OPPONENT_STAT_KINDS[stat][self.event_kind] & in_half
+                    self._stats[f'{half}_{stat}_home'] = count((team_kinds & is_home) | (opponent_kinds & is_away))
+                    self._stats[f'{half}_{stat}_away'] = count((team_kinds & is_away) | (opponent_kinds & is_home))
+                possession = _POSSESSION_KINDS[self.event_kind] & in_half
+                self._stats[f'{half}_possession_home'] = count(possession & is_home)
+                self._stats[f'{half}_possession_total'] = count(possession)
+        return self._stats
+
+    def match_stats(self, index: int) -> Dict:
+        stats = self.stats_arrays()
+        halves = [
+            {
+                stat: [int(stats[f'{half}_{stat}_home'][index]), int(stats[f'{half}_{stat}_away'][index])]
+                for stat in STAT_NAMES
+            }
+            for half in HALF_NAMES
+        ]
+        possession = [
+            [int(stats[f'{half}_possession_home'][index]), int(stats[f'{half}_possession_total'][index])]
+            for half in HALF_NAMES
+        ]
+        return format_match_stats(
+            self.home_teams[index], self.away_teams[index], halves, possession,
+            int(self.home_score[index] + self.away_score[index])
+        )
+
+
+class _EventBuffer:
+    def __init__(self, n: int, capacity: int):
+        self.minute = np.zeros((n, capacity), dtype=np.int16)
+        self.kind = np.zeros((n, capacity), dtype=np.uint8)
+        self.team = np.full((n, capacity), TEAM_NONE, dtype=np.int8)
+        self.player = np.zeros((n, capacity), dtype=np.int8)
+        self.count = np.zeros(n, dtype=np.intp)
+
+    def emit(self, rows: np.ndarray, minute, kind, team=TEAM_NONE, player=0):
+        column = self.count[rows]
+        self.minute[rows, column] = minute
+        self.kind[rows, column] = kind
+        self.team[rows, column] = team
+        self.player[rows, column] = player
+        self.count[rows] = column + 1
+
+    def sort_by_minute(self):
+        """Stable per-match sort by minute, with half-time after every minute-45 event"""
+        key = self.minute.astype(np.int32) * 2 + (self.kind == KIND_HALFTIME)
+        key[np.arange(self.minute.shape[1]) >= self.count[:, None]] = np.iinfo(np.int32).max
+        order = np.argsort(key, axis=1, kind='stable')
+        for name in ('minute', 'kind', 'team', 'player'):
+            setattr(self, name, np.take_along_axis(getattr(self, name), order, axis=1))
+
+    def flatten(self):
+        keep = np.arange(self.minute.shape[1]) < self.count[:, None]
+        return (
+            self.count,
+            self.minute[keep],
+            self.kind[keep],
+            self.team[keep],
+            self.player[keep],
+        )
+
+
+class BatchMatchSimulator:
+    def __init__(self, chunk_size: int = 4096):
+        self.chunk_size = chunk_size
+
+    def simulate(
+        self,
+        score_probabilities: Union[List[ScoreProbability], List[List[ScoreProbability]]],
+        seeds: Sequence[Optional[int]],
+        volatility: Union[str, Sequence[str]] = "medium",
+        home_teams: Union[str, Sequence[str]] = "Home",
+        away_teams: Union[str, Sequence[str]] = "Away",
+        rng_backend: str = DEFAULT_RNG_BACKEND,
+        goal_schedule: str = DEFAULT_GOAL_SCHEDULE,
+        timeline: str = DEFAULT_TIMELINE,
+        event_rate: float = DEFAULT_EVENT_RATE
+    ) -> BatchSimulationResult:
+        validate_engine(goal_schedule, timeline, event_rate)
+        n = len(seeds)
+        seeds = self._resolve_seeds(seeds)
+        home_teams = [home_teams] * n if isinstance(home_teams, str) else list(home_teams)
+        away_teams = [away_teams] * n if isinstance(away_teams, str) else list(away_teams)
+        volatility = [volatility] * n if isinstance(volatility, str) else list(volatility)
+
+        if score_probabilities and isinstance(score_probabilities[0], ScoreProbability):
+            score_probabilities = [score_probabilities] * n
+
+        if not (len(home_teams) == len(away_teams) == len(volatility) == len(score_probabilities) == n):
+            raise ValueError("All per-match inputs must have the same length as seeds")
+
+        groups, distributions = self._group_distributions(score_probabilities, volatility)
+
+        parts = []
+        for start in range(0, n, self.chunk_size):
+            stop = min(start + self.chunk_size, n)
+            same_team = np.array([h == a for h, a in zip(home_teams[start:stop], away_teams[start:stop])], dtype=bool)
+            parts.append(self._simulate_chunk(
+                seeds[start:stop], groups[start:stop], distributions, same_team,
+                rng_backend, goal_schedule, timeline, event_rate
+            ))
+
+        def concat(key, dtype):
+            arrays = [part[key] for part in parts]
+            return np.concatenate(arrays) if arrays else np.empty(0, dtype=dtype)
+
+        def offsets(key):
+            return np.concatenate([[0], np.cumsum(concat(key, np.intp))]).astype(np.intp)
+
+        return BatchSimulationResult(
+            home_teams=home_teams,
+            away_teams=away_teams,
+            seeds=seeds,
+            home_score=concat('home_score', np.int16),
+            away_score=concat('away_score', np.int16),
+            home_goals_target=concat('home_goals_target', np.int16),
+            away_goals_target=concat('away_goals_target', np.int16),
+            goal_offsets=offsets('goal_count'),
+            goal_minute=concat('goal_minute', np.int16),
+            goal_team=concat('goal_team', np.int8),
+            event_offsets=offsets('event_count'),
+            event_minute=concat('event_minute', np.int16),
+            event_kind=concat('event_kind', np.uint8),
+            event_team=concat('event_team', np.int8),
+            event_player=concat('event_player', np.int8),
+        )
+
+    def _resolve_seeds(self, seeds: Sequence[Optional[int]]) -> List[int]:
+        return [seed if seed is not None else new_seed() for seed in seeds]
+
+    def _group_distributions(self, score_probabilities, volatility):
+        groups = np.empty(len(score_probabilities), dtype=np.intp)
+        distributions = []
+        group_index = {}
+
+        for i, (probabilities, vol) in enumerate(zip(score_probabilities, volatility)):
+            key = (id(probabilities), vol)
+            if key not in group_index:
+                if not probabilities:
+                    raise ValueError("score_probabilities must not be empty")
+                engine = ProbabilityEngine(rng=None, volatility=vol)
+                sampler = engine.build_score_sampler([
+                    ((sp.home_score, sp.away_score), sp.probability) for sp in probabilities
+                ])
+                group_index[key] = len(distributions)
+                distributions.append((
+                    np.array(sampler.choices, dtype=np.int16),
+                    np.array(sampler.cumulative),
+                    sampler.total
+                ))
+            groups[i] = group_index[key]
+
+        return groups, distributions
+
+    def _select_scores(self, streams: MT19937Streams, groups: np.ndarray, distributions) -> np.ndarray:
+        rows = np.arange(groups.size)
+        draws = streams.random(rows)
+        scores = np.empty((groups.size, 2), dtype=np.int16)
+
+        for group in np.unique(groups):
+            members = rows[groups == group]
+            score_table, cumulative, total = distributions[group]
+            choice = np.searchsorted(cumulative, draws[members] * total, side='left')
+            scores[members] = score_table[np.minimum(choice, len(score_table) - 1)]
+
+        return scores
+
+    def _schedule_goals(self, streams: MT19937Streams, home_target: np.ndarray, away_target: np.ndarray,
+                        goal_schedule: str):
+        total_goals = home_target + away_target
+        if total_goals.size and total_goals.max() > _GOAL_MINUTE_SLOTS:
+            raise ValueError(f"Cannot schedule more than {_GOAL_MINUTE_SLOTS} goals in a match")
+        if goal_schedule == "floyd":
+            return self._sample_goals(streams, home_target, away_target, total_goals)
+        return self._shuffle_goals(streams, home_target, away_target, total_goals)
+
+    def _shuffle_goals(self, streams: MT19937Streams, home_target: np.ndarray, away_target: np.ndarray,
+                       total_goals: np.ndarray):
+        n = home_target.size
+        rows = np.arange(n)
+        minutes = np.tile(np.arange(_FIRST_GOAL_MINUTE, _FIRST_GOAL_MINUTE + _GOAL_MINUTE_SLOTS, dtype=np.int16), (n, 1))
+        for i in range(_GOAL_MINUTE_SLOTS - 1, 0, -1):
+            j = streams.randbelow(rows, i + 1)
+            swapped = minutes[rows, j]
+            minutes[rows, j] = minutes[:, i]
+            minutes[:, i] = swapped
+
+        max_goals = int(total_goals.max()) if n else 0
+        teams = np.full((n, max_goals), TEAM_NONE, dtype=np.int8)
+        home_remaining = home_target.astype(np.intp)
+        away_remaining = away_target.astype(np.intp)
+
+        for goal in range(max_goals):
+            scheduled = goal < total_goals
+            both = np.flatnonzero(scheduled & (home_remaining > 0) & (away_remaining > 0))
+            home_side = scheduled & (away_remaining == 0)
+            home_side[both] = streams.random(both) < 0.5
+
+            teams[scheduled, goal] = np.where(home_side[scheduled], TEAM_HOME, TEAM_AWAY)
+            home_remaining -= scheduled & home_side
+            away_remaining -= scheduled & ~home_side
+
+        minutes = minutes[:, :max_goals].copy()
+        minutes[np.arange(max_goals) >= total_goals[:, None]] = np.iinfo(np.int16).max
+        order = np.argsort(minutes, axis=1, kind='stable')
+        return np.take_along_axis(minutes, order, axis=1), np.take_along_axis(teams, order, axis=1), total_goals
+
+    def _sample_goals(self, streams: MT19937Streams, home_target: np.ndarray, away_target: np.ndarray,
+                      total_goals: np.ndarray):
+        """Floyd's algorithm per match, then teams drawn in minute order"""
+        n = home_target.size
+        max_goals = int(total_goals.max()) if n else 0
+        unused = np.iinfo(np.int16).max
+        slots = np.full((n, max_goals), unused, dtype=np.int16)
+
+        for step in range(max_goals):
+            drawing = np.flatnonzero(step < total_goals)
+            # Match i draws below j + 1 for j = 85 - k_i + step
+            bound = _GOAL_MINUTE_SLOTS - total_goals[drawing] + step
+            for j in np.unique(bound).tolist():
+                rows = drawing[bound == j]
+                slot = streams.randbelow(rows, j + 1)
+                taken = (slots[rows, :step] == slot[:, None]).any(axis=1)
+                slots[rows, step] = np.where(taken, j, slot)
+
+        slots.sort(axis=1)
+        minutes = np.where(slots == unused, unused, slots + _FIRST_GOAL_MINUTE).astype(np.int16)
+
+        teams = np.full((n, max_goals), TEAM_NONE, dtype=np.int8)
+        home_remaining = home_target.astype(np.intp)
+        away_remaining = away_target.astype(np.intp)
+        for goal in range(max_goals):
+            scheduled = goal < total_goals
+            both = np.flatnonzero(scheduled & (home_remaining > 0) & (away_remaining > 0))
+            home_side = scheduled & (away_remaining == 0)
+            home_side[both] = streams.random(both) < home_remaining[both] / (home_remaining[both] + away_remaining[both])
+
+            teams[scheduled, goal] = np.where(home_side[scheduled], TEAM_HOME, TEAM_AWAY)
+            home_remaining -= scheduled & home_side
+            away_remaining -= scheduled & ~home_side
+
+        return minutes, teams, total_goals
+
+    def _emit_regular(self, streams, player_streams, events: _EventBuffer, rows: np.ndarray, minute: np.ndarray):
+        team = np.where(streams.random(rows) < 0.5, TEAM_HOME, TEAM_AWAY)
+        choice = np.searchsorted(_REGULAR_CUMULATIVE, streams.random(rows) * _REGULAR_WEIGHT_TOTAL, side='left')
+        choice = np.minimum(choice, len(_REGULAR_KINDS) - 1)
+        player = _REGULAR_POOL_START[choice]
+        pool_size = _REGULAR_POOL_SIZE[choice]
+        for size in np.unique(pool_size):
+            drawing = pool_size == size
+            player[drawing] += player_streams.randbelow(rows[drawing], int(size))
+        events.emit(rows, minute, _REGULAR_KINDS[choice], team, player)
+
+    def _play_minutes(self, streams, player_streams, events: _EventBuffer, goal_minutes: np.ndarray,
+                      goal_teams: np.ndarray, total_goals: np.ndarray, same_team: np.ndarray):
+        n = total_goals.size
+        max_goals = goal_minutes.shape[1]
+        minute = np.ones(n, dtype=np.intp)
+        goal_index = np.zeros(n, dtype=np.intp)
+        home_score = np.zeros(n, dtype=np.int16)
+        away_score = np.zeros(n, dtype=np.int16)
+
+        while True:
+            active = np.flatnonzero(minute <= 90)
+            if active.size == 0:
+                break
+
+            due = np.zeros(active.size, dtype=bool)
+            if max_goals:
+                pending = goal_index[active] < total_goals[active]
+                next_goal = np.minimum(goal_index[active], max_goals - 1)
+                due = pending & (minute[active] >= goal_minutes[active, next_goal])
+
+            scoring = active[due]
+            if scoring.size:
+                goal_minute = goal_minutes[scoring, goal_index[scoring]].astype(np.intp)
+                team = goal_teams[scoring, goal_index[scoring]]
+                player = 1 + player_streams.randbelow(scoring, 7)
+
+                events.emit(scoring, np.maximum(1, goal_minute - 2), KIND_BUILDUP_PASS, team)
+                events.emit(scoring, np.maximum(1, goal_minute - 1), KIND_BUILDUP_ATTACK, team)
+                events.emit(scoring, goal_minute, KIND_GOAL_SHOT, team, player)
+                events.emit(scoring, goal_minute, KIND_GOAL, team, player)
+
+                # Like the scalar path, goals are credited by team name
+                home_goal = (team == TEAM_HOME) | same_team[scoring]
+                home_score[scoring] += home_goal
+                away_score[scoring] += ~home_goal
+                goal_index[scoring] += 1
+                minute[scoring] = goal_minute + 1
+
+            stepping = active[~due]
+            if stepping.size:
+                regular = stepping[streams.random(stepping) < 0.3]
+                if regular.size:
+                    self._emit_regular(streams, player_streams, events, regular, minute[regular])
+
+                minute[stepping] += 1 + streams.randbelow(stepping, 3)
+
+            halftime = active[minute[active] == 45]
+            if halftime.size:
+                events.emit(halftime, 45, KIND_HALFTIME)
+                minute[halftime] = 46
+
+        return home_score, away_score, goal_index
+
+    def _play_events(self, streams, player_streams, events: _EventBuffer, goal_minutes: np.ndarray,
+                     goal_teams: np.ndarray, total_goals: np.ndarray, same_team: np.ndarray, event_rate: float):
+        """Event-driven timeline, emitted unordered and sorted by minute afterwards"""
+        n = total_goals.size
+        max_goals = goal_minutes.shape[1]
+        home_score = np.zeros(n, dtype=np.int16)
+        away_score = np.zeros(n, dtype=np.int16)
+
+        # Goal sequences; build-ups stay in the goal's half and after the previous goal
+        buildup_start = np.zeros((n, max_goals), dtype=np.intp)
+        previous_goal = np.ones(n, dtype=np.intp)
+        for goal in range(max_goals):
+            scoring = np.flatnonzero(goal < total_goals)
+            goal_minute = goal_minutes[scoring, goal].astype(np.intp)
+            earliest = np.maximum(previous_goal[scoring], np.where(goal_minute <= HALFTIME_MINUTE, 1, HALFTIME_MINUTE + 1))
+            team = goal_teams[scoring, goal]
+            player = 1 + player_streams.randbelow(scoring, 7)
+
+            buildup_start[scoring, goal] = np.maximum(earliest, goal_minute - 2)
+            events.emit(scoring, buildup_start[scoring, goal], KIND_BUILDUP_PASS, team)
+            events.emit(scoring, np.maximum(earliest, goal_minute - 1), KIND_BUILDUP_ATTACK, team)
+            events.emit(scoring, goal_minute, KIND_GOAL_SHOT, team, player)
+            events.emit(scoring, goal_minute, KIND_GOAL, team, player)
+
+            home_goal = (team == TEAM_HOME) | same_team[scoring]
+            home_score[scoring] += home_goal
+            away_score[scoring] += ~home_goal
+            previous_goal[scoring] = goal_minute
+
+        gaps = np.array(event_gap_table(event_rate))
+        minute = np.zeros(n, dtype=np.intp)
+        active = np.arange(n)
+        while True:
+            minute[active] += np.searchsorted(gaps, streams.random(active), side='right') + 1
+            active = active[minute[active] <= FULLTIME_MINUTE]
+            if active.size == 0:
+                break
+
+            # Next goal at or after the event minute; events inside its build-up are dropped
+            window = (goal_minutes[active] < minute[active, None]).sum(axis=1)
+            in_window = window < total_goals[active]
+            pending = active[in_window]
+            in_window[in_window] = buildup_start[pending, window[in_window]] <= minute[pending]
+
+            regular = active[~in_window]
+            if regular.size:
+                self._emit_regular(streams, player_streams, events, regular, minute[regular])
+
+        events.emit(np.arange(n), HALFTIME_MINUTE, KIND_HALFTIME)
+
+        return home_score, away_score, total_goals.astype(np.intp)
+
+    def _simulate_chunk(self, seeds: List[int], groups: np.ndarray, distributions, same_team: np.ndarray,
+                        rng_backend: str, goal_schedule: str, timeline: str, event_rate: float) -> Dict[str, np.ndarray]:
+        n = len(seeds)
+        streams = _streams(rng_backend, seeds)
+        player_streams = _streams(rng_backend, seeds, PLAYER_STREAM)
+
+        targets = self._select_scores(streams, groups, distributions)
+        home_target = targets[:, 0]
+        away_target = targets[:, 1]
+        goal_minutes, goal_teams, total_goals = self._schedule_goals(streams, home_target, away_target, goal_schedule)
+        max_goals = goal_minutes.shape[1]
+
+        events = _EventBuffer(n, 94 + 4 * max_goals)
+        events.emit(np.arange(n), 0, KIND_KICKOFF, TEAM_HOME)
+
+        if timeline == "events":
+            home_score, away_score, goal_index = self._play_events(
+                streams, player_streams, events, goal_minutes, goal_teams, total_goals, same_team, event_rate
+            )
+        else:
+            home_score, away_score, goal_index = self._play_minutes(
+                streams, player_streams, events, goal_minutes, goal_teams, total_goals, same_team
+            )
+
+        events.emit(np.arange(n), FULLTIME_MINUTE, KIND_FULLTIME)
+        if timeline == "events":
+            events.sort_by_minute()
+        event_count, event_minute, event_kind, event_team, event_player = events.flatten()
+
+        scored = (goal_index[:, None] > np.arange(max_goals))
+        return {
+            'home_score': home_score,
+            'away_score': away_score,
+            'home_goals_target': home_target,
+            'away_goals_target': away_target,
+            'goal_count': goal_index,
+            'goal_minute': goal_minutes[scored],
+            'goal_team': goal_teams[scored],
+            'event_count': event_count,
+            'event_minute': event_minute,
+            'event_kind': event_kind,
+            'event_team': event_team,
+            'event_player': event_player,
+        }
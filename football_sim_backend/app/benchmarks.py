@@ -0,0 +1,48 @@
+"""Micro-benchmarks of simulator hot paths: python -m app.cli benchmark-*"""
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+
+from app.batch_simulator import BatchMatchSimulator, _streams
+from app.match_simulator import GOAL_SCHEDULES, FootballMatchSimulator
+from app.rng_engine import DEFAULT_RNG_BACKEND
+
+
+def _per_match_ns(run, matches: int) -> float:
+    started = time.perf_counter_ns()
+    run()
+    return (time.perf_counter_ns() - started) / matches
+
+
+def goal_schedule_benchmark(max_goals: int = 10, matches: int = 20_000,
+                            rng_backend: str = DEFAULT_RNG_BACKEND) -> List[Dict[str, Any]]:
+    """Per-match cost of scheduling 0..max_goals goals, split evenly between
+    the teams, for every goal schedule in the scalar and batch engines"""
+    results = []
+    for goals in range(max_goals + 1):
+        home_goals, away_goals = (goals + 1) // 2, goals // 2
+        row: Dict[str, Any] = {'goals': goals}
+        for goal_schedule in GOAL_SCHEDULES:
+            simulator = FootballMatchSimulator("Home", "Away", [], seed=goals, rng_backend=rng_backend,
+                                               goal_schedule=goal_schedule)
+            simulator.home_goals_target, simulator.away_goals_target = home_goals, away_goals
+
+            def scalar():
+                for _ in range(matches):
+                    simulator._schedule_goals(goals)
+
+            row[f'{goal_schedule}_scalar_ns'] = _per_match_ns(scalar, matches)
+
+            streams = _streams(rng_backend, list(range(matches)))
+            # Seed the streams outside the timed run
+            streams.random(np.arange(matches))
+            home_target = np.full(matches, home_goals, dtype=np.int16)
+            away_target = np.full(matches, away_goals, dtype=np.int16)
+
+            def batch():
+                BatchMatchSimulator()._schedule_goals(streams, home_target, away_target, goal_schedule)
+
+            row[f'{goal_schedule}_batch_ns'] = _per_match_ns(batch, matches)
+        results.append(row)
+    return results
@@ -1,5 +1,61 @@
-from typing import Tuple, List
+from functools import lru_cache
+from typing import Any, Callable, Tuple, List
+
+import numpy as np
+
 from app.models import MarketType, BetResult, BetSelection, ScoreProbability
+from app.distribution_cache import bet_distribution_cache
+
+
+OUTCOME_CACHE_SIZE = 1024
+
+OutcomePredicate = Callable[[Any, Any], Any]
+
+
+def compile_outcome(market: MarketType, outcome: str) -> OutcomePredicate:
+    """Parse a bet outcome once into a predicate over (home_score, away_score).
+    
+    The predicate works on plain ints and elementwise on NumPy score arrays.
+    Raises ValueError for an outcome the market does not offer.
+    """
+    return _compile_outcome(market, outcome.lower())
+
+
+@lru_cache(maxsize=OUTCOME_CACHE_SIZE)
+def _compile_outcome(market: MarketType, outcome: str) -> OutcomePredicate:
+    if market == MarketType.MATCH_RESULT_1X2:
+        if outcome in ("1", "home"):
+            return lambda home, away: home > away
+        if outcome in ("x", "draw"):
+            return lambda home, away: home == away
+        if outcome in ("2", "away"):
+            return lambda home, away: home < away
+    
+    elif market == MarketType.OVER_UNDER:
+        side, _, line = outcome.partition("_")
+        try:
+            threshold = float(line)
+        except ValueError:
+            threshold = None
+        if threshold is not None and threshold == threshold:
+            if side == "over":
+                return lambda home, away: home + away > threshold
+            if side == "under":
+                return lambda home, away: home + away < threshold
+    
+    elif market == MarketType.BOTH_TEAMS_TO_SCORE:
+        if outcome == "yes":
+            return lambda home, away: (home > 0) & (away > 0)
+        if outcome == "no":
+            return lambda home, away: (home == 0) | (away == 0)
+    
+    elif market == MarketType.CORRECT_SCORE:
+        parts = outcome.split("-")
+        if len(parts) == 2 and all(part.strip().isdecimal() for part in parts):
+            expected_home, expected_away = (int(part) for part in parts)
+            return lambda home, away: (home == expected_home) & (away == expected_away)
+    
+    raise ValueError(f"Invalid outcome '{outcome}' for market {market.value}")
 
 
 class BettingEngine:
@@ -12,82 +68,86 @@ class BettingEngine:
         bet_selection: BetSelection,
         rng_value: float
     ) -> List[ScoreProbability]:
+        return self.adjust_probabilities_for_slip(score_probabilities, [bet_selection], [rng_value])
+    
+    def adjust_probabilities_for_slip(
+        self,
+        score_probabilities: List[ScoreProbability],
+        bet_slip: List[BetSelection],
+        rng_values: List[float]
+    ) -> List[ScoreProbability]:
+        """Apply every bet's win/lose adjustment to the score distribution.
+        
+        Each bet doubles the probability of the scores on the side its rng
+        value picked and halves the rest, with the boosted scores moved to
+        the front. The factors are powers of two, so all bets are applied
+        as one exponent vector and the distribution normalized once.
+        """
+        return self.adjust_probabilities_for_branches(
+            score_probabilities,
+            bet_slip,
+            [rng_value < self.win_gate(bet) for bet, rng_value in zip(bet_slip, rng_values)]
+        )
+    
+    def adjust_probabilities_for_branches(
+        self,
+        score_probabilities: List[ScoreProbability],
+        bet_slip: List[BetSelection],
+        should_win: List[bool]
+    ) -> List[ScoreProbability]:
+        """Adjusted distribution once each bet's win/lose branch is known"""
+        branches = tuple(
+            (bet.market, bet.outcome.lower(), win) for bet, win in zip(bet_slip, should_win)
+        )
+        key = (tuple((sp.home_score, sp.away_score, sp.probability) for sp in score_probabilities), branches)
+        return bet_distribution_cache.get_or_create(
+            key, lambda: self._adjust_distribution(score_probabilities, bet_slip, branches)
+        )
+    
+    def win_gate(self, bet_selection: BetSelection) -> float:
+        """A bet takes the win branch when its rng value falls below this"""
         true_odds = self._get_base_odds_for_market(bet_selection.market)
         fair_probability = 1.0 / true_odds if true_odds > 0 else 0.5
         
-        win_probability = fair_probability * self.rtp
-        
-        should_win = rng_value < win_probability
-        
-        favorable_scores = []
-        unfavorable_scores = []
+        return fair_probability * self.rtp
+    
+    def _adjust_distribution(
+        self,
+        score_probabilities: List[ScoreProbability],
+        bet_slip: List[BetSelection],
+        branches: Tuple
+    ) -> List[ScoreProbability]:
+        home = np.array([sp.home_score for sp in score_probabilities], dtype=np.int64)
+        away = np.array([sp.away_score for sp in score_probabilities], dtype=np.int64)
+        probabilities = np.array([sp.probability for sp in score_probabilities], dtype=np.float64)
         
-        for sp in score_probabilities:
-            if self._check_outcome_for_score(bet_selection, sp.home_score, sp.away_score):
-                favorable_scores.append(sp)
-            else:
-                unfavorable_scores.append(sp)
+        exponents = np.zeros(len(score_probabilities), dtype=np.int64)
+        sort_keys = []
+        for bet, (_, _, should_win) in zip(bet_slip, branches):
+            boosted = self.outcome_mask(bet, home, away) == should_win
+            # A bet with nothing on its chosen side leaves the distribution alone
+            if not boosted.any():
+                continue
+            exponents += np.where(boosted, 1, -1)
+            sort_keys.append(~boosted)
         
-        if should_win and favorable_scores:
-            total_favorable = sum(sp.probability for sp in favorable_scores)
-            total_unfavorable = sum(sp.probability for sp in unfavorable_scores)
-            
-            boost_factor = 2.0
-            adjusted = []
-            for sp in favorable_scores:
-                new_prob = sp.probability * boost_factor
-                adjusted.append(ScoreProbability(
-                    home_score=sp.home_score,
-                    away_score=sp.away_score,
-                    probability=new_prob
-                ))
-            for sp in unfavorable_scores:
-                new_prob = sp.probability * 0.5
-                adjusted.append(ScoreProbability(
-                    home_score=sp.home_score,
-                    away_score=sp.away_score,
-                    probability=new_prob
-                ))
-            
-            total = sum(sp.probability for sp in adjusted)
-            normalized = [
-                ScoreProbability(
-                    home_score=sp.home_score,
-                    away_score=sp.away_score,
-                    probability=sp.probability / total
-                ) for sp in adjusted
-            ]
-            return normalized
+        if not sort_keys:
+            return score_probabilities
         
-        elif not should_win and unfavorable_scores:
-            boost_factor = 2.0
-            adjusted = []
-            for sp in unfavorable_scores:
-                new_prob = sp.probability * boost_factor
-                adjusted.append(ScoreProbability(
-                    home_score=sp.home_score,
-                    away_score=sp.away_score,
-                    probability=new_prob
-                ))
-            for sp in favorable_scores:
-                new_prob = sp.probability * 0.5
-                adjusted.append(ScoreProbability(
-                    home_score=sp.home_score,
-                    away_score=sp.away_score,
-                    probability=new_prob
-                ))
-            
-            total = sum(sp.probability for sp in adjusted)
-            normalized = [
-                ScoreProbability(
-                    home_score=sp.home_score,
-                    away_score=sp.away_score,
-                    probability=sp.probability / total
-                ) for sp in adjusted
-            ]
-            return normalized
+        # Each adjusted bet stably moves its boosted scores to the front, so the
+        # last bet is the primary sort key
+        order = np.lexsort(sort_keys)
+        weights = np.ldexp(probabilities, exponents)[order]
+        weights /= weights.sum()
         
-        return score_probabilities
+        return [
+            ScoreProbability(home_score=h, away_score=a, probability=p)
+            for h, a, p in zip(home[order].tolist(), away[order].tolist(), weights.tolist())
+        ]
+    
+    def outcome_mask(self, bet_selection: BetSelection, home_scores: np.ndarray, away_scores: np.ndarray) -> np.ndarray:
+        """Boolean array marking the scores on which the bet's outcome occurs"""
+        return compile_outcome(bet_selection.market, bet_selection.outcome)(home_scores, away_scores)
     
     def evaluate_bet(
         self,
@@ -135,42 +195,7 @@ class BettingEngine:
         home_score: int,
         away_score: int
     ) -> bool:
-        market = bet_selection.market
-        outcome = bet_selection.outcome.lower()
-        
-        if market == MarketType.MATCH_RESULT_1X2:
-            if outcome == "1" or outcome == "home":
-                return home_score > away_score
-            elif outcome == "x" or outcome == "draw":
-                return home_score == away_score
-            elif outcome == "2" or outcome == "away":
-                return home_score < away_score
-        
-        elif market == MarketType.OVER_UNDER:
-            total_goals = home_score + away_score
-            try:
-                threshold = float(outcome.replace("over_", "").replace("under_", ""))
-                if "over" in outcome:
-                    return total_goals > threshold
-                elif "under" in outcome:
-                    return total_goals < threshold
-            except:
-                pass
-        
-        elif market == MarketType.BOTH_TEAMS_TO_SCORE:
-            if outcome == "yes":
-                return home_score > 0 and away_score > 0
-            elif outcome == "no":
-                return home_score == 0 or away_score == 0
-        
-        elif market == MarketType.CORRECT_SCORE:
-            try:
-                expected_home, expected_away = outcome.split("-")
-                return int(expected_home) == home_score and int(expected_away) == away_score
-            except:
-                pass
-        
-        return False
+        return bool(compile_outcome(bet_selection.market, bet_selection.outcome)(home_score, away_score))
     
     def _get_base_odds_for_market(
         self,
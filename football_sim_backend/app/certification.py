@@ -0,0 +1,184 @@
+"""Monte Carlo RTP certification.
+
+Runs large numbers of single-bet simulations through the same steps as
+/api/simulate (bet gates and probability adjustment, the batch engine,
+bet evaluation) on a process pool, and reports the measured RTP with a
+confidence interval per market and volatility next to the exact value
+from the expected-return calculator.
+
+Each work unit draws its 64-bit match seeds from its own spawned
+SeedSequence, so units are independent and a run is reproducible from
+its root seed regardless of the number of workers.
+"""
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from statistics import NormalDist
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.batch_simulator import BatchMatchSimulator, first_draws
+from app.betting_logic import BettingEngine, compile_outcome
+from app.determinism import DEFAULT_SCORE_PROBABILITIES, VOLATILITIES
+from app.match_simulator import SIMULATOR_SETTINGS
+from app.models import BetSelection, MarketType, MatchSimulationRequest, ScoreProbability
+from app.rtp_calculator import calculate_expected_return
+from app.simulation_service import resolve_rng_backend
+
+# Matches simulated per work unit
+CERTIFICATION_CHUNK_SIZE = 50_000
+
+CERTIFICATION_OUTCOMES = {
+    MarketType.MATCH_RESULT_1X2: ["1", "X", "2"],
+    MarketType.OVER_UNDER: ["over_1.5", "under_1.5", "over_2.5", "under_2.5", "over_3.5", "under_3.5"],
+    MarketType.BOTH_TEAMS_TO_SCORE: ["yes", "no"],
+    MarketType.CORRECT_SCORE: ["0-0", "1-0", "0-1", "1-1", "2-0", "0-2", "2-1", "1-2"],
+}
+
+Unit = Tuple[MarketType, str, str, int]
+
+
+def _bet(engine: BettingEngine, market: MarketType, outcome: str) -> BetSelection:
+    # Unit stake at the market's fair odds, so payout / stake is the RTP
+    return BetSelection(market=market, outcome=outcome, stake=1.0, odds=engine._get_base_odds_for_market(market))
+
+
+def _run_unit(unit: Unit, seed_sequence: np.random.SeedSequence, score_probabilities: List[ScoreProbability],
+              rtp: float) -> Tuple[Tuple[MarketType, str], int, float, float]:
+    market, outcome, volatility, matches = unit
+    engine = BettingEngine(rtp=rtp)
+    bet = _bet(engine, market, outcome)
+    request = MatchSimulationRequest(
+        user_id="certification",
+        home_team="Home",
+        away_team="Away",
+        score_probabilities=score_probabilities,
+        bet_slip=[bet],
+        volatility=volatility
+    )
+
+    seeds = seed_sequence.generate_state(matches, np.uint64).tolist()
+    rng_backend = resolve_rng_backend(request)
+    # Same gate as adjust_probabilities: the first draw of each match's stream
+    # picks the bet's branch, and each branch's distribution is built once
+    should_win = first_draws(rng_backend, seeds) < engine.win_gate(bet)
+    branches = [
+        engine.adjust_probabilities_for_branches(request.score_probabilities, request.bet_slip, [win])
+        for win in (False, True)
+    ]
+    batch = BatchMatchSimulator().simulate(
+        score_probabilities=[branches[win] for win in should_win.tolist()],
+        seeds=seeds,
+        volatility=volatility,
+        home_teams=request.home_team,
+        away_teams=request.away_team,
+        rng_backend=rng_backend,
+        **SIMULATOR_SETTINGS
+    )
+
+    wins = int(np.count_nonzero(compile_outcome(market, outcome)(batch.home_score, batch.away_score)))
+    return (market, volatility), matches, bet.odds * wins, bet.odds ** 2 * wins
+
+
+def _units(matches: int) -> List[Unit]:
+    cells = [(market, volatility) for market in CERTIFICATION_OUTCOMES for volatility in VOLATILITIES]
+    per_cell = max(matches // len(cells), 1)
+    units = []
+    for market, volatility in cells:
+        outcomes = CERTIFICATION_OUTCOMES[market]
+        for i, outcome in enumerate(outcomes):
+            remaining = per_cell // len(outcomes) + (i < per_cell % len(outcomes))
+            while remaining > 0:
+                count = min(remaining, CERTIFICATION_CHUNK_SIZE)
+                units.append((market, outcome, volatility, count))
+                remaining -= count
+    return units
+
+
+def certify_rtp(matches: int, rtp: float, score_probabilities: Optional[List[ScoreProbability]] = None,
+                workers: Optional[int] = None, seed: int = 0, confidence: float = 0.95,
+                progress: Optional[Callable[[int, int], None]] = None) -> Dict[str, Any]:
+    """Simulate `matches` single-bet slips and report RTP per market and volatility.
+
+    workers=0 runs every unit in-process; None uses one worker per CPU.
+    """
+    score_probabilities = score_probabilities or DEFAULT_SCORE_PROBABILITIES
+    units = _units(matches)
+    seed_sequences = np.random.SeedSequence(seed).spawn(len(units))
+
+    totals: Dict[Tuple[MarketType, str], List[float]] = {}
+    simulated = 0
+
+    def add(result):
+        nonlocal simulated
+        cell, count, payout, payout_squared = result
+        cell_totals = totals.setdefault(cell, [0, 0.0, 0.0])
+        cell_totals[0] += count
+        cell_totals[1] += payout
+        cell_totals[2] += payout_squared
+        simulated += count
+        if progress:
+            progress(simulated, matches)
+
+    if workers == 0:
+        for unit, seed_sequence in zip(units, seed_sequences):
+            add(_run_unit(unit, seed_sequence, score_probabilities, rtp))
+    else:
+        # spawn keeps children clear of any threads in the calling process
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count(),
+                                 mp_context=multiprocessing.get_context("spawn")) as pool:
+            futures = [
+                pool.submit(_run_unit, unit, seed_sequence, score_probabilities, rtp)
+                for unit, seed_sequence in zip(units, seed_sequences)
+            ]
+            for future in as_completed(futures):
+                add(future.result())
+
+    expected = _expected_rtp(units, score_probabilities, rtp)
+    z = NormalDist().inv_cdf((1 + confidence) / 2)
+
+    results = []
+    for (market, volatility), (count, payout, payout_squared) in totals.items():
+        measured = payout / count
+        variance = max(payout_squared / count - measured ** 2, 0.0)
+        margin = z * (variance / count) ** 0.5
+        results.append({
+            'market': market.value,
+            'volatility': volatility,
+            'matches': count,
+            'rtp': measured,
+            'ci_low': measured - margin,
+            'ci_high': measured + margin,
+            'expected_rtp': expected[(market, volatility)],
+            'within_ci': abs(expected[(market, volatility)] - measured) <= margin
+        })
+
+    results.sort(key=lambda row: (row['market'], VOLATILITIES.index(row['volatility'])))
+    return {
+        'configured_rtp': rtp,
+        'matches': simulated,
+        'confidence': confidence,
+        'seed': seed,
+        'results': results
+    }
+
+
+def _expected_rtp(units: List[Unit], score_probabilities: List[ScoreProbability],
+                  rtp: float) -> Dict[Tuple[MarketType, str], float]:
+    """Match-weighted exact RTP of each cell's outcomes"""
+    engine = BettingEngine(rtp=rtp)
+    weighted: Dict[Tuple[MarketType, str], List[float]] = {}
+    exact: Dict[Tuple[MarketType, str, str], float] = {}
+
+    for market, outcome, volatility, count in units:
+        key = (market, outcome, volatility)
+        if key not in exact:
+            exact[key] = calculate_expected_return(
+                score_probabilities, [_bet(engine, market, outcome)], rtp, volatility
+            )['effective_rtp']
+        cell = weighted.setdefault((market, volatility), [0.0, 0])
+        cell[0] += exact[key] * count
+        cell[1] += count
+
+    return {cell: total / count for cell, (total, count) in weighted.items()}
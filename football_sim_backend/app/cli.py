@@ -0,0 +1,179 @@
+"""Maintenance commands: python -m app.cli <command>"""
+import argparse
+import sys
+import time
+
+from app import database
+from app.benchmarks import goal_schedule_benchmark
+from app.certification import certify_rtp
+from app.determinism import check_determinism
+from app.match_simulator import DEFAULT_EVENT_RATE, DEFAULT_GOAL_SCHEDULE, DEFAULT_TIMELINE, GOAL_SCHEDULES, TIMELINES
+from app.rng_engine import DEFAULT_RNG_BACKEND, RNG_BACKENDS
+from app.write_behind import WRITE_BEHIND_DEAD_LETTER_PATH, retry_dead_letters
+
+
+def rebuild_rollups(args: argparse.Namespace):
+    players = database.rebuild_rollups()
+    print(f"Rebuilt rollups for {players} players")
+
+
+def compact_events(args: argparse.Namespace):
+    result = database.compact_events(batch_size=args.batch_size, dry_run=args.dry_run)
+    verb = "Would compact" if args.dry_run else "Compacted"
+    print(f"{verb} {result['rows_compacted']} of {result['rows_scanned']} JSON timelines "
+          f"({result['rows_skipped']} left as JSON)")
+    if result['binary_bytes']:
+        print(f"{result['json_bytes']} bytes -> {result['binary_bytes']} bytes "
+              f"(compression ratio {result['compression_ratio']}x)")
+    if args.vacuum and not args.dry_run:
+        database.vacuum()
+        print("Vacuumed database")
+
+
+def retry_dead_letter_file(args: argparse.Namespace):
+    inserted = retry_dead_letters(args.path)
+    print(f"Inserted {inserted} dead-lettered simulations from {args.path}")
+
+
+def verify_replays(args: argparse.Namespace):
+    result = database.verify_replays(sample_size=args.sample)
+    for mismatch in result['mismatches']:
+        print(f"Mismatch: {mismatch}")
+    print(f"Replayed {result['checked']} seed-only simulations, {result['mismatched']} mismatched")
+    if result['mismatched']:
+        sys.exit(1)
+
+
+def verify_fairness(args: argparse.Namespace):
+    result = database.verify_fairness(sample_size=args.sample)
+    for mismatch in result['mismatches']:
+        print(f"Mismatch: {mismatch}")
+    print(f"Verified {result['checked']} provably-fair simulations, {result['mismatched']} mismatched "
+          f"({result['unrevealed']} await their server seed reveal)")
+    if result['mismatched']:
+        sys.exit(1)
+
+
+def verify_determinism(args: argparse.Namespace):
+    result = check_determinism(
+        range(args.start, args.start + args.seeds), rng_backend=args.rng, goal_schedule=args.goal_schedule,
+        timeline=args.timeline, event_rate=args.event_rate
+    )
+    for mismatch in result['mismatches']:
+        print(f"Mismatch: {mismatch}")
+    print(f"Checked {result['checked']} seeds, {result['mismatched']} not deterministic")
+    if result['mismatched']:
+        sys.exit(1)
+
+
+def certify(args: argparse.Namespace):
+    started = time.perf_counter()
+    reported = [0]
+
+    def progress(simulated: int, total: int):
+        if simulated * 10 // total > reported[0]:
+            reported[0] = simulated * 10 // total
+            print(f"  {simulated}/{total} matches", file=sys.stderr)
+
+    result = certify_rtp(
+        matches=args.matches, rtp=args.rtp, workers=args.workers, seed=args.seed,
+        confidence=args.confidence, progress=progress
+    )
+    elapsed = time.perf_counter() - started
+
+    print(f"{'market':<22}{'volatility':<12}{'matches':>10}{'rtp':>10}  {int(args.confidence * 100)}% CI{'':<14}{'exact':>8}")
+    for row in result['results']:
+        flag = "" if row['within_ci'] else "  outside CI"
+        print(f"{row['market']:<22}{row['volatility']:<12}{row['matches']:>10}{row['rtp']:>10.4f}  "
+              f"[{row['ci_low']:.4f}, {row['ci_high']:.4f}]{row['expected_rtp']:>10.4f}{flag}")
+    print(f"Simulated {result['matches']} matches at configured RTP {args.rtp} in {elapsed:.1f}s "
+          f"({result['matches'] / elapsed:.0f} matches/s)")
+
+
+def benchmark_goal_schedule(args: argparse.Namespace):
+    rows = goal_schedule_benchmark(max_goals=args.max_goals, matches=args.matches, rng_backend=args.rng)
+    columns = [f'{schedule}_{engine}_ns' for schedule in GOAL_SCHEDULES for engine in ("scalar", "batch")]
+    print(f"{'goals':>5}" + "".join(f"{column:>20}" for column in columns))
+    for row in rows:
+        print(f"{row['goals']:>5}" + "".join(f"{row[column]:>20.0f}" for column in columns))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description=__doc__)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    subparsers.add_parser(
+        "rebuild-rollups",
+        help="Recompute the player and global stats rollups from raw simulation history"
+    ).set_defaults(func=rebuild_rollups)
+
+    compact = subparsers.add_parser(
+        "compact-events",
+        help="Re-encode stored JSON event timelines in the compact binary format"
+    )
+    compact.add_argument("--batch-size", type=int, default=500, help="Rows re-encoded per transaction")
+    compact.add_argument("--dry-run", action="store_true", help="Report the compression ratio without writing")
+    compact.add_argument("--vacuum", action="store_true", help="VACUUM afterwards to return freed space to the filesystem")
+    compact.set_defaults(func=compact_events)
+
+    dead_letters = subparsers.add_parser(
+        "retry-dead-letters",
+        help="Insert simulations the write-behind queue could not save"
+    )
+    dead_letters.add_argument("--path", default=WRITE_BEHIND_DEAD_LETTER_PATH, help="Dead-letter file")
+    dead_letters.set_defaults(func=retry_dead_letter_file)
+
+    verify = subparsers.add_parser(
+        "verify-replays",
+        help="Replay a random sample of seed-only simulations and check the recorded scores"
+    )
+    verify.add_argument("--sample", type=int, default=100, help="Number of simulations to replay")
+    verify.set_defaults(func=verify_replays)
+
+    fairness = subparsers.add_parser(
+        "verify-fairness",
+        help="Recompute the seeds of provably-fair simulations from their revealed server seeds"
+    )
+    fairness.add_argument("--sample", type=int, default=None, help="Number of simulations to check (default: all)")
+    fairness.set_defaults(func=verify_fairness)
+
+    determinism = subparsers.add_parser(
+        "verify-determinism",
+        help="Simulate a range of seeds repeatedly and with the batch engine, and compare timelines and stats"
+    )
+    determinism.add_argument("--seeds", type=int, default=5000, help="Number of seeds to check")
+    determinism.add_argument("--start", type=int, default=0, help="First seed")
+    determinism.add_argument("--rng", choices=RNG_BACKENDS, default=DEFAULT_RNG_BACKEND, help="Random generator backend")
+    determinism.add_argument("--goal-schedule", choices=GOAL_SCHEDULES, default=DEFAULT_GOAL_SCHEDULE,
+                             help="Goal minute sampler")
+    determinism.add_argument("--timeline", choices=TIMELINES, default=DEFAULT_TIMELINE, help="Timeline generator")
+    determinism.add_argument("--event-rate", type=float, default=DEFAULT_EVENT_RATE,
+                             help="Regular events per minute in the events timeline")
+    determinism.set_defaults(func=verify_determinism)
+
+    goal_benchmark = subparsers.add_parser(
+        "benchmark-goal-schedule",
+        help="Time goal scheduling per match for 0 to --max-goals goals, per goal schedule"
+    )
+    goal_benchmark.add_argument("--max-goals", type=int, default=10, help="Largest number of goals to schedule")
+    goal_benchmark.add_argument("--matches", type=int, default=20_000, help="Matches timed per goal count")
+    goal_benchmark.add_argument("--rng", choices=RNG_BACKENDS, default=DEFAULT_RNG_BACKEND, help="Random generator backend")
+    goal_benchmark.set_defaults(func=benchmark_goal_schedule)
+
+    certification = subparsers.add_parser(
+        "certify-rtp",
+        help="Measure RTP per market and volatility over many simulated single-bet slips"
+    )
+    certification.add_argument("--matches", type=int, default=1_000_000, help="Total matches to simulate")
+    certification.add_argument("--rtp", type=float, default=0.96, help="Configured RTP")
+    certification.add_argument("--workers", type=int, default=None, help="Worker processes (default: one per CPU, 0 runs in-process)")
+    certification.add_argument("--seed", type=int, default=0, help="Root seed of the match seed streams")
+    certification.add_argument("--confidence", type=float, default=0.95, help="Confidence level of the intervals")
+    certification.set_defaults(func=certify)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
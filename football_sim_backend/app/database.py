@@ -1,19 +1,92 @@
 import sqlite3
+import base64
+import difflib
 import json
+import os
+import threading
+import unicodedata
 from datetime import datetime
-from typing import List, Dict, Optional, Any
+from typing import Iterable, List, Dict, Optional, Any
 from contextlib import contextmanager
 
+from app.distribution_cache import LRUCache
+from app.event_codec import decode_events, encode_events
+from app.fairness import fair_seed, new_server_seed, server_seed_hash
+from app.match_simulator import SIMULATOR_DEFAULTS
+from app.replay import replay_inputs, replay_simulation
+
 DATABASE_PATH = "simulations.db"
 
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", 65536))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", 256 * 1024 * 1024))
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", 5000))
+# Compiled statements kept per connection, keyed by SQL text
+SQLITE_STATEMENT_CACHE = int(os.getenv("SQLITE_STATEMENT_CACHE", 256))
+# "binary" stores event timelines with app.event_codec, "json" as JSON text
+EVENT_ENCODING = os.getenv("EVENT_ENCODING", "binary")
+# "full" stores event timelines and match stats, "replay" only the simulator
+# inputs and seed, re-materializing the rest on read (see app.replay)
+SIMULATION_STORAGE = os.getenv("SIMULATION_STORAGE", "full")
+
+_local = threading.local()
+_connections_lock = threading.Lock()
+_connections: List[sqlite3.Connection] = []
+_generation = 0
+
+def normalize_team_name(name: str) -> str:
+    """Case- and width-folded team name used for team filters.
+
+    Stored names and search terms are both normalized here, in Python, so
+    the database itself never needs an application-defined function.
+    """
+    return unicodedata.normalize("NFKC", name).strip().casefold()
+
+def _connect() -> sqlite3.Connection:
+    conn = sqlite3.connect(
+        DATABASE_PATH,
+        timeout=SQLITE_BUSY_TIMEOUT_MS / 1000,
+        check_same_thread=False,
+        cached_statements=SQLITE_STATEMENT_CACHE
+    )
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+    conn.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}")
+    conn.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    return conn
+
 @contextmanager
 def get_db():
-    conn = sqlite3.connect(DATABASE_PATH)
-    conn.row_factory = sqlite3.Row
+    """Yield this thread's long-lived connection, opening it on first use"""
+    conn = getattr(_local, 'conn', None)
+    # Connections inherited across fork (e.g. gunicorn --preload) or closed
+    # by close_db_connections() are replaced
+    if conn is None or _local.key != (os.getpid(), _generation):
+        conn = _connect()
+        _local.conn = conn
+        _local.key = (os.getpid(), _generation)
+        with _connections_lock:
+            _connections.append(conn)
+    
     try:
         yield conn
     finally:
-        conn.close()
+        if conn.in_transaction:
+            conn.rollback()
+
+def close_db_connections():
+    global _generation
+    with _connections_lock:
+        _generation += 1
+        for conn in _connections:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+        _connections.clear()
 
 def init_db():
     with get_db() as conn:
@@ -39,89 +112,743 @@ def init_db():
                 bet_results TEXT NOT NULL,
                 events TEXT NOT NULL,
                 match_stats TEXT NOT NULL,
+                replay_inputs TEXT,
+                engine TEXT,
+                fairness TEXT,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             )
         """)
         
+        cursor.execute("PRAGMA table_info(simulations)")
+        columns = [column['name'] for column in cursor.fetchall()]
+        if 'replay_inputs' not in columns:
+            cursor.execute("ALTER TABLE simulations ADD COLUMN replay_inputs TEXT")
+        # Non-default simulator settings as JSON; NULL for the defaults
+        if 'engine' not in columns:
+            cursor.execute("ALTER TABLE simulations ADD COLUMN engine TEXT")
+        # Provably-fair simulations: server seed id, client seed and nonce as JSON
+        if 'fairness' not in columns:
+            cursor.execute("ALTER TABLE simulations ADD COLUMN fairness TEXT")
+        
         cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_created_at ON simulations(created_at DESC)
+            CREATE INDEX IF NOT EXISTS idx_created_at_id ON simulations(created_at DESC, id DESC)
         """)
         
+        # Composite indexes matching the /api/history filters and keyset order
         cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_home_team ON simulations(home_team)
+            CREATE INDEX IF NOT EXISTS idx_user_created ON simulations(user_id, created_at DESC, id DESC)
         """)
         
         cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_away_team ON simulations(away_team)
+            CREATE INDEX IF NOT EXISTS idx_won_created ON simulations(bet_slip_won, created_at DESC, id DESC)
         """)
         
         cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_user_id ON simulations(user_id)
+            CREATE INDEX IF NOT EXISTS idx_user_won_created ON simulations(user_id, bet_slip_won, created_at DESC, id DESC)
         """)
         
+        cursor.execute("DROP INDEX IF EXISTS idx_created_at")
+        cursor.execute("DROP INDEX IF EXISTS idx_user_id")
+        cursor.execute("DROP INDEX IF EXISTS idx_home_team")
+        cursor.execute("DROP INDEX IF EXISTS idx_away_team")
+        
+        _init_team_index(cursor)
+        _init_rollups(cursor)
+        _init_server_seeds(cursor)
+        
         conn.commit()
 
+# Distinct team names plus a (team, simulation) link table, kept current by an
+# insert trigger so team filters resolve through indexes instead of LIKE scans.
+# teams_fts is a trigram index over the normalized names for substring search.
+def _init_team_index(cursor: sqlite3.Cursor):
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'simulation_teams'")
+    needs_backfill = cursor.fetchone() is None
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'teams_fts'")
+    needs_fts_rebuild = cursor.fetchone() is None
+    
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS teams (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL UNIQUE,
+            name_norm TEXT NOT NULL
+        )
+    """)
+    
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_teams_name_norm ON teams(name_norm)
+    """)
+    
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS simulation_teams (
+            team_id INTEGER NOT NULL,
+            simulation_id INTEGER NOT NULL,
+            PRIMARY KEY (team_id, simulation_id)
+        ) WITHOUT ROWID
+    """)
+    
+    cursor.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS teams_fts USING fts5(
+            name_norm, content='teams', content_rowid='id', tokenize='trigram'
+        )
+    """)
+    
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_teams_fts_insert
+        AFTER INSERT ON teams
+        BEGIN
+            INSERT INTO teams_fts (rowid, name_norm) VALUES (NEW.id, NEW.name_norm);
+        END
+    """)
+    
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_teams_fts_update
+        AFTER UPDATE OF name_norm ON teams
+        BEGIN
+            INSERT INTO teams_fts (teams_fts, rowid, name_norm) VALUES ('delete', OLD.id, OLD.name_norm);
+            INSERT INTO teams_fts (rowid, name_norm) VALUES (NEW.id, NEW.name_norm);
+        END
+    """)
+    
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_teams_fts_delete
+        AFTER DELETE ON teams
+        BEGIN
+            INSERT INTO teams_fts (teams_fts, rowid, name_norm) VALUES ('delete', OLD.id, OLD.name_norm);
+        END
+    """)
+    
+    # The app stores each team with normalize_team_name() before inserting its
+    # simulations, so this INSERT OR IGNORE only adds names written by other
+    # tools. They get SQLite's ASCII lower() until the renormalization below.
+    cursor.execute("DROP TRIGGER IF EXISTS trg_simulations_teams")
+    cursor.execute("""
+        CREATE TRIGGER trg_simulations_teams
+        AFTER INSERT ON simulations
+        BEGIN
+            INSERT OR IGNORE INTO teams (name, name_norm)
+                VALUES (NEW.home_team, lower(trim(NEW.home_team))),
+                       (NEW.away_team, lower(trim(NEW.away_team)));
+            INSERT OR IGNORE INTO simulation_teams (team_id, simulation_id)
+                SELECT id, NEW.id FROM teams WHERE name IN (NEW.home_team, NEW.away_team);
+        END
+    """)
+    
+    if needs_backfill:
+        cursor.execute("SELECT home_team AS name FROM simulations UNION SELECT away_team FROM simulations")
+        cursor.executemany(_INSERT_TEAM, _team_rows(row['name'] for row in cursor.fetchall()))
+        cursor.execute("""
+            INSERT OR IGNORE INTO simulation_teams (team_id, simulation_id)
+            SELECT t.id, s.id FROM simulations s
+            JOIN teams t ON t.name IN (s.home_team, s.away_team)
+        """)
+    
+    if needs_fts_rebuild:
+        cursor.execute("INSERT INTO teams_fts (teams_fts) VALUES ('rebuild')")
+    
+    cursor.execute("SELECT id, name, name_norm FROM teams")
+    cursor.executemany("UPDATE teams SET name_norm = ? WHERE id = ?", [
+        (normalize_team_name(row['name']), row['id'])
+        for row in cursor.fetchall()
+        if row['name_norm'] != normalize_team_name(row['name'])
+    ])
+
+_INSERT_TEAM = "INSERT OR IGNORE INTO teams (name, name_norm) VALUES (?, ?)"
+
+def _team_rows(names: Iterable[str]) -> List[tuple]:
+    return [(name, normalize_team_name(name)) for name in set(names)]
+
+# Provably-fair server seeds. Exactly one seed is active (revealed_at IS
+# NULL); only its hash is published until it is rotated out and revealed.
+# fair_nonces hands out nonces per (server seed, client seed), so a client
+# can never replay a nonce it has already seen the outcome of.
+def _init_server_seeds(cursor: sqlite3.Cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS server_seeds (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            server_seed TEXT NOT NULL,
+            server_seed_hash TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            revealed_at TIMESTAMP
+        )
+    """)
+    
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS fair_nonces (
+            server_seed_id INTEGER NOT NULL,
+            client_seed TEXT NOT NULL,
+            next_nonce INTEGER NOT NULL,
+            PRIMARY KEY (server_seed_id, client_seed)
+        ) WITHOUT ROWID
+    """)
+    
+    _insert_server_seed(cursor)
+
+def _insert_server_seed(cursor: sqlite3.Cursor):
+    server_seed = new_server_seed()
+    cursor.execute("""
+        INSERT INTO server_seeds (server_seed, server_seed_hash)
+        SELECT ?, ? WHERE NOT EXISTS (SELECT 1 FROM server_seeds WHERE revealed_at IS NULL)
+    """, (server_seed, server_seed_hash(server_seed)))
+
+def _server_seed(row: sqlite3.Row, reveal: bool = False) -> Dict[str, Any]:
+    seed = {
+        'id': row['id'],
+        'server_seed_hash': row['server_seed_hash'],
+        'created_at': row['created_at'],
+        'revealed_at': row['revealed_at']
+    }
+    if reveal:
+        seed['server_seed'] = row['server_seed']
+    return seed
+
+def get_active_server_seed() -> Dict[str, Any]:
+    """The active server seed's commitment; the seed itself stays secret"""
+    with get_db() as conn:
+        row = conn.execute("""
+            SELECT * FROM server_seeds WHERE revealed_at IS NULL ORDER BY id DESC LIMIT 1
+        """).fetchone()
+    return _server_seed(row)
+
+def get_server_seed(server_seed_id: int) -> Optional[Dict[str, Any]]:
+    """A server seed's commitment, with the seed itself once it is revealed"""
+    with get_db() as conn:
+        row = conn.execute("SELECT * FROM server_seeds WHERE id = ?", (server_seed_id,)).fetchone()
+    if row is None:
+        return None
+    return _server_seed(row, reveal=row['revealed_at'] is not None)
+
+def reserve_fair_nonces(client_seed: str, count: int = 1) -> tuple:
+    """Reserve `count` consecutive nonces for a client seed under the active
+    server seed. Returns (server seed including its secret, first nonce)."""
+    with get_db() as conn:
+        try:
+            # One statement, so a concurrent rotation cannot slip between
+            # reading the active seed and reserving nonces under it
+            reserved = conn.execute("""
+                INSERT INTO fair_nonces (server_seed_id, client_seed, next_nonce)
+                SELECT id, ?, ? FROM server_seeds WHERE revealed_at IS NULL ORDER BY id DESC LIMIT 1
+                ON CONFLICT (server_seed_id, client_seed) DO UPDATE SET next_nonce = next_nonce + excluded.next_nonce
+                RETURNING server_seed_id, next_nonce
+            """, (client_seed, count)).fetchone()
+            row = conn.execute("SELECT * FROM server_seeds WHERE id = ?", (reserved['server_seed_id'],)).fetchone()
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+    return _server_seed(row, reveal=True), reserved['next_nonce'] - count
+
+def rotate_server_seed() -> Dict[str, Any]:
+    """Reveal the active server seed and commit to a new one"""
+    with get_db() as conn:
+        cursor = conn.cursor()
+        try:
+            revealed = cursor.execute("""
+                UPDATE server_seeds SET revealed_at = CURRENT_TIMESTAMP
+                WHERE revealed_at IS NULL
+                RETURNING *
+            """).fetchall()
+            _insert_server_seed(cursor)
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+    return {
+        'revealed': [_server_seed(row, reveal=True) for row in revealed],
+        'active': get_active_server_seed()
+    }
+
+def _fairness_json(fairness: Optional[Dict[str, Any]]) -> Optional[str]:
+    if not fairness:
+        return None
+    # The hash is recoverable from server_seeds, so it is not stored per row
+    return json.dumps({key: fairness[key] for key in ('server_seed_id', 'client_seed', 'nonce')})
+
+# Aggregates over staked simulations, kept current by insert triggers so
+# /api/stats and /api/players never scan the simulations table.
+_ROLLUP_COLUMNS = """
+    total_simulations INTEGER NOT NULL DEFAULT 0,
+    won_slips INTEGER NOT NULL DEFAULT 0,
+    lost_slips INTEGER NOT NULL DEFAULT 0,
+    total_bets INTEGER NOT NULL DEFAULT 0,
+    total_staked REAL NOT NULL DEFAULT 0,
+    total_paid_out REAL NOT NULL DEFAULT 0,
+    total_player_profit REAL NOT NULL DEFAULT 0,
+    configured_rtp_sum REAL NOT NULL DEFAULT 0,
+    last_simulation TIMESTAMP
+"""
+
+_ROLLUP_INCREMENT = """
+    total_simulations = total_simulations + 1,
+    won_slips = won_slips + (NEW.bet_slip_won = 1),
+    lost_slips = lost_slips + (NEW.bet_slip_won = 0),
+    total_bets = total_bets + NEW.number_of_bets,
+    total_staked = total_staked + COALESCE(NEW.total_stake, 0),
+    total_paid_out = total_paid_out + COALESCE(NEW.total_payout, 0),
+    total_player_profit = total_player_profit + COALESCE(NEW.total_profit, 0),
+    configured_rtp_sum = configured_rtp_sum + NEW.configured_rtp,
+    last_simulation = MAX(COALESCE(last_simulation, NEW.created_at), NEW.created_at)
+"""
+
+_ROLLUP_SELECT = """
+    COUNT(*),
+    COALESCE(SUM(CASE WHEN bet_slip_won = 1 THEN 1 ELSE 0 END), 0),
+    COALESCE(SUM(CASE WHEN bet_slip_won = 0 THEN 1 ELSE 0 END), 0),
+    COALESCE(SUM(number_of_bets), 0),
+    COALESCE(SUM(total_stake), 0),
+    COALESCE(SUM(total_payout), 0),
+    COALESCE(SUM(total_profit), 0),
+    COALESCE(SUM(configured_rtp), 0),
+    MAX(created_at)
+"""
+
+_ROLLUP_FIELDS = """
+    total_simulations, won_slips, lost_slips, total_bets, total_staked,
+    total_paid_out, total_player_profit, configured_rtp_sum, last_simulation
+"""
+
+def _init_rollups(cursor: sqlite3.Cursor):
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS player_rollups (
+            user_id TEXT PRIMARY KEY,
+            {_ROLLUP_COLUMNS}
+        )
+    """)
+    
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_player_rollups_last ON player_rollups(last_simulation DESC)
+    """)
+    
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS global_rollup (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            {_ROLLUP_COLUMNS}
+        )
+    """)
+    
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_simulations_rollup
+        AFTER INSERT ON simulations
+        WHEN NEW.total_stake IS NOT NULL
+        BEGIN
+            INSERT INTO player_rollups (user_id) VALUES (NEW.user_id)
+                ON CONFLICT(user_id) DO NOTHING;
+            UPDATE player_rollups SET {_ROLLUP_INCREMENT} WHERE user_id = NEW.user_id;
+            UPDATE global_rollup SET {_ROLLUP_INCREMENT} WHERE id = 1;
+        END
+    """)
+    
+    cursor.execute("SELECT 1 FROM global_rollup WHERE id = 1")
+    if cursor.fetchone() is None:
+        _rebuild_rollups(cursor)
+
+def _rebuild_rollups(cursor: sqlite3.Cursor):
+    cursor.execute("DELETE FROM player_rollups")
+    cursor.execute("DELETE FROM global_rollup")
+    cursor.execute(f"""
+        INSERT INTO player_rollups (user_id, {_ROLLUP_FIELDS})
+        SELECT user_id, {_ROLLUP_SELECT}
+        FROM simulations
+        WHERE total_stake IS NOT NULL
+        GROUP BY user_id
+    """)
+    cursor.execute(f"""
+        INSERT INTO global_rollup (id, {_ROLLUP_FIELDS})
+        SELECT 1, {_ROLLUP_SELECT}
+        FROM simulations
+        WHERE total_stake IS NOT NULL
+    """)
+
+def rebuild_rollups() -> int:
+    """Recompute player and global rollups from the raw simulation history"""
+    with get_db() as conn:
+        cursor = conn.cursor()
+        _rebuild_rollups(cursor)
+        conn.commit()
+        
+        cursor.execute("SELECT COUNT(*) AS count FROM player_rollups")
+        return cursor.fetchone()['count']
+
+_INSERT_SIMULATION = """
+    INSERT INTO simulations (
+        user_id, home_team, away_team, home_score, away_score,
+        bet_slip_won, total_stake, total_payout, total_profit,
+        configured_rtp, seed, volatility, total_events, number_of_bets,
+        bet_results, events, match_stats, replay_inputs, engine, fairness
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+def _encode_events(home_team: str, away_team: str, events: List[Dict[str, Any]]):
+    if EVENT_ENCODING == "binary":
+        blob = encode_events(home_team, away_team, events)
+        if blob is not None:
+            return blob
+    return json.dumps(events)
+
+def _replay_row(row: sqlite3.Row) -> tuple:
+    return replay_simulation(
+        row['home_team'], row['away_team'], row['seed'], row['volatility'],
+        row['configured_rtp'], row['replay_inputs'], row['engine']
+    )
+
+def _load_events(row: sqlite3.Row) -> List[Dict[str, Any]]:
+    if row['replay_inputs'] is not None:
+        return _replay_row(row)[0]
+    # The events column holds either a binary timeline (BLOB) or JSON text
+    if isinstance(row['events'], bytes):
+        return decode_events(row['home_team'], row['away_team'], row['events'])
+    return json.loads(row['events'])
+
+def _load_match_stats(row: sqlite3.Row) -> Dict[str, Any]:
+    if row['replay_inputs'] is not None:
+        return _replay_row(row)[1]
+    return json.loads(row['match_stats'])
+
+def _simulation_row(simulation_data: Dict[str, Any]) -> tuple:
+    replayable = (
+        SIMULATION_STORAGE == "replay"
+        and simulation_data['seed'] is not None
+        and simulation_data.get('score_probabilities') is not None
+    )
+    if replayable:
+        events = match_stats = "null"
+        inputs = replay_inputs(simulation_data)
+    else:
+        events = _encode_events(simulation_data['home_team'], simulation_data['away_team'], simulation_data['events'])
+        match_stats = json.dumps(simulation_data['match_stats'])
+        inputs = None
+    
+    return (
+        simulation_data['user_id'],
+        simulation_data['home_team'],
+        simulation_data['away_team'],
+        simulation_data['home_score'],
+        simulation_data['away_score'],
+        simulation_data['bet_slip_won'],
+        simulation_data['total_stake'],
+        simulation_data['total_payout'],
+        simulation_data['total_profit'],
+        simulation_data['configured_rtp'],
+        simulation_data['seed'],
+        simulation_data['volatility'],
+        simulation_data['total_events'],
+        simulation_data['number_of_bets'],
+        json.dumps(simulation_data['bet_results']),
+        events,
+        match_stats,
+        inputs,
+        json.dumps(simulation_data['engine']) if simulation_data.get('engine') else None,
+        _fairness_json(simulation_data.get('fairness'))
+    )
+
 def save_simulation(simulation_data: Dict[str, Any]) -> int:
     with get_db() as conn:
         cursor = conn.cursor()
         
-        cursor.execute("""
-            INSERT INTO simulations (
-                user_id, home_team, away_team, home_score, away_score,
-                bet_slip_won, total_stake, total_payout, total_profit,
-                configured_rtp, seed, volatility, total_events, number_of_bets,
-                bet_results, events, match_stats
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            simulation_data['user_id'],
-            simulation_data['home_team'],
-            simulation_data['away_team'],
-            simulation_data['home_score'],
-            simulation_data['away_score'],
-            simulation_data['bet_slip_won'],
-            simulation_data['total_stake'],
-            simulation_data['total_payout'],
-            simulation_data['total_profit'],
-            simulation_data['configured_rtp'],
-            simulation_data['seed'],
-            simulation_data['volatility'],
-            simulation_data['total_events'],
-            simulation_data['number_of_bets'],
-            json.dumps(simulation_data['bet_results']),
-            json.dumps(simulation_data['events']),
-            json.dumps(simulation_data['match_stats'])
-        ))
+        cursor.executemany(_INSERT_TEAM, _team_rows((simulation_data['home_team'], simulation_data['away_team'])))
+        cursor.execute(_INSERT_SIMULATION, _simulation_row(simulation_data))
         
         conn.commit()
         return cursor.lastrowid
 
+def save_simulations(simulations: List[Dict[str, Any]], durable: bool = False) -> int:
+    """Insert many simulations in a single transaction
+
+    With durable=True the commit is fsynced (synchronous=FULL) instead of
+    relying on the connection's default synchronous level.
+    """
+    with get_db() as conn:
+        if durable:
+            conn.execute("PRAGMA synchronous=FULL")
+        try:
+            conn.executemany(_INSERT_TEAM, _team_rows(
+                name for data in simulations for name in (data['home_team'], data['away_team'])
+            ))
+            conn.executemany(_INSERT_SIMULATION, [_simulation_row(data) for data in simulations])
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+        finally:
+            if durable:
+                conn.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+        
+        return len(simulations)
+
+def compact_events(batch_size: int = 500, dry_run: bool = False) -> Dict[str, Any]:
+    """Re-encode JSON event timelines with the binary codec
+
+    Rows whose timeline does not round-trip exactly are left as JSON.
+    Freed pages are only returned to the filesystem by a later VACUUM.
+    """
+    scanned = compacted = 0
+    json_bytes = binary_bytes = 0
+    last_id = 0
+    
+    with get_db() as conn:
+        cursor = conn.cursor()
+        while True:
+            cursor.execute("""
+                SELECT id, home_team, away_team, events FROM simulations
+                WHERE id > ? AND typeof(events) = 'text' AND replay_inputs IS NULL
+                ORDER BY id LIMIT ?
+            """, (last_id, batch_size))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            last_id = rows[-1]['id']
+            
+            updates = []
+            for row in rows:
+                scanned += 1
+                blob = encode_events(row['home_team'], row['away_team'], json.loads(row['events']))
+                if blob is None:
+                    continue
+                compacted += 1
+                json_bytes += len(row['events'].encode())
+                binary_bytes += len(blob)
+                updates.append((blob, row['id']))
+            
+            if updates and not dry_run:
+                cursor.executemany("UPDATE simulations SET events = ? WHERE id = ?", updates)
+                conn.commit()
+    
+    return {
+        'rows_scanned': scanned,
+        'rows_compacted': compacted,
+        'rows_skipped': scanned - compacted,
+        'json_bytes': json_bytes,
+        'binary_bytes': binary_bytes,
+        'compression_ratio': round(json_bytes / binary_bytes, 2) if binary_bytes else None
+    }
+
+def verify_replays(sample_size: int = 100) -> Dict[str, Any]:
+    """Replay a random sample of seed-only rows and compare with the recorded scores"""
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT id, home_team, away_team, home_score, away_score, seed, volatility,
+                   configured_rtp, total_events, replay_inputs, engine
+            FROM simulations
+            WHERE replay_inputs IS NOT NULL
+            ORDER BY RANDOM() LIMIT ?
+        """, (sample_size,))
+        rows = cursor.fetchall()
+    
+    mismatches = []
+    for row in rows:
+        try:
+            events, _, home_score, away_score = _replay_row(row)
+        except ValueError as e:
+            mismatches.append({'id': row['id'], 'error': str(e)})
+            continue
+        if (home_score, away_score, len(events)) != (row['home_score'], row['away_score'], row['total_events']):
+            mismatches.append({
+                'id': row['id'],
+                'recorded': [row['home_score'], row['away_score'], row['total_events']],
+                'replayed': [home_score, away_score, len(events)]
+            })
+    
+    return {
+        'checked': len(rows),
+        'mismatched': len(mismatches),
+        'mismatches': mismatches
+    }
+
+def verify_fairness(sample_size: Optional[int] = None) -> Dict[str, Any]:
+    """Recompute the seed of provably-fair simulations whose server seed is
+    revealed, and replay the seed-only ones to check the recorded scores"""
+    limit = "ORDER BY RANDOM() LIMIT ?" if sample_size else ""
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            SELECT s.id, s.home_team, s.away_team, s.home_score, s.away_score, s.seed, s.volatility,
+                   s.configured_rtp, s.total_events, s.replay_inputs, s.engine, s.fairness,
+                   k.server_seed, k.server_seed_hash
+            FROM simulations s
+            JOIN server_seeds k ON k.id = json_extract(s.fairness, '$.server_seed_id')
+            WHERE s.fairness IS NOT NULL AND k.revealed_at IS NOT NULL
+            {limit}
+        """, (sample_size,) if sample_size else ())
+        rows = cursor.fetchall()
+        unrevealed = cursor.execute("""
+            SELECT COUNT(*) FROM simulations s
+            JOIN server_seeds k ON k.id = json_extract(s.fairness, '$.server_seed_id')
+            WHERE s.fairness IS NOT NULL AND k.revealed_at IS NULL
+        """).fetchone()[0]
+    
+    mismatches = []
+    for row in rows:
+        fairness = json.loads(row['fairness'])
+        if server_seed_hash(row['server_seed']) != row['server_seed_hash']:
+            mismatches.append({'id': row['id'], 'error': "server seed does not match its published hash"})
+            continue
+        seed = fair_seed(row['server_seed'], fairness['client_seed'], fairness['nonce'])
+        if seed != row['seed']:
+            mismatches.append({'id': row['id'], 'recorded_seed': row['seed'], 'fair_seed': seed})
+            continue
+        if row['replay_inputs'] is None:
+            continue
+        try:
+            events, _, home_score, away_score = _replay_row(row)
+        except ValueError as e:
+            mismatches.append({'id': row['id'], 'error': str(e)})
+            continue
+        if (home_score, away_score, len(events)) != (row['home_score'], row['away_score'], row['total_events']):
+            mismatches.append({
+                'id': row['id'],
+                'recorded': [row['home_score'], row['away_score'], row['total_events']],
+                'replayed': [home_score, away_score, len(events)]
+            })
+    
+    return {
+        'checked': len(rows),
+        'unrevealed': unrevealed,
+        'mismatched': len(mismatches),
+        'mismatches': mismatches
+    }
+
+def vacuum():
+    with get_db() as conn:
+        conn.execute("VACUUM")
+
+def encode_history_cursor(created_at: str, simulation_id: int) -> str:
+    raw = json.dumps([created_at, simulation_id], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_history_cursor(token: str) -> tuple:
+    try:
+        created_at, simulation_id = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+        return str(created_at), int(simulation_id)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid history cursor: {token}") from e
+
+TEAM_MATCH_MODES = ("substring", "exact", "prefix", "fuzzy")
+DEFAULT_TEAM_MATCH = "substring"
+
+def _team_condition(cursor: sqlite3.Cursor, team: str, team_match: str) -> tuple:
+    """Condition on `teams t` selecting the teams a search term matches (case-insensitive)
+
+    substring - names containing the term, through the teams_fts trigram
+                index; terms under three characters scan the team names
+    exact     - the whole name, through the name_norm index
+    prefix    - names starting with the term, as an index range
+    fuzzy     - names containing the term, plus close misspellings; scans
+                every team name, so it is opt-in
+    """
+    term = normalize_team_name(team)
+    
+    if team_match == "substring":
+        if len(term) >= 3:
+            return "t.id IN (SELECT rowid FROM teams_fts WHERE teams_fts MATCH ?)", ['"' + term.replace('"', '""') + '"']
+        return "instr(t.name_norm, ?) > 0", [term]
+    
+    if team_match == "exact":
+        return "t.name_norm = ?", [term]
+    
+    if team_match == "prefix":
+        return "t.name_norm >= ? AND t.name_norm < ?", [term, term + '\U0010ffff']
+    
+    if team_match != "fuzzy":
+        raise ValueError(f"team_match must be one of {', '.join(TEAM_MATCH_MODES)}")
+    
+    cursor.execute("SELECT id, name_norm FROM teams")
+    teams = cursor.fetchall()
+    close = set(difflib.get_close_matches(term, [row['name_norm'] for row in teams], n=10, cutoff=0.8))
+    ids = [row['id'] for row in teams if term in row['name_norm'] or row['name_norm'] in close]
+    # One JSON parameter however many teams match, clear of SQLite's variable limit
+    return "t.id IN (SELECT value FROM json_each(?))", [json.dumps(ids)]
+
+def _simulation_filters(
+    cursor: sqlite3.Cursor,
+    team: Optional[str] = None,
+    bet_slip_won: Optional[bool] = None,
+    user_id: Optional[str] = None,
+    team_match: str = DEFAULT_TEAM_MATCH
+) -> tuple:
+    query = ""
+    params = []
+    
+    if user_id:
+        query += " AND user_id = ?"
+        params.append(user_id)
+    
+    if team:
+        condition, team_params = _team_condition(cursor, team, team_match)
+        query += (
+            " AND id IN (SELECT st.simulation_id FROM teams t"
+            f" JOIN simulation_teams st ON st.team_id = t.id WHERE {condition})"
+        )
+        params.extend(team_params)
+    
+    if bet_slip_won is not None:
+        query += " AND bet_slip_won = ?"
+        params.append(bet_slip_won)
+    
+    return query, params
+
+HISTORY_FIELDS = ("summary", "full")
+
+_SUMMARY_COLUMNS = """
+    id, user_id, home_team, away_team, home_score, away_score, bet_slip_won,
+    total_stake, total_payout, total_profit, configured_rtp, seed, volatility,
+    total_events, number_of_bets, engine, fairness, created_at
+"""
+
+def _simulation_summary(row: sqlite3.Row) -> Dict[str, Any]:
+    return {
+        'id': row['id'],
+        'user_id': row['user_id'],
+        'home_team': row['home_team'],
+        'away_team': row['away_team'],
+        'home_score': row['home_score'],
+        'away_score': row['away_score'],
+        'bet_slip_won': bool(row['bet_slip_won']),
+        'total_stake': row['total_stake'],
+        'total_payout': row['total_payout'],
+        'total_profit': row['total_profit'],
+        'configured_rtp': row['configured_rtp'],
+        'seed': row['seed'],
+        'volatility': row['volatility'],
+        'total_events': row['total_events'],
+        'number_of_bets': row['number_of_bets'],
+        'engine': {**SIMULATOR_DEFAULTS, **json.loads(row['engine'] or "{}")},
+        'fairness': json.loads(row['fairness']) if row['fairness'] else None,
+        'created_at': row['created_at']
+    }
+
 def get_simulations(
     limit: int = 50,
     offset: int = 0,
     team: Optional[str] = None,
     bet_slip_won: Optional[bool] = None,
-    user_id: Optional[str] = None
+    user_id: Optional[str] = None,
+    after: Optional[str] = None,
+    team_match: str = DEFAULT_TEAM_MATCH,
+    fields: str = "full"
 ) -> List[Dict[str, Any]]:
+    """Newest-first simulations; `after` is a cursor from encode_history_cursor
+
+    fields="summary" leaves out the bet_results, events and match_stats
+    blobs, so they are neither read from disk nor decoded.
+    """
+    if fields not in HISTORY_FIELDS:
+        raise ValueError(f"fields must be one of {', '.join(HISTORY_FIELDS)}")
+    
     with get_db() as conn:
         cursor = conn.cursor()
         
-        query = "SELECT * FROM simulations WHERE 1=1"
-        params = []
-        
-        if user_id:
-            query += " AND user_id = ?"
-            params.append(user_id)
-        
-        if team:
-            query += " AND (home_team LIKE ? OR away_team LIKE ?)"
-            search_term = f"%{team}%"
-            params.extend([search_term, search_term])
+        columns = "*" if fields == "full" else _SUMMARY_COLUMNS
+        filters, params = _simulation_filters(cursor, team, bet_slip_won, user_id, team_match)
+        query = f"SELECT {columns} FROM simulations WHERE 1=1" + filters
         
-        if bet_slip_won is not None:
-            query += " AND bet_slip_won = ?"
-            params.append(bet_slip_won)
+        if after:
+            created_at, simulation_id = decode_history_cursor(after)
+            query += " AND created_at <= ? AND (created_at < ? OR id < ?)"
+            params.extend([created_at, created_at, simulation_id])
+            offset = 0
         
-        query += " ORDER BY created_at DESC LIMIT ? OFFSET ?"
+        query += " ORDER BY created_at DESC, id DESC LIMIT ? OFFSET ?"
         params.extend([limit, offset])
         
         cursor.execute(query, params)
@@ -129,120 +856,184 @@ def get_simulations(
         
         simulations = []
         for row in rows:
-            simulations.append({
-                'id': row['id'],
-                'user_id': row['user_id'],
-                'home_team': row['home_team'],
-                'away_team': row['away_team'],
-                'home_score': row['home_score'],
-                'away_score': row['away_score'],
-                'bet_slip_won': bool(row['bet_slip_won']),
-                'total_stake': row['total_stake'],
-                'total_payout': row['total_payout'],
-                'total_profit': row['total_profit'],
-                'configured_rtp': row['configured_rtp'],
-                'seed': row['seed'],
-                'volatility': row['volatility'],
-                'total_events': row['total_events'],
-                'number_of_bets': row['number_of_bets'],
-                'bet_results': json.loads(row['bet_results']),
-                'events': json.loads(row['events']),
-                'match_stats': json.loads(row['match_stats']),
-                'created_at': row['created_at']
-            })
+            simulation = _simulation_summary(row)
+            if fields == "full":
+                simulation['bet_results'] = json.loads(row['bet_results'])
+                simulation['events'] = _load_events(row)
+                simulation['match_stats'] = _load_match_stats(row)
+            simulations.append(simulation)
         
         return simulations
 
-def get_simulation_stats() -> Dict[str, Any]:
+def get_simulation_events(simulation_id: int) -> Optional[List[Dict[str, Any]]]:
+    """Event timeline of a single simulation, or None if it does not exist"""
     with get_db() as conn:
         cursor = conn.cursor()
-        
         cursor.execute("""
-            SELECT 
-                COUNT(*) as total_simulations,
-                SUM(CASE WHEN bet_slip_won = 1 THEN 1 ELSE 0 END) as won_slips,
-                SUM(CASE WHEN bet_slip_won = 0 THEN 1 ELSE 0 END) as lost_slips,
-                SUM(total_stake) as total_staked,
-                SUM(total_payout) as total_paid_out,
-                SUM(total_profit) as total_player_profit,
-                SUM(number_of_bets) as total_bets,
-                AVG(configured_rtp) as avg_configured_rtp
-            FROM simulations
-            WHERE total_stake IS NOT NULL
-        """)
-        
+            SELECT home_team, away_team, seed, volatility, configured_rtp, events, replay_inputs, engine
+            FROM simulations WHERE id = ?
+        """, (simulation_id,))
         row = cursor.fetchone()
-        
-        total_staked = float(row['total_staked']) if row['total_staked'] else 0
-        total_paid_out = float(row['total_paid_out']) if row['total_paid_out'] else 0
-        
-        actual_rtp = (total_paid_out / total_staked) if total_staked > 0 else 0
-        house_profit = total_staked - total_paid_out
-        
-        return {
-            'total_simulations': row['total_simulations'],
-            'won_slips': row['won_slips'],
-            'lost_slips': row['lost_slips'],
-            'total_bets': row['total_bets'],
-            'total_staked': total_staked,
-            'total_paid_out': total_paid_out,
-            'house_profit': house_profit,
-            'total_player_profit': float(row['total_player_profit']) if row['total_player_profit'] else 0,
-            'actual_rtp': actual_rtp,
-            'avg_configured_rtp': float(row['avg_configured_rtp']) if row['avg_configured_rtp'] else 0,
-            'rtp_difference': actual_rtp - (float(row['avg_configured_rtp']) if row['avg_configured_rtp'] else 0)
-        }
-
-def get_rtp_trends(limit: int = 100) -> List[Dict[str, Any]]:
-    """Calculate RTP trends over time with rolling windows"""
+        if row is None:
+            return None
+        return _load_events(row)
+
+def _rollup_stats(row: sqlite3.Row) -> Dict[str, Any]:
+    total_staked = float(row['total_staked'])
+    total_paid_out = float(row['total_paid_out'])
+    
+    actual_rtp = (total_paid_out / total_staked) if total_staked > 0 else 0
+    house_profit = total_staked - total_paid_out
+    avg_configured_rtp = (row['configured_rtp_sum'] / row['total_simulations']) if row['total_simulations'] else 0
+    
+    return {
+        'total_simulations': row['total_simulations'],
+        'won_slips': row['won_slips'],
+        'lost_slips': row['lost_slips'],
+        'total_bets': row['total_bets'],
+        'total_staked': total_staked,
+        'total_paid_out': total_paid_out,
+        'house_profit': house_profit,
+        'total_player_profit': float(row['total_player_profit']),
+        'actual_rtp': actual_rtp,
+        'avg_configured_rtp': avg_configured_rtp,
+        'rtp_difference': actual_rtp - avg_configured_rtp
+    }
+
+def get_simulation_stats() -> Dict[str, Any]:
     with get_db() as conn:
         cursor = conn.cursor()
         
-        cursor.execute("""
-            SELECT 
-                id,
-                created_at,
+        cursor.execute("SELECT * FROM global_rollup WHERE id = 1")
+        
+        return _rollup_stats(cursor.fetchone())
+
+RTP_TREND_BUCKETS = {
+    'minute': '%Y-%m-%d %H:%M:00',
+    'hour': '%Y-%m-%d %H:00:00',
+    'day': '%Y-%m-%d 00:00:00'
+}
+
+def _ratio(numerator: Optional[float], denominator: Optional[float]) -> float:
+    return (float(numerator) / float(denominator)) if denominator else 0
+
+def get_rtp_trends(
+    limit: int = 100,
+    windows: Optional[List[int]] = None,
+    bucket: Optional[str] = None,
+    since: Optional[str] = None,
+    latest: bool = True
+) -> List[Dict[str, Any]]:
+    """Calculate RTP trends over time with cumulative and rolling windows
+
+    Running totals are computed by SQL window functions in a single pass.
+    `windows` are rolling window sizes (in simulations, or in buckets when
+    `bucket` is minute/hour/day); `latest` selects the most recent `limit`
+    points rather than the oldest, and `since` restricts to rows created
+    at or after that timestamp.
+    """
+    windows = windows or [10]
+    if any(not isinstance(size, int) or size < 1 for size in windows):
+        raise ValueError("Rolling window sizes must be positive integers")
+    if bucket is not None and bucket not in RTP_TREND_BUCKETS:
+        raise ValueError(f"Unknown bucket '{bucket}', expected one of {sorted(RTP_TREND_BUCKETS)}")
+    
+    filters = "total_stake IS NOT NULL"
+    params: List[Any] = []
+    if since:
+        filters += " AND created_at >= ?"
+        params.append(since)
+    
+    direction = "DESC" if latest else "ASC"
+    
+    if bucket is None:
+        selected = f"""
+            SELECT
+                id AS point_id,
+                created_at AS point_time,
                 configured_rtp,
-                total_stake,
-                total_payout,
-                bet_slip_won
+                total_stake AS stake,
+                COALESCE(total_payout, 0) AS payout,
+                bet_slip_won,
+                1 AS simulations,
+                bet_slip_won AS won_slips
+            FROM simulations
+            WHERE {filters}
+            ORDER BY created_at {direction}, id {direction}
+            LIMIT ?
+        """
+    else:
+        selected = f"""
+            SELECT
+                MIN(id) AS point_id,
+                strftime('{RTP_TREND_BUCKETS[bucket]}', created_at) AS point_time,
+                AVG(configured_rtp) AS configured_rtp,
+                SUM(total_stake) AS stake,
+                COALESCE(SUM(total_payout), 0) AS payout,
+                NULL AS bet_slip_won,
+                COUNT(*) AS simulations,
+                SUM(CASE WHEN bet_slip_won = 1 THEN 1 ELSE 0 END) AS won_slips
             FROM simulations
-            WHERE total_stake IS NOT NULL
-            ORDER BY created_at ASC
+            WHERE {filters}
+            GROUP BY point_time
+            ORDER BY point_time {direction}
             LIMIT ?
-        """, (limit,))
+        """
+    params.append(limit)
+    
+    rolling = "".join(
+        f""",
+                SUM(stake) OVER (ORDER BY point_time, point_id ROWS BETWEEN {size - 1} PRECEDING AND CURRENT ROW) AS window_stake_{i},
+                SUM(payout) OVER (ORDER BY point_time, point_id ROWS BETWEEN {size - 1} PRECEDING AND CURRENT ROW) AS window_payout_{i}"""
+        for i, size in enumerate(windows)
+    )
+    
+    with get_db() as conn:
+        cursor = conn.cursor()
         
-        rows = cursor.fetchall()
+        cursor.execute(f"""
+            WITH selected AS ({selected})
+            SELECT
+                *,
+                SUM(stake) OVER running AS cumulative_stake,
+                SUM(payout) OVER running AS cumulative_payout{rolling}
+            FROM selected
+            WINDOW running AS (ORDER BY point_time, point_id ROWS UNBOUNDED PRECEDING)
+            ORDER BY point_time, point_id
+        """, params)
         
         trends = []
-        cumulative_stake = 0
-        cumulative_payout = 0
-        
-        for idx, row in enumerate(rows):
-            cumulative_stake += float(row['total_stake']) if row['total_stake'] else 0
-            cumulative_payout += float(row['total_payout']) if row['total_payout'] else 0
-            
-            actual_rtp = (cumulative_payout / cumulative_stake) if cumulative_stake > 0 else 0
-            
-            window_size = min(10, idx + 1)
-            window_start = max(0, idx - window_size + 1)
-            window_stake = sum(float(rows[i]['total_stake']) if rows[i]['total_stake'] else 0 
-                             for i in range(window_start, idx + 1))
-            window_payout = sum(float(rows[i]['total_payout']) if rows[i]['total_payout'] else 0 
-                              for i in range(window_start, idx + 1))
-            
-            window_rtp = (window_payout / window_stake) if window_stake > 0 else 0
+        for idx, row in enumerate(cursor):
+            rolling_windows = {
+                str(size): _ratio(row[f'window_payout_{i}'], row[f'window_stake_{i}'])
+                for i, size in enumerate(windows)
+            }
             
-            trends.append({
-                'simulation_number': idx + 1,
-                'created_at': row['created_at'],
+            point = {
                 'configured_rtp': float(row['configured_rtp']),
-                'cumulative_actual_rtp': actual_rtp,
-                'rolling_window_rtp': window_rtp,
-                'cumulative_stake': cumulative_stake,
-                'cumulative_payout': cumulative_payout,
-                'bet_slip_won': bool(row['bet_slip_won'])
-            })
+                'cumulative_actual_rtp': _ratio(row['cumulative_payout'], row['cumulative_stake']),
+                'rolling_window_rtp': rolling_windows[str(windows[0])],
+                'rolling_windows': rolling_windows,
+                'cumulative_stake': float(row['cumulative_stake']),
+                'cumulative_payout': float(row['cumulative_payout'])
+            }
+            
+            if bucket is None:
+                trends.append({
+                    'simulation_number': idx + 1,
+                    'created_at': row['point_time'],
+                    **point,
+                    'bet_slip_won': bool(row['bet_slip_won'])
+                })
+            else:
+                trends.append({
+                    'bucket_number': idx + 1,
+                    'bucket_start': row['point_time'],
+                    'simulations': row['simulations'],
+                    'won_slips': row['won_slips'],
+                    'bucket_rtp': _ratio(row['payout'], row['stake']),
+                    **point
+                })
         
         return trends
 
@@ -251,19 +1042,7 @@ def get_player_stats(user_id: str) -> Dict[str, Any]:
     with get_db() as conn:
         cursor = conn.cursor()
         
-        cursor.execute("""
-            SELECT 
-                COUNT(*) as total_simulations,
-                SUM(CASE WHEN bet_slip_won = 1 THEN 1 ELSE 0 END) as won_slips,
-                SUM(CASE WHEN bet_slip_won = 0 THEN 1 ELSE 0 END) as lost_slips,
-                SUM(total_stake) as total_staked,
-                SUM(total_payout) as total_paid_out,
-                SUM(total_profit) as total_player_profit,
-                SUM(number_of_bets) as total_bets,
-                AVG(configured_rtp) as avg_configured_rtp
-            FROM simulations
-            WHERE user_id = ? AND total_stake IS NOT NULL
-        """, (user_id,))
+        cursor.execute("SELECT * FROM player_rollups WHERE user_id = ?", (user_id,))
         
         row = cursor.fetchone()
         
@@ -283,27 +1062,7 @@ def get_player_stats(user_id: str) -> Dict[str, Any]:
                 'rtp_difference': 0
             }
         
-        total_staked = float(row['total_staked']) if row['total_staked'] else 0
-        total_paid_out = float(row['total_paid_out']) if row['total_paid_out'] else 0
-        
-        actual_rtp = (total_paid_out / total_staked) if total_staked > 0 else 0
-        house_profit = total_staked - total_paid_out
-        avg_configured_rtp = float(row['avg_configured_rtp']) if row['avg_configured_rtp'] else 0
-        
-        return {
-            'user_id': user_id,
-            'total_simulations': row['total_simulations'],
-            'won_slips': row['won_slips'],
-            'lost_slips': row['lost_slips'],
-            'total_bets': row['total_bets'],
-            'total_staked': total_staked,
-            'total_paid_out': total_paid_out,
-            'house_profit': house_profit,
-            'total_player_profit': float(row['total_player_profit']) if row['total_player_profit'] else 0,
-            'actual_rtp': actual_rtp,
-            'avg_configured_rtp': avg_configured_rtp,
-            'rtp_difference': actual_rtp - avg_configured_rtp
-        }
+        return {'user_id': user_id, **_rollup_stats(row)}
 
 def get_all_players() -> List[Dict[str, Any]]:
     """Get list of all players with their basic stats"""
@@ -313,14 +1072,13 @@ def get_all_players() -> List[Dict[str, Any]]:
         cursor.execute("""
             SELECT 
                 user_id,
-                COUNT(*) as total_simulations,
-                SUM(CASE WHEN bet_slip_won = 1 THEN 1 ELSE 0 END) as won_slips,
-                SUM(total_stake) as total_staked,
-                SUM(total_payout) as total_paid_out,
-                MAX(created_at) as last_simulation
-            FROM simulations
-            WHERE total_stake IS NOT NULL
-            GROUP BY user_id
+                total_simulations,
+                won_slips,
+                total_staked,
+                total_paid_out,
+                last_simulation
+            FROM player_rollups
+            WHERE total_simulations > 0
             ORDER BY last_simulation DESC
         """)
         
@@ -328,8 +1086,8 @@ def get_all_players() -> List[Dict[str, Any]]:
         
         players = []
         for row in rows:
-            total_staked = float(row['total_staked']) if row['total_staked'] else 0
-            total_paid_out = float(row['total_paid_out']) if row['total_paid_out'] else 0
+            total_staked = float(row['total_staked'])
+            total_paid_out = float(row['total_paid_out'])
             actual_rtp = (total_paid_out / total_staked) if total_staked > 0 else 0
             
             players.append({
@@ -344,27 +1102,44 @@ def get_all_players() -> List[Dict[str, Any]]:
         
         return players
 
-def get_count(team: Optional[str] = None, bet_slip_won: Optional[bool] = None, user_id: Optional[str] = None) -> int:
+HISTORY_COUNT_CACHE_TTL_S = float(os.getenv("HISTORY_COUNT_CACHE_TTL_S", 5))
+HISTORY_COUNT_CACHE_SIZE = int(os.getenv("HISTORY_COUNT_CACHE_SIZE", 1024))
+
+# (team, team_match, bet_slip_won, user_id) -> approximate count
+_count_cache = LRUCache("history_counts", HISTORY_COUNT_CACHE_SIZE, HISTORY_COUNT_CACHE_TTL_S)
+
+def get_count(
+    team: Optional[str] = None,
+    bet_slip_won: Optional[bool] = None,
+    user_id: Optional[str] = None,
+    approximate: bool = False,
+    team_match: str = DEFAULT_TEAM_MATCH
+) -> int:
+    """Count matching simulations
+
+    approximate=True answers unfiltered counts from the AUTOINCREMENT
+    sequence and filtered counts from a short-lived cache, so paging
+    through /api/history does not re-count the table on every request.
+    """
     with get_db() as conn:
         cursor = conn.cursor()
         
-        query = "SELECT COUNT(*) as count FROM simulations WHERE 1=1"
-        params = []
-        
-        if user_id:
-            query += " AND user_id = ?"
-            params.append(user_id)
+        if approximate and not (team or user_id or bet_slip_won is not None):
+            cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'simulations'")
+            row = cursor.fetchone()
+            return row['seq'] if row else 0
         
-        if team:
-            query += " AND (home_team LIKE ? OR away_team LIKE ?)"
-            search_term = f"%{team}%"
-            params.extend([search_term, search_term])
+        def count() -> int:
+            filters, params = _simulation_filters(cursor, team, bet_slip_won, user_id, team_match)
+            cursor.execute("SELECT COUNT(*) as count FROM simulations WHERE 1=1" + filters, params)
+            return cursor.fetchone()['count']
         
-        if bet_slip_won is not None:
-            query += " AND bet_slip_won = ?"
-            params.append(bet_slip_won)
-        
-        cursor.execute(query, params)
-        return cursor.fetchone()['count']
+        if not approximate or HISTORY_COUNT_CACHE_TTL_S <= 0:
+            return count()
+        key = (team, team_match if team else None, bet_slip_won, user_id)
+        return _count_cache.get_or_create(key, count)
+
+def get_count_cache_metrics() -> Dict[str, Any]:
+    return _count_cache.metrics()
 
 init_db()
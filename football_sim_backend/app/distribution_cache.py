@@ -0,0 +1,101 @@
+"""Bounded caches of prepared score distributions.
+
+Requests for the same fixture usually share their score probabilities,
+volatility and bets, so the sampling tables and bet-adjusted distributions built from
+them are cached by value. Each simulation worker process has its own
+caches; `merge_cache_metrics` combines the per-worker snapshots.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional
+
+DISTRIBUTION_CACHE_SIZE = int(os.getenv("DISTRIBUTION_CACHE_SIZE", 1024))
+# 0 keeps entries until they are evicted by size
+DISTRIBUTION_CACHE_TTL_S = float(os.getenv("DISTRIBUTION_CACHE_TTL_S", 0))
+
+_COUNTERS = ('size', 'max_size', 'hits', 'misses', 'evictions', 'expirations')
+
+
+class LRUCache:
+    """Thread-safe LRU cache with an optional time-to-live per entry"""
+
+    def __init__(self, name: str, max_size: int, ttl: Optional[float] = None):
+        self.name = name
+        self.max_size = max(max_size, 1)
+        self.ttl = ttl or None
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get_or_create(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires = entry
+                if expires is None or expires > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+                self.expirations += 1
+            self.misses += 1
+
+        # Built outside the lock; a concurrent miss on the same key just
+        # builds an equal value twice.
+        value = factory()
+        with self._lock:
+            self._entries[key] = (value, now + self.ttl if self.ttl else None)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'hit_rate': _hit_rate(self.hits, self.misses)
+        }
+
+
+def _hit_rate(hits: int, misses: int) -> float:
+    return round(hits / (hits + misses), 4) if hits + misses else 0.0
+
+
+# (score probabilities, volatility) -> WeightedSampler
+score_sampler_cache = LRUCache("score_samplers", DISTRIBUTION_CACHE_SIZE, DISTRIBUTION_CACHE_TTL_S)
+# (score probabilities, bet slip win/lose branches) -> adjusted score probabilities
+bet_distribution_cache = LRUCache("bet_distributions", DISTRIBUTION_CACHE_SIZE, DISTRIBUTION_CACHE_TTL_S)
+
+
+def get_cache_metrics() -> Dict[str, Dict[str, Any]]:
+    return {cache.name: cache.metrics() for cache in (score_sampler_cache, bet_distribution_cache)}
+
+
+def merge_cache_metrics(snapshots: Iterable[Dict[str, Dict[str, Any]]]) -> Dict[str, Dict[str, Any]]:
+    """Sum get_cache_metrics() snapshots taken in different worker processes"""
+    merged: Dict[str, Dict[str, Any]] = {}
+    for snapshot in snapshots:
+        for name, metrics in snapshot.items():
+            totals = merged.setdefault(name, {counter: 0 for counter in _COUNTERS})
+            for counter in _COUNTERS:
+                totals[counter] += metrics[counter]
+    for totals in merged.values():
+        totals['hit_rate'] = _hit_rate(totals['hits'], totals['misses'])
+    return merged
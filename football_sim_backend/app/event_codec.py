@@ -0,0 +1,192 @@
+"""Compact binary encoding for stored match timelines.
+
+Every event the simulator produces is one of a fixed set of templates, so
+a timeline can be stored as two byte columns and the descriptions
+re-rendered on read:
+
+    byte 0             format version
+    bytes 1-2          event count (uint16, little endian)
+    minutes[count]     minute, with the high bit set for away-team events
+    codes[count]       event kind << 4 | player number (0 = no player)
+
+Team names are not stored; they come from the simulation row.
+"""
+import struct
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from app.match_simulator import REGULAR_EVENT_CHOICES
+from app.models import EventType
+
+
+FORMAT_VERSION = 1
+
+KIND_KICKOFF = 0
+KIND_BUILDUP_PASS = 1
+KIND_BUILDUP_ATTACK = 2
+KIND_GOAL_SHOT = 3
+KIND_GOAL = 4
+KIND_PASS = 5
+KIND_SHOT = 6
+KIND_CORNER = 7
+KIND_FOUL = 8
+KIND_OFFSIDE = 9
+KIND_SAVE = 10
+KIND_HALFTIME = 11
+KIND_FULLTIME = 12
+
+KIND_EVENT_TYPES = [
+    EventType.KICKOFF,
+    EventType.PASS,
+    EventType.PASS,
+    EventType.SHOT,
+    EventType.GOAL,
+    EventType.PASS,
+    EventType.SHOT,
+    EventType.CORNER,
+    EventType.FOUL,
+    EventType.OFFSIDE,
+    EventType.SAVE,
+    EventType.HALFTIME,
+    EventType.FULLTIME,
+]
+
+TEAM_NONE = -1
+TEAM_HOME = 0
+TEAM_AWAY = 1
+
+REGULAR_ACTIONS = {KIND_PASS + i: choice[1] for i, (choice, _) in enumerate(REGULAR_EVENT_CHOICES)}
+
+_KIND_BY_EVENT_TYPE = {
+    EventType.KICKOFF: KIND_KICKOFF,
+    EventType.GOAL: KIND_GOAL,
+    EventType.CORNER: KIND_CORNER,
+    EventType.FOUL: KIND_FOUL,
+    EventType.OFFSIDE: KIND_OFFSIDE,
+    EventType.SAVE: KIND_SAVE,
+    EventType.HALFTIME: KIND_HALFTIME,
+    EventType.FULLTIME: KIND_FULLTIME,
+}
+
+_HEADER = struct.Struct("<BH")
+_AWAY_FLAG = 0x80
+
+
+def render_events(home_team: str, away_team: str, minutes: Iterable[int], kinds: Iterable[int],
+                  teams: Iterable[int], players: Iterable[int]) -> Iterator[Tuple[int, EventType, str, Optional[str], str]]:
+    """Rebuild (minute, event_type, team, player, description) tuples exactly
+    as FootballMatchSimulator wrote them, keeping the running score for goal
+    and half/full-time descriptions."""
+    home_score = 0
+    away_score = 0
+
+    for minute, kind, team_flag, number in zip(minutes, kinds, teams, players):
+        team = home_team if team_flag == TEAM_HOME else away_team
+        player = f"{team[0]}. Player {number}" if number > 0 else None
+
+        if kind == KIND_KICKOFF:
+            description = f"Match kicks off at the stadium! {home_team} vs {away_team}"
+        elif kind == KIND_BUILDUP_PASS:
+            description = f"Nice passing movement by {team}"
+        elif kind == KIND_BUILDUP_ATTACK:
+            description = f"{team} building up the attack"
+        elif kind == KIND_GOAL_SHOT:
+            description = f"{player} takes a shot!"
+        elif kind == KIND_GOAL:
+            if team == home_team:
+                home_score += 1
+            else:
+                away_score += 1
+            description = f"⚽ GOAL! {player} scores for {team}! {home_team} {home_score} - {away_score} {away_team}"
+        elif kind == KIND_HALFTIME:
+            team = ""
+            description = f"Half-time: {home_team} {home_score} - {away_score} {away_team}"
+        elif kind == KIND_FULLTIME:
+            team = ""
+            description = f"Full-time: {home_team} {home_score} - {away_score} {away_team}"
+        else:
+            description = f"{player} {REGULAR_ACTIONS[kind]}"
+
+        yield minute, KIND_EVENT_TYPES[kind], team, player, description
+
+
+def _classify(event: Dict[str, Any]) -> int:
+    event_type = EventType(event['event_type'])
+    if event_type == EventType.PASS:
+        if event.get('player') is not None:
+            return KIND_PASS
+        if event['description'].startswith("Nice passing movement"):
+            return KIND_BUILDUP_PASS
+        return KIND_BUILDUP_ATTACK
+    if event_type == EventType.SHOT:
+        return KIND_GOAL_SHOT if event['description'].endswith(" takes a shot!") else KIND_SHOT
+    return _KIND_BY_EVENT_TYPE[event_type]
+
+
+def encode_events(home_team: str, away_team: str, events: Sequence[Dict[str, Any]]) -> Optional[bytes]:
+    """Encode stored event dicts, or return None if the timeline does not
+    round-trip exactly (hand-edited rows, events from another generator)."""
+    if len(events) > 0xFFFF:
+        return None
+
+    minutes = bytearray()
+    codes = bytearray()
+    try:
+        for event in events:
+            kind = _classify(event)
+            minute = event['minute']
+            player = event.get('player')
+            number = int(player.rsplit(" ", 1)[1]) if player else 0
+            if not 0 <= minute < _AWAY_FLAG or not 0 <= number < 16:
+                return None
+            away = event['team'] == away_team and event['team'] != home_team
+            minutes.append(minute | (_AWAY_FLAG if away else 0))
+            codes.append(kind << 4 | number)
+    except (KeyError, ValueError, IndexError, TypeError):
+        return None
+
+    blob = _HEADER.pack(FORMAT_VERSION, len(events)) + bytes(minutes) + bytes(codes)
+    if decode_events(home_team, away_team, blob) != [dict(event) for event in events]:
+        return None
+    return blob
+
+
+def replace_players(blob: bytes, players: Sequence[int]) -> bytes:
+    """Swap in new player numbers for the events that name a player"""
+    _, count = _HEADER.unpack_from(blob)
+    start = _HEADER.size + count
+    codes = bytearray(blob[start:start + count])
+    slots = [i for i, code in enumerate(codes) if code & 0x0F]
+    if len(slots) != len(players):
+        raise ValueError(f"Timeline names {len(slots)} players, got {len(players)}")
+    for slot, number in zip(slots, players):
+        codes[slot] = (codes[slot] & 0xF0) | number
+    return blob[:start] + bytes(codes) + blob[start + count:]
+
+
+def decode_events(home_team: str, away_team: str, blob: bytes) -> List[Dict[str, Any]]:
+    """Expand an encoded timeline back into the stored event dict format"""
+    version, count = _HEADER.unpack_from(blob)
+    if version != FORMAT_VERSION:
+        raise ValueError(f"Unsupported event encoding version {version}")
+
+    minutes = blob[_HEADER.size:_HEADER.size + count]
+    codes = blob[_HEADER.size + count:_HEADER.size + 2 * count]
+    kinds = [code >> 4 for code in codes]
+    teams = [
+        TEAM_NONE if kind in (KIND_HALFTIME, KIND_FULLTIME) else (TEAM_AWAY if minute & _AWAY_FLAG else TEAM_HOME)
+        for minute, kind in zip(minutes, kinds)
+    ]
+
+    return [
+        {
+            'minute': minute,
+            'event_type': event_type.value,
+            'team': team,
+            'description': description,
+            'player': player
+        }
+        for minute, event_type, team, player, description in render_events(
+            home_team, away_team, [minute & ~_AWAY_FLAG for minute in minutes], kinds, teams,
+            [code & 0x0F for code in codes]
+        )
+    ]
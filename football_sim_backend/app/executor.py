@@ -0,0 +1,147 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional
+
+from app.distribution_cache import get_cache_metrics
+
+# Web server worker processes on this host (gunicorn reads the same variable).
+# Each one starts its own simulation pool, so by default they split the cores.
+WEB_CONCURRENCY = max(int(os.getenv("WEB_CONCURRENCY", 1)), 1)
+SIMULATION_WORKERS = int(os.getenv("SIMULATION_WORKERS", max((os.cpu_count() or 1) // WEB_CONCURRENCY, 1)))
+SIMULATION_QUEUE_LIMIT = int(os.getenv("SIMULATION_QUEUE_LIMIT", SIMULATION_WORKERS * 8))
+DB_WORKERS = int(os.getenv("DB_WORKERS", 4))
+DB_QUEUE_LIMIT = int(os.getenv("DB_QUEUE_LIMIT", DB_WORKERS * 16))
+
+
+class BoundedExecutor:
+    """Runs blocking calls off the event loop with a cap on in-flight work.
+
+    Callers beyond `max_pending` wait on a semaphore instead of piling
+    more work into the pool, and the counters feed `/api/metrics`.
+    """
+
+    def __init__(self, name: str, factory: Callable[[int], Executor], max_workers: int, max_pending: int,
+                 worker_metrics: Optional[Callable[[], Dict[str, Any]]] = None):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_pending = max(max_pending, 1)
+        self._factory = factory
+        # Called in the worker after each task; the latest snapshot per
+        # worker process is kept so process-local state can be reported.
+        self._worker_metrics_fn = worker_metrics
+        self._worker_metrics: Dict[int, Dict[str, Any]] = {}
+        self._executor: Optional[Executor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.waiting = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            self._executor = self._factory(self.max_workers)
+        return self._executor
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_pending)
+            self._loop = loop
+        return self._semaphore
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        self.submitted += 1
+        self.waiting += 1
+        async with self._get_semaphore():
+            self.waiting -= 1
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            try:
+                if self._worker_metrics_fn is None:
+                    result = await asyncio.get_running_loop().run_in_executor(
+                        self._get_executor(), partial(fn, *args, **kwargs)
+                    )
+                else:
+                    result, pid, snapshot = await asyncio.get_running_loop().run_in_executor(
+                        self._get_executor(), partial(_run_and_report, self._worker_metrics_fn, fn, *args, **kwargs)
+                    )
+                    self._worker_metrics[pid] = snapshot
+            except Exception:
+                self.failed += 1
+                raise
+            finally:
+                self.in_flight -= 1
+        self.completed += 1
+        return result
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            'max_workers': self.max_workers,
+            'max_pending': self.max_pending,
+            'submitted': self.submitted,
+            'completed': self.completed,
+            'failed': self.failed,
+            'in_flight': self.in_flight,
+            'queue_depth': self.waiting + max(0, self.in_flight - self.max_workers),
+            'peak_in_flight': self.peak_in_flight
+        }
+
+    def worker_metrics(self) -> List[Dict[str, Any]]:
+        return list(self._worker_metrics.values())
+
+    def shutdown(self, wait: bool = True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+
+
+def _run_and_report(metrics_fn: Callable[[], Dict[str, Any]], fn: Callable, *args, **kwargs):
+    return fn(*args, **kwargs), os.getpid(), metrics_fn()
+
+
+def _process_pool(max_workers: int) -> Executor:
+    # spawn keeps children clear of the server's threads and open sockets
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+def _thread_pool(name: str) -> Callable[[int], Executor]:
+    return lambda max_workers: ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+
+
+# SIMULATION_WORKERS=0 keeps simulations in-process on a single thread,
+# which is handy for local development and debugging.
+simulation_executor = BoundedExecutor(
+    "simulation",
+    _process_pool if SIMULATION_WORKERS > 0 else _thread_pool("simulation"),
+    max(SIMULATION_WORKERS, 1),
+    SIMULATION_QUEUE_LIMIT,
+    worker_metrics=get_cache_metrics
+)
+db_executor = BoundedExecutor("database", _thread_pool("database"), DB_WORKERS, DB_QUEUE_LIMIT)
+
+
+async def run_simulation(fn: Callable, *args, **kwargs) -> Any:
+    return await simulation_executor.run(fn, *args, **kwargs)
+
+
+async def run_db(fn: Callable, *args, **kwargs) -> Any:
+    return await db_executor.run(fn, *args, **kwargs)
+
+
+def get_executor_metrics() -> Dict[str, Any]:
+    return {
+        simulation_executor.name: simulation_executor.metrics(),
+        db_executor.name: db_executor.metrics()
+    }
+
+
+def shutdown_executors():
+    simulation_executor.shutdown()
+    db_executor.shutdown()
@@ -0,0 +1,68 @@
+"""Provably-fair simulations.
+
+The server commits to a secret server seed by publishing its SHA-256
+hash. A simulation requested with a client seed takes the next nonce for
+that (server seed, client seed) pair, and its simulation seed is
+
+    HMAC-SHA256(key=server seed, "{client seed}:{nonce}"), first 53 bits
+
+run on the counter-based sha256 backend. Once the server seed is rotated
+out and revealed, anyone can check it against the published hash,
+recompute the simulation seed and recompute any single draw of the
+simulation with `fair_draw`, without generating the draws before it.
+"""
+import hashlib
+import secrets
+from typing import Any, Dict, List, Sequence, Tuple
+
+from app.models import MatchSimulationRequest
+from app.rng_engine import HashRandom, hash_seed
+
+FAIR_RNG_BACKEND = "sha256"
+
+
+def new_server_seed() -> str:
+    return secrets.token_hex(32)
+
+
+def server_seed_hash(server_seed: str) -> str:
+    """Published commitment to a server seed"""
+    return hashlib.sha256(server_seed.encode()).hexdigest()
+
+
+def fair_seed(server_seed: str, client_seed: str, nonce: int) -> int:
+    return hash_seed(f"{client_seed}:{nonce}", key=server_seed)
+
+
+def fair_draw(server_seed: str, client_seed: str, nonce: int, index: int, stream: int = 0) -> float:
+    """Uniform draw number `index` of a fair simulation's stream, in O(1)"""
+    return HashRandom(fair_seed(server_seed, client_seed, nonce), stream).value(index)
+
+
+def fair_request(request: MatchSimulationRequest, server_seed: Dict[str, Any],
+                 nonce: int) -> Tuple[MatchSimulationRequest, Dict[str, Any]]:
+    """The request pinned to its fair seed, plus the fairness record to publish and store"""
+    seed = fair_seed(server_seed['server_seed'], request.client_seed, nonce)
+    fairness = {
+        'server_seed_id': server_seed['id'],
+        'server_seed_hash': server_seed['server_seed_hash'],
+        'client_seed': request.client_seed,
+        'nonce': nonce
+    }
+    return request.model_copy(update={'seed': seed, 'rng_backend': FAIR_RNG_BACKEND}), fairness
+
+
+def verify_fair_simulation(server_seed: str, client_seed: str, nonce: int,
+                           draw_indices: Sequence[int] = ()) -> Dict[str, Any]:
+    """Everything a player needs to check a simulation once its server seed is revealed"""
+    seed = fair_seed(server_seed, client_seed, nonce)
+    stream = HashRandom(seed)
+    draws: List[Dict[str, Any]] = [{'index': index, 'value': stream.value(index)} for index in draw_indices]
+    return {
+        'server_seed_hash': server_seed_hash(server_seed),
+        'client_seed': client_seed,
+        'nonce': nonce,
+        'seed': seed,
+        'rng_backend': FAIR_RNG_BACKEND,
+        'draws': draws
+    }
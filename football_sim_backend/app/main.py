@@ -1,16 +1,36 @@
 from fastapi import FastAPI, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
+from contextlib import asynccontextmanager
+import asyncio
+import json
 import psycopg
-from typing import Optional
-from app.models import MatchSimulationRequest, MatchSimulationResponse, RTPConfig, Market
-from app.match_simulator import FootballMatchSimulator
-from app.betting_logic import BettingEngine, get_supported_markets
-from app.database import save_simulation, get_simulations, get_simulation_stats, get_rtp_trends, get_count, get_player_stats, get_all_players
+from typing import List, Optional
+from app.models import ExpectedReturnRequest, FairnessVerifyRequest, MatchSimulationRequest, MatchSimulationResponse, RTPConfig, Market
+from app.betting_logic import compile_outcome, get_supported_markets
+from app.simulation_service import simulate_single, simulate_many
+from app.rtp_calculator import calculate_expected_return
+from app.distribution_cache import merge_cache_metrics
+from app.executor import simulation_executor, run_simulation, run_db, get_executor_metrics, shutdown_executors
+from app.replay import get_replay_cache_metrics
+from app.rng_engine import RNG_BACKENDS
+from app.fairness import FAIR_RNG_BACKEND, fair_request, verify_fair_simulation
+from app.write_behind import simulation_writer, persist_simulations, WriteQueueFull
+from app.database import DEFAULT_TEAM_MATCH, HISTORY_FIELDS, TEAM_MATCH_MODES, close_db_connections, encode_history_cursor, get_simulations, get_simulation_events, get_simulation_stats, get_rtp_trends, get_count, get_count_cache_metrics, get_player_stats, get_all_players, get_active_server_seed, get_server_seed, reserve_fair_nonces, rotate_server_seed
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    simulation_writer.stop()
+    shutdown_executors()
+    close_db_connections()
+
 
 app = FastAPI(
     title="Football Match Simulator API",
     description="Simulates football matches with betting outcomes based on RTP and probability inputs",
-    version="2.0.0"
+    version="2.0.0",
+    lifespan=lifespan
 )
 
 current_rtp = 0.96
@@ -42,6 +62,24 @@ async def set_rtp(config: RTPConfig):
     return RTPConfig(rtp=current_rtp)
 
 
+@app.post("/api/rtp/expected")
+async def get_expected_return(request: ExpectedReturnRequest):
+    """Exact win probability, expected payout and effective RTP of a bet slip"""
+    _validate_bet_slip(request)
+    _validate_probabilities(request)
+    
+    try:
+        return calculate_expected_return(
+            request.score_probabilities,
+            request.bet_slip,
+            rtp=current_rtp if request.rtp is None else request.rtp,
+            volatility=request.volatility,
+            shared_seed=request.shared_seed
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
 @app.get("/api/markets")
 async def get_markets():
     return {
@@ -50,153 +88,343 @@ async def get_markets():
     }
 
 
+def _validate_bet_slip(request: MatchSimulationRequest):
+    for bet in request.bet_slip:
+        try:
+            compile_outcome(bet.market, bet.outcome)
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+
+
+def _validate_rng_backend(request: MatchSimulationRequest):
+    if request.rng_backend is not None and request.rng_backend not in RNG_BACKENDS:
+        raise HTTPException(status_code=422, detail=f"rng_backend must be one of {', '.join(RNG_BACKENDS)}")
+
+
+def _validate_fairness(request: MatchSimulationRequest):
+    if request.client_seed is None:
+        return
+    if request.seed is not None:
+        raise HTTPException(status_code=422, detail="seed cannot be set together with client_seed")
+    if request.rng_backend not in (None, FAIR_RNG_BACKEND):
+        raise HTTPException(status_code=422, detail=f"client_seed simulations use the {FAIR_RNG_BACKEND} rng_backend")
+
+
+def _validate_probabilities(request: MatchSimulationRequest):
+    total_probability = sum(sp.probability for sp in request.score_probabilities)
+    if total_probability <= 0:
+        raise HTTPException(
+            status_code=400, 
+            detail=f"Score probabilities must sum to a positive number (currently {total_probability})"
+        )
+
+
+async def _apply_fairness(request: MatchSimulationRequest):
+    """Pin a client_seed request to its provably-fair seed"""
+    if request.client_seed is None:
+        return request, None
+    server_seed, nonce = await run_db(reserve_fair_nonces, request.client_seed)
+    return fair_request(request, server_seed, nonce)
+
+
 @app.post("/api/simulate", response_model=MatchSimulationResponse)
 async def simulate_match(request: MatchSimulationRequest):
     try:
         global current_rtp
         
-        total_probability = sum(sp.probability for sp in request.score_probabilities)
-        if total_probability <= 0:
-            raise HTTPException(
-                status_code=400, 
-                detail=f"Score probabilities must sum to a positive number (currently {total_probability})"
-            )
+        _validate_bet_slip(request)
+        _validate_rng_backend(request)
+        _validate_fairness(request)
+        _validate_probabilities(request)
         
-        betting_engine = BettingEngine(rtp=current_rtp)
+        request, fairness = await _apply_fairness(request)
         
-        from app.rng_engine import FootballRNG
-        temp_rng = FootballRNG(request.seed)
+        response, simulation_data = await run_simulation(simulate_single, request, current_rtp, fairness)
+        await persist_simulations([simulation_data])
         
-        adjusted_probabilities = request.score_probabilities
-        for bet in request.bet_slip:
-            rng_value = temp_rng.next_random()
-            adjusted_probabilities = betting_engine.adjust_probabilities_for_bet(
-                score_probabilities=adjusted_probabilities,
-                bet_selection=bet,
-                rng_value=rng_value
-            )
-        
-        simulator = FootballMatchSimulator(
-            home_team=request.home_team,
-            away_team=request.away_team,
-            score_probabilities=adjusted_probabilities,
-            rtp=current_rtp,
-            volatility=request.volatility,
-            seed=request.seed
-        )
-        
-        events, stats = simulator.simulate_match()
-        
-        bet_results = []
-        for bet in request.bet_slip:
-            result = betting_engine.evaluate_bet(
-                bet_selection=bet,
-                home_team=request.home_team,
-                away_team=request.away_team,
-                home_score=simulator.home_score,
-                away_score=simulator.away_score
-            )
-            bet_results.append(result)
-        
-        bet_slip_won = all(result.won for result in bet_results)
-        
-        any_bet_has_stake = any(bet.stake is not None for bet in request.bet_slip)
-        
-        if any_bet_has_stake:
-            total_stake = sum(bet.stake for bet in request.bet_slip if bet.stake is not None)
-            total_payout = sum(result.payout for result in bet_results if result.payout is not None)
-            total_profit = total_payout - total_stake
-        else:
-            total_stake = None
-            total_payout = None
-            total_profit = None
+        return response
+    
+    except HTTPException:
+        raise
+    except WriteQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# Upper bound on the live pace: a 90-minute match in 90 real minutes
+MAX_SECONDS_PER_MINUTE = 60.0
+
+
+def _sse(event: str, data: str, event_id: Optional[int] = None) -> str:
+    message = f"event: {event}\ndata: {data}\n\n"
+    return message if event_id is None else f"id: {event_id}\n{message}"
+
+
+@app.post("/api/simulate/stream")
+async def simulate_match_stream(
+    request: MatchSimulationRequest,
+    seconds_per_minute: float = Query(
+        0.0, ge=0.0, le=MAX_SECONDS_PER_MINUTE,
+        description="Real seconds per match minute (0 sends every event immediately)"
+    )
+):
+    """Play a match out live as Server-Sent Events.
+
+    Each `event` message carries one MatchEvent; a final `result` message
+    carries the bet results and match stats. The stream replays a result
+    that is already computed: the whole match is simulated on the simulation
+    pool, as /api/simulate does, and its bets are settled and stored before
+    the stream opens. The event loop then only paces the finished timeline,
+    so a client that disconnects early cannot lose or double-store it.
+    """
+    try:
+        _validate_bet_slip(request)
+        _validate_rng_backend(request)
+        _validate_fairness(request)
+        _validate_probabilities(request)
         
-        response = MatchSimulationResponse(
-            home_team=request.home_team,
-            away_team=request.away_team,
-            final_score={
-                request.home_team: simulator.home_score,
-                request.away_team: simulator.away_score
-            },
-            bet_results=bet_results,
-            bet_slip_won=bet_slip_won,
-            total_stake=total_stake,
-            total_payout=total_payout,
-            total_profit=total_profit,
-            events=events,
-            match_stats=stats,
-            simulation_metadata={
-                "rtp": current_rtp,
-                "volatility": request.volatility,
-                "seed": simulator.rng.get_seed(),
-                "total_events": len(events),
-                "number_of_bets": len(request.bet_slip)
-            }
-        )
+        request, fairness = await _apply_fairness(request)
         
-        simulation_data = {
-            'user_id': request.user_id,
-            'home_team': request.home_team,
-            'away_team': request.away_team,
-            'home_score': simulator.home_score,
-            'away_score': simulator.away_score,
-            'bet_slip_won': bet_slip_won,
-            'total_stake': total_stake,
-            'total_payout': total_payout,
-            'total_profit': total_profit,
-            'configured_rtp': current_rtp,
-            'seed': simulator.rng.get_seed(),
-            'volatility': request.volatility,
-            'total_events': len(events),
-            'number_of_bets': len(request.bet_slip),
-            'bet_results': [result.dict() for result in bet_results],
-            'events': [event.dict() for event in events],
-            'match_stats': stats
-        }
-        save_simulation(simulation_data)
-        
-        return response
+        response, simulation_data = await run_simulation(simulate_single, request, current_rtp, fairness)
+        await persist_simulations([simulation_data])
     
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except WriteQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    
+    async def stream_events():
+        loop = asyncio.get_running_loop()
+        kickoff = loop.time()
+        for index, event in enumerate(response.events):
+            if seconds_per_minute:
+                delay = kickoff + event.minute * seconds_per_minute - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            yield _sse("event", event.model_dump_json(), index)
+        
+        yield _sse("result", response.model_dump_json(exclude={'events'}))
+    
+    return StreamingResponse(
+        stream_events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+MAX_BATCH_SIZE = 1000
+BATCH_CHUNK_SIZE = 100
+
+
+@app.post("/api/simulate/batch")
+async def simulate_match_batch(requests: List[MatchSimulationRequest]):
+    """Simulate many matches in one pass, streaming one NDJSON line per match"""
+    if not requests:
+        raise HTTPException(status_code=400, detail="Batch must contain at least one simulation")
+    if len(requests) > MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Batch size {len(requests)} exceeds the maximum of {MAX_BATCH_SIZE}"
+        )
+    
+    rtp = current_rtp
+    
+    errors = {}
+    accepted = []
+    for index, request in enumerate(requests):
+        try:
+            _validate_bet_slip(request)
+            _validate_rng_backend(request)
+            _validate_fairness(request)
+            _validate_probabilities(request)
+            accepted.append(index)
+        except HTTPException as e:
+            errors[index] = e.detail
+    
+    # Nonces are reserved per client seed, one block per batch, in request order.
+    # Fair requests are pinned copies; the caller's requests are left as sent.
+    fairness = {}
+    pinned = {}
+    fair_requests = {}
+    for index in accepted:
+        if requests[index].client_seed is not None:
+            fair_requests.setdefault(requests[index].client_seed, []).append(index)
+    for client_seed, indexes in fair_requests.items():
+        server_seed, nonce = await run_db(reserve_fair_nonces, client_seed, len(indexes))
+        for offset, index in enumerate(indexes):
+            pinned[index], fairness[index] = fair_request(requests[index], server_seed, nonce + offset)
+    
+    # Chunks run concurrently on the simulation pool and are streamed in order
+    chunks = [accepted[i:i + BATCH_CHUNK_SIZE] for i in range(0, len(accepted), BATCH_CHUNK_SIZE)]
+    tasks = [
+        asyncio.ensure_future(run_simulation(
+            simulate_many, [pinned.get(index, requests[index]) for index in chunk], rtp,
+            [fairness.get(index) for index in chunk]
+        ))
+        for chunk in chunks
+    ]
+    
+    async def stream_results():
+        records = []
+        results = {}
+        next_chunk = 0
+        try:
+            for index in range(len(requests)):
+                if index not in errors and index not in results:
+                    chunk = chunks[next_chunk]
+                    next_chunk += 1
+                    try:
+                        results.update(zip(chunk, await tasks[next_chunk - 1]))
+                    except Exception as e:
+                        # A failed chunk reports an error line per match and the stream goes on
+                        errors.update(dict.fromkeys(chunk, str(e)))
+                
+                if index in errors:
+                    yield json.dumps({"index": index, "error": errors[index]}) + "\n"
+                    continue
+                
+                response, simulation_data = results[index]
+                records.append(simulation_data)
+                yield f'{{"index": {index}, "result": {response.model_dump_json()}}}\n'
+        finally:
+            for task in tasks:
+                task.cancel()
+            if records:
+                await asyncio.shield(persist_simulations(records))
+    
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+
+@app.get("/api/fairness")
+async def get_fairness():
+    """Hash of the active server seed, published before any simulation uses it"""
+    return await run_db(get_active_server_seed)
+
+
+@app.post("/api/fairness/rotate")
+async def rotate_fairness_seed():
+    """Reveal the active server seed and commit to a new one"""
+    return await run_db(rotate_server_seed)
+
+
+@app.get("/api/fairness/seeds/{server_seed_id}")
+async def get_fairness_seed(server_seed_id: int):
+    server_seed = await run_db(get_server_seed, server_seed_id)
+    if server_seed is None:
+        raise HTTPException(status_code=404, detail="Server seed not found")
+    return server_seed
+
+
+@app.post("/api/fairness/verify")
+async def verify_fairness(request: FairnessVerifyRequest):
+    """Recompute a provably-fair simulation's seed and any of its draws from the revealed server seed"""
+    if any(index < 0 for index in request.draw_indices):
+        raise HTTPException(status_code=422, detail="draw_indices must be non-negative")
+    return verify_fair_simulation(request.server_seed, request.client_seed, request.nonce, request.draw_indices)
 
 
 @app.get("/api/history")
 async def get_simulation_history(
     limit: int = Query(50, ge=1, le=200),
     offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="Opaque next_cursor from a previous page; replaces offset"),
+    total: str = Query("exact", description="Total count mode: exact, approximate or none"),
     team: Optional[str] = Query(None, description="Filter by team name"),
+    team_match: str = Query(DEFAULT_TEAM_MATCH, description="Team matching: substring, exact, prefix or fuzzy (scans every team name)"),
     won: Optional[bool] = Query(None, description="Filter by bet slip won/lost"),
-    user_id: Optional[str] = Query(None, description="Filter by user/player ID")
+    user_id: Optional[str] = Query(None, description="Filter by user/player ID"),
+    fields: str = Query("full", description="summary omits bet_results, events and match_stats")
 ):
     """Get historical simulations with pagination and filtering"""
-    simulations = get_simulations(limit=limit, offset=offset, team=team, bet_slip_won=won, user_id=user_id)
-    total_count = get_count(team=team, bet_slip_won=won, user_id=user_id)
+    if total not in ("exact", "approximate", "none"):
+        raise HTTPException(status_code=422, detail="total must be 'exact', 'approximate' or 'none'")
+    if team_match not in TEAM_MATCH_MODES:
+        raise HTTPException(status_code=422, detail=f"team_match must be one of {', '.join(TEAM_MATCH_MODES)}")
+    if fields not in HISTORY_FIELDS:
+        raise HTTPException(status_code=422, detail=f"fields must be one of {', '.join(HISTORY_FIELDS)}")
+    
+    try:
+        simulations = await run_db(
+            get_simulations, limit=limit + 1, offset=offset, team=team,
+            bet_slip_won=won, user_id=user_id, after=cursor, team_match=team_match,
+            fields=fields
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    has_more = len(simulations) > limit
+    simulations = simulations[:limit]
+    next_cursor = None
+    if has_more:
+        next_cursor = encode_history_cursor(simulations[-1]['created_at'], simulations[-1]['id'])
+    
+    total_count = None
+    if total != "none":
+        total_count = await run_db(
+            get_count, team=team, bet_slip_won=won, user_id=user_id,
+            approximate=total == "approximate", team_match=team_match
+        )
     
     return {
         "simulations": simulations,
         "pagination": {
             "limit": limit,
-            "offset": offset,
+            "offset": 0 if cursor else offset,
             "total": total_count,
-            "has_more": offset + limit < total_count
+            "has_more": has_more,
+            "next_cursor": next_cursor
         }
     }
 
 
+@app.get("/api/history/{simulation_id}/events")
+async def get_simulation_history_events(simulation_id: int):
+    """Get the event timeline of a single historical simulation"""
+    events = await run_db(get_simulation_events, simulation_id)
+    if events is None:
+        raise HTTPException(status_code=404, detail=f"Simulation {simulation_id} not found")
+    return {"simulation_id": simulation_id, "events": events}
+
+
 @app.get("/api/stats")
 async def get_stats():
     """Get overall simulation statistics including RTP analysis"""
-    return get_simulation_stats()
+    return await run_db(get_simulation_stats)
 
 
 @app.get("/api/rtp-trends")
 async def get_rtp_trend_data(
-    limit: int = Query(100, ge=10, le=500, description="Number of recent simulations to analyze")
+    limit: int = Query(100, ge=10, le=500, description="Number of recent simulations (or buckets) to analyze"),
+    windows: str = Query("10", description="Comma-separated rolling window sizes, e.g. 10,50,100"),
+    bucket: Optional[str] = Query(None, description="Aggregate per minute, hour or day instead of per simulation"),
+    since: Optional[str] = Query(None, description="Only include simulations created at or after this timestamp"),
+    order: str = Query("latest", description="latest: most recent points; earliest: oldest points")
 ):
     """Get RTP trends over time with cumulative and rolling window calculations"""
+    try:
+        window_sizes = [int(size) for size in windows.split(",") if size.strip()]
+    except ValueError:
+        raise HTTPException(status_code=422, detail=f"Invalid window sizes: {windows}")
+    if order not in ("latest", "earliest"):
+        raise HTTPException(status_code=422, detail="order must be 'latest' or 'earliest'")
+    
+    try:
+        trends = await run_db(
+            get_rtp_trends, limit=limit, windows=window_sizes, bucket=bucket,
+            since=since, latest=order == "latest"
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    
     return {
-        "trends": get_rtp_trends(limit=limit),
+        "trends": trends,
+        "windows": window_sizes,
+        "bucket": bucket,
         "description": "RTP trends showing configured vs actual RTP over time"
     }
 
@@ -205,7 +433,7 @@ async def get_rtp_trend_data(
 async def get_players():
     """Get list of all players with their statistics"""
     return {
-        "players": get_all_players(),
+        "players": await run_db(get_all_players),
         "description": "All players who have placed bets with their stats"
     }
 
@@ -213,7 +441,7 @@ async def get_players():
 @app.get("/api/players/{user_id}/stats")
 async def get_player_statistics(user_id: str):
     """Get detailed statistics for a specific player"""
-    stats = get_player_stats(user_id)
+    stats = await run_db(get_player_stats, user_id)
     
     if stats['total_simulations'] == 0:
         raise HTTPException(
@@ -224,6 +452,18 @@ async def get_player_statistics(user_id: str):
     return stats
 
 
+@app.get("/api/metrics")
+async def get_metrics():
+    """Get worker pool sizes, queue depths, write-behind throughput and cache hit rates"""
+    return {
+        "executors": get_executor_metrics(),
+        "write_behind": simulation_writer.metrics(),
+        "replay_cache": get_replay_cache_metrics(),
+        "distribution_cache": merge_cache_metrics(simulation_executor.worker_metrics()),
+        "history_count_cache": get_count_cache_metrics()
+    }
+
+
 @app.get("/api/example")
 async def get_example_request():
     return {
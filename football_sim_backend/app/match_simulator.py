@@ -1,23 +1,225 @@
-from typing import List, Tuple, Dict
+import heapq
+import os
+from bisect import bisect_right
+from functools import lru_cache
+from typing import Dict, Iterator, List, Tuple
 from app.models import MatchEvent, EventType, ScoreProbability
-from app.rng_engine import FootballRNG, ProbabilityEngine
-import random
+from app.rng_engine import DEFAULT_RNG_BACKEND, FootballRNG, ProbabilityEngine, WeightedSampler
+
+
+REGULAR_EVENT_CHOICES = [
+    ((EventType.PASS, "passes the ball forward"), 0.35),
+    ((EventType.SHOT, "attempts a shot", "forward"), 0.20),
+    ((EventType.CORNER, "wins a corner kick"), 0.15),
+    ((EventType.FOUL, "commits a foul", "midfielder"), 0.15),
+    ((EventType.OFFSIDE, "caught offside", "forward"), 0.10),
+    ((EventType.SAVE, "shot saved by the goalkeeper!", "forward"), 0.05),
+]
+REGULAR_EVENT_SAMPLER = WeightedSampler(REGULAR_EVENT_CHOICES)
+
+
+STAT_NAMES = ("shots", "shots_on_target", "corners", "fouls", "offsides", "saves", "goals")
+
+# Stats credited to the team named on the event. A save is a shot on target
+# for that team and a save for the opponent's goalkeeper.
+_TEAM_STATS_BY_EVENT_TYPE = {
+    EventType.SHOT: ("shots",),
+    EventType.GOAL: ("shots", "shots_on_target", "goals"),
+    EventType.SAVE: ("shots", "shots_on_target"),
+    EventType.CORNER: ("corners",),
+    EventType.FOUL: ("fouls",),
+    EventType.OFFSIDE: ("offsides",),
+}
+_OPPONENT_STATS_BY_EVENT_TYPE = {
+    EventType.SAVE: ("saves",),
+}
+POSSESSION_EVENT_TYPES = (EventType.PASS, EventType.SHOT, EventType.GOAL)
+
+_STAT_PLAN = {
+    event_type: (
+        _TEAM_STATS_BY_EVENT_TYPE.get(event_type, ()),
+        _OPPONENT_STATS_BY_EVENT_TYPE.get(event_type, ()),
+        event_type in POSSESSION_EVENT_TYPES
+    )
+    for event_type in {*_TEAM_STATS_BY_EVENT_TYPE, *_OPPONENT_STATS_BY_EVENT_TYPE, *POSSESSION_EVENT_TYPES}
+}
+
+HALF_NAMES = ("first_half", "second_half")
+HALFTIME_MINUTE = 45
+FULLTIME_MINUTE = 90
+
+# Goals are scheduled at distinct minutes of range(5, 90)
+GOAL_MINUTES = range(5, 90)
+
+# shuffle permutes every goal minute and assigns teams in draw order, the
+# schedule of every historic seed; floyd samples only the k minutes needed
+# (Floyd's algorithm) and assigns teams in minute order. Both give the
+# same distribution of schedules.
+GOAL_SCHEDULES = ("shuffle", "floyd")
+DEFAULT_GOAL_SCHEDULE = "shuffle"
+# Schedule for new simulations
+GOAL_SCHEDULE = os.getenv("GOAL_SCHEDULE", "floyd")
+
+# minute_walk steps the clock 1-3 minutes at a time with a 0.3 chance of an
+# event per step, the timeline of every historic seed; it can step over
+# half-time and past a goal at minute 89. events draws the gap to the next
+# event directly and merges goals, events and half-time in minute order.
+TIMELINES = ("minute_walk", "events")
+DEFAULT_TIMELINE = "minute_walk"
+TIMELINE = os.getenv("TIMELINE", "events")
+# Regular events per minute in the events timeline (at most one a minute)
+DEFAULT_EVENT_RATE = 0.15
+EVENT_RATE = float(os.getenv("EVENT_RATE", DEFAULT_EVENT_RATE))
+
+
+@lru_cache(maxsize=None)
+def event_gap_table(event_rate: float) -> Tuple[float, ...]:
+    """P(gap <= g) for g = 1..90 between regular events in the events timeline.
+
+    Each minute holds an event with probability `event_rate`, the
+    discrete-time Poisson process, so gaps are geometric. Picking the event
+    type afterwards splits it into one such process per event type. A gap
+    is sampled by comparing one uniform draw with this table, which the
+    batch engine shares, so no logarithms are involved.
+    """
+    return tuple(1.0 - (1.0 - event_rate) ** gap for gap in range(1, FULLTIME_MINUTE + 1))
+
+
+def _possession(home_events: int, total_events: int) -> Tuple[float, float]:
+    home_possession = (home_events / total_events * 100) if total_events > 0 else 50
+    return home_possession, 100 - home_possession
+
+
+def format_match_stats(home_team: str, away_team: str, halves: List[Dict[str, List[int]]],
+                       possession: List[List[int]], total_goals: int) -> Dict:
+    """Build the match_stats dict from per-half counters
+
+    `halves[h][stat]` holds [home, away] counts and `possession[h]` holds
+    [home possession events, all possession events] for half h.
+    """
+    def by_team(counts) -> Dict[str, int]:
+        return {home_team: counts[0], away_team: counts[1]}
+
+    def possession_by_team(home_events: int, total_events: int) -> Dict[str, float]:
+        home_possession, away_possession = _possession(home_events, total_events)
+        return {home_team: round(home_possession, 1), away_team: round(away_possession, 1)}
+
+    totals = {
+        stat: [sum(half[stat][side] for half in halves) for side in (0, 1)]
+        for stat in STAT_NAMES
+    }
+
+    return {
+        'possession': possession_by_team(sum(p[0] for p in possession), sum(p[1] for p in possession)),
+        'shots': by_team(totals['shots']),
+        'corners': by_team(totals['corners']),
+        'fouls': by_team(totals['fouls']),
+        'total_goals': total_goals,
+        'shots_on_target': by_team(totals['shots_on_target']),
+        'saves': by_team(totals['saves']),
+        'offsides': by_team(totals['offsides']),
+        'halves': {
+            name: dict(
+                {stat: by_team(half[stat]) for stat in STAT_NAMES},
+                possession=possession_by_team(*half_possession)
+            )
+            for name, half, half_possession in zip(HALF_NAMES, halves, possession)
+        }
+    }
+
+
+class MatchStatsAccumulator:
+    """Match statistics, split by half, updated as each event is recorded.
+
+    Like the rest of the simulator, teams are matched by name, so a
+    fixture between two identically named teams credits both sides.
+    """
+
+    def __init__(self, home_team: str, away_team: str):
+        self.home_team = home_team
+        self.away_team = away_team
+        self.halves = [{stat: [0, 0] for stat in STAT_NAMES} for _ in HALF_NAMES]
+        self.possession = [[0, 0] for _ in HALF_NAMES]
+
+    def add(self, event: MatchEvent):
+        plan = _STAT_PLAN.get(event.event_type)
+        if plan is None:
+            return
+        team_stats, opponent_stats, is_possession = plan
+
+        half = 0 if event.minute <= HALFTIME_MINUTE else 1
+        counts = self.halves[half]
+        is_home = event.team == self.home_team
+        is_away = event.team == self.away_team
+        for side, credited in ((0, is_home), (1, is_away)):
+            if credited:
+                for stat in team_stats:
+                    counts[stat][side] += 1
+                for stat in opponent_stats:
+                    counts[stat][1 - side] += 1
+
+        if is_possession:
+            self.possession[half][1] += 1
+            if is_home:
+                self.possession[half][0] += 1
+
+    def to_dict(self, total_goals: int) -> Dict:
+        return format_match_stats(self.home_team, self.away_team, self.halves, self.possession, total_goals)
+
+
+# Simulator settings other than the match inputs. Each simulation stores
+# the ones that differ from these defaults so it replays the same way.
+SIMULATOR_DEFAULTS = {
+    'rng_backend': DEFAULT_RNG_BACKEND,
+    'goal_schedule': DEFAULT_GOAL_SCHEDULE,
+    'timeline': DEFAULT_TIMELINE,
+    'event_rate': DEFAULT_EVENT_RATE,
+}
+
+# Settings new simulations run with (the RNG backend is chosen per request)
+SIMULATOR_SETTINGS = {
+    'goal_schedule': GOAL_SCHEDULE,
+    'timeline': TIMELINE,
+    'event_rate': EVENT_RATE,
+}
+
+
+def validate_engine(goal_schedule: str, timeline: str, event_rate: float):
+    if goal_schedule not in GOAL_SCHEDULES:
+        raise ValueError(f"Unknown goal schedule '{goal_schedule}'")
+    if timeline not in TIMELINES:
+        raise ValueError(f"Unknown timeline '{timeline}'")
+    if not 0.0 < event_rate <= 1.0:
+        raise ValueError("event_rate must be in (0, 1]")
+
+
+def engine_overrides(engine: Dict) -> Dict:
+    return {name: value for name, value in engine.items() if value != SIMULATOR_DEFAULTS[name]}
 
 
 class FootballMatchSimulator:
     def __init__(self, home_team: str, away_team: str, 
                  score_probabilities: List[ScoreProbability],
-                 rtp: float = 0.96, volatility: str = "medium", seed: int = None):
+                 rtp: float = 0.96, volatility: str = "medium", seed: int = None,
+                 rng_backend: str = DEFAULT_RNG_BACKEND, goal_schedule: str = DEFAULT_GOAL_SCHEDULE,
+                 timeline: str = DEFAULT_TIMELINE, event_rate: float = DEFAULT_EVENT_RATE):
+        validate_engine(goal_schedule, timeline, event_rate)
         self.home_team = home_team
         self.away_team = away_team
         self.score_probabilities = score_probabilities
         self.rtp = rtp
         self.volatility = volatility
         
-        self.rng = FootballRNG(seed)
+        self.rng_backend = rng_backend
+        self.goal_schedule = goal_schedule
+        self.timeline = timeline
+        self.event_rate = event_rate
+        self.rng = FootballRNG(seed, rng_backend)
         self.prob_engine = ProbabilityEngine(self.rng, rtp, volatility)
         
         self.events: List[MatchEvent] = []
+        self._streamed = 0
+        self.stats = MatchStatsAccumulator(home_team, away_team)
         self.home_score = 0
         self.away_score = 0
         self.home_goals_target = 0
@@ -25,6 +227,15 @@ class FootballMatchSimulator:
         
         self.player_names = self._generate_player_names()
     
+    @property
+    def engine(self) -> Dict:
+        return {
+            'rng_backend': self.rng_backend,
+            'goal_schedule': self.goal_schedule,
+            'timeline': self.timeline,
+            'event_rate': self.event_rate
+        }
+    
     def _generate_player_names(self) -> Dict[str, List[str]]:
         home_forwards = [f"{self.home_team[0]}. Player {i}" for i in range(1, 4)]
         home_midfielders = [f"{self.home_team[0]}. Player {i}" for i in range(4, 8)]
@@ -59,9 +270,23 @@ class FootballMatchSimulator:
             else:
                 pool = self.player_names['away_defenders']
         
-        return random.choice(pool)
+        return self.rng.player_choice(pool)
     
     def simulate_match(self) -> Tuple[List[MatchEvent], Dict]:
+        for _ in self.iter_events():
+            pass
+        
+        stats = self.match_stats()
+        
+        return self.events, stats
+    
+    def iter_events(self) -> Iterator[MatchEvent]:
+        """Play the match lazily, yielding each event as soon as it is recorded.
+        
+        Draws happen in the same order as simulate_match, so a seed produces
+        the same events either way. Match stats are available once the
+        generator is exhausted.
+        """
         score_probs = [(
             (sp.home_score, sp.away_score), 
             sp.probability
@@ -70,27 +295,47 @@ class FootballMatchSimulator:
         final_score = self.prob_engine.select_final_score(score_probs)
         self.home_goals_target, self.away_goals_target = final_score
         
-        self.events.append(MatchEvent(
+        self._add_event(MatchEvent(
             minute=0,
             event_type=EventType.KICKOFF,
             team=self.home_team,
             description=f"Match kicks off at the stadium! {self.home_team} vs {self.away_team}"
         ))
+        yield from self._recorded()
         
         total_goals_needed = self.home_goals_target + self.away_goals_target
         goals_scheduled = self._schedule_goals(total_goals_needed)
         
+        if self.timeline == "events":
+            steps = self._play_events(goals_scheduled)
+        else:
+            steps = self._play_minutes(goals_scheduled)
+        for _ in steps:
+            yield from self._recorded()
+        
+        self._add_event(MatchEvent(
+            minute=FULLTIME_MINUTE,
+            event_type=EventType.FULLTIME,
+            team="",
+            description=f"Full-time: {self.home_team} {self.home_score} - {self.away_score} {self.away_team}"
+        ))
+        yield from self._recorded()
+    
+    def _recorded(self) -> Iterator[MatchEvent]:
+        while self._streamed < len(self.events):
+            self._streamed += 1
+            yield self.events[self._streamed - 1]
+    
+    def _play_minutes(self, goals_scheduled: List[Tuple[int, str]]) -> Iterator[None]:
         current_minute = 1
         goal_index = 0
         
         while current_minute <= 90:
-            if goal_index < len(goals_scheduled) and current_minute >= goals_scheduled[goal_index]['minute']:
-                self._create_goal_sequence(
-                    goals_scheduled[goal_index]['minute'],
-                    goals_scheduled[goal_index]['team']
-                )
+            if goal_index < len(goals_scheduled) and current_minute >= goals_scheduled[goal_index][0]:
+                goal_minute, scoring_team = goals_scheduled[goal_index]
+                self._create_goal_sequence(goal_minute, scoring_team)
                 goal_index += 1
-                current_minute = goals_scheduled[goal_index - 1]['minute'] + 1
+                current_minute = goal_minute + 1
             else:
                 if self.rng.next_random() < 0.3:
                     self._create_regular_event(current_minute)
@@ -98,33 +343,79 @@ class FootballMatchSimulator:
                 current_minute += self.rng.next_int(1, 3)
             
             if current_minute == 45:
-                self.events.append(MatchEvent(
-                    minute=45,
-                    event_type=EventType.HALFTIME,
-                    team="",
-                    description=f"Half-time: {self.home_team} {self.home_score} - {self.away_score} {self.away_team}"
-                ))
+                self._add_halftime(self.home_score, self.away_score)
                 current_minute = 46
-        
-        self.events.append(MatchEvent(
-            minute=90,
-            event_type=EventType.FULLTIME,
+            
+            yield
+    
+    def _play_events(self, goals_scheduled: List[Tuple[int, str]]) -> Iterator[None]:
+        """Goal sequences first, then regular events at sampled gaps (skipping
+        goal build-ups), merged in minute order with half-time after minute 45"""
+        goal_events = []
+        windows = []
+        previous_goal = 1
+        for goal_minute, scoring_team in goals_scheduled:
+            # The build-up stays in the goal's half and after the previous goal
+            first_half = goal_minute <= HALFTIME_MINUTE
+            earliest = max(previous_goal, 1 if first_half else HALFTIME_MINUTE + 1)
+            sequence = self._goal_sequence(goal_minute, scoring_team, earliest)
+            windows.append((sequence[0].minute, goal_minute))
+            goal_events.extend(sequence)
+            previous_goal = goal_minute
+        
+        gaps = event_gap_table(self.event_rate)
+        regular_events = []
+        minute = 0
+        window = 0
+        while True:
+            minute += bisect_right(gaps, self.rng.next_random()) + 1
+            if minute > FULLTIME_MINUTE:
+                break
+            while window < len(windows) and windows[window][1] < minute:
+                window += 1
+            # Play during a goal's build-up is the goal sequence itself
+            if window < len(windows) and windows[window][0] <= minute:
+                continue
+            regular_events.append(self._regular_event(minute))
+        
+        first_half_teams = [team for goal_minute, team in goals_scheduled if goal_minute <= HALFTIME_MINUTE]
+        home_halftime = sum(team == self.home_team for team in first_half_teams)
+        halftime_score = (home_halftime, len(first_half_teams) - home_halftime)
+        
+        halftime_played = False
+        for event in heapq.merge(goal_events, regular_events, key=lambda event: event.minute):
+            if not halftime_played and event.minute > HALFTIME_MINUTE:
+                self._add_halftime(*halftime_score)
+                halftime_played = True
+            self._add_event(event)
+            yield
+        if not halftime_played:
+            self._add_halftime(*halftime_score)
+    
+    def _add_halftime(self, home_score: int, away_score: int):
+        self._add_event(MatchEvent(
+            minute=HALFTIME_MINUTE,
+            event_type=EventType.HALFTIME,
             team="",
-            description=f"Full-time: {self.home_team} {self.home_score} - {self.away_score} {self.away_team}"
+            description=f"Half-time: {self.home_team} {home_score} - {away_score} {self.away_team}"
         ))
-        
-        stats = self._calculate_match_stats()
-        
-        return self.events, stats
     
-    def _schedule_goals(self, total_goals: int) -> List[Dict]:
+    def _schedule_goals(self, total_goals: int) -> List[Tuple[int, str]]:
+        """(minute, team) of each goal, in minute order"""
+        if total_goals > len(GOAL_MINUTES):
+            raise ValueError(f"Cannot schedule more than {len(GOAL_MINUTES)} goals in a match")
+        if self.goal_schedule == "floyd":
+            return self._sample_goals(total_goals)
+        return self._shuffle_goals(total_goals)
+    
+    def _shuffle_goals(self, total_goals: int) -> List[Tuple[int, str]]:
         goals = []
         
         home_remaining = self.home_goals_target
         away_remaining = self.away_goals_target
         
-        available_minutes = list(range(5, 90))
-        self.rng.rng.shuffle(available_minutes)
+        available_minutes = list(GOAL_MINUTES)
+        self.rng.shuffle(available_minutes)
         
         for i in range(total_goals):
             if home_remaining > 0 and away_remaining > 0:
@@ -141,16 +432,44 @@ class FootballMatchSimulator:
                 team = self.away_team
                 away_remaining -= 1
             
-            goals.append({
-                'minute': available_minutes[i],
-                'team': team
-            })
+            goals.append((available_minutes[i], team))
+        
+        goals.sort(key=lambda goal: goal[0])
+        
+        return goals
+    
+    def _sample_goals(self, total_goals: int) -> List[Tuple[int, str]]:
+        # Floyd's algorithm: one draw per goal for k distinct slots
+        slots = len(GOAL_MINUTES)
+        chosen = set()
+        for j in range(slots - total_goals, slots):
+            slot = self.rng.next_int(0, j)
+            chosen.add(j if slot in chosen else slot)
+        
+        home_remaining = self.home_goals_target
+        away_remaining = self.away_goals_target
         
-        goals.sort(key=lambda x: x['minute'])
+        goals = []
+        for slot in sorted(chosen):
+            # Drawing the team in proportion to the goals left makes every
+            # ordering of home and away goals equally likely
+            if home_remaining > 0 and away_remaining > 0:
+                home = self.rng.next_random() < home_remaining / (home_remaining + away_remaining)
+            else:
+                home = home_remaining > 0
+            if home:
+                home_remaining -= 1
+            else:
+                away_remaining -= 1
+            goals.append((GOAL_MINUTES[slot], self.home_team if home else self.away_team))
         
         return goals
     
     def _create_goal_sequence(self, minute: int, scoring_team: str):
+        for event in self._goal_sequence(minute, scoring_team):
+            self._add_event(event)
+    
+    def _goal_sequence(self, minute: int, scoring_team: str, earliest: int = 1) -> List[MatchEvent]:
         player = self._get_random_player(scoring_team, "forward")
         
         buildup_events = [
@@ -158,15 +477,17 @@ class FootballMatchSimulator:
             (EventType.PASS, f"{scoring_team} building up the attack"),
         ]
         
-        for i, (event_type, desc) in enumerate(buildup_events):
-            self.events.append(MatchEvent(
-                minute=max(1, minute - len(buildup_events) + i),
+        sequence = [
+            MatchEvent(
+                minute=max(earliest, minute - len(buildup_events) + i),
                 event_type=event_type,
                 team=scoring_team,
                 description=desc
-            ))
+            )
+            for i, (event_type, desc) in enumerate(buildup_events)
+        ]
         
-        self.events.append(MatchEvent(
+        sequence.append(MatchEvent(
             minute=minute,
             event_type=EventType.SHOT,
             team=scoring_team,
@@ -179,34 +500,23 @@ class FootballMatchSimulator:
         else:
             self.away_score += 1
         
-        self.events.append(MatchEvent(
+        sequence.append(MatchEvent(
             minute=minute,
             event_type=EventType.GOAL,
             team=scoring_team,
             player=player,
             description=f"⚽ GOAL! {player} scores for {scoring_team}! {self.home_team} {self.home_score} - {self.away_score} {self.away_team}"
         ))
+        
+        return sequence
     
     def _create_regular_event(self, minute: int):
+        self._add_event(self._regular_event(minute))
+    
+    def _regular_event(self, minute: int) -> MatchEvent:
         team = self.home_team if self.rng.next_random() < 0.5 else self.away_team
         
-        event_choices = [
-            (EventType.PASS, "passes the ball forward"),
-            (EventType.SHOT, "attempts a shot", "forward"),
-            (EventType.CORNER, "wins a corner kick"),
-            (EventType.FOUL, "commits a foul", "midfielder"),
-            (EventType.OFFSIDE, "caught offside", "forward"),
-            (EventType.SAVE, "shot saved by the goalkeeper!", "forward"),
-        ]
-        
-        choice = self.rng.weighted_choice([
-            (event_choices[0], 0.35),
-            (event_choices[1], 0.20),
-            (event_choices[2], 0.15),
-            (event_choices[3], 0.15),
-            (event_choices[4], 0.10),
-            (event_choices[5], 0.05),
-        ])
+        choice = self.rng.sample(REGULAR_EVENT_SAMPLER)
         
         event_type = choice[0]
         action = choice[1]
@@ -216,46 +526,18 @@ class FootballMatchSimulator:
         
         description = f"{player} {action}"
         
-        self.events.append(MatchEvent(
+        return MatchEvent(
             minute=minute,
             event_type=event_type,
             team=team,
             player=player,
             description=description
-        ))
+        )
     
-    def _calculate_match_stats(self) -> Dict:
-        home_shots = sum(1 for e in self.events if e.team == self.home_team and e.event_type in [EventType.SHOT, EventType.GOAL])
-        away_shots = sum(1 for e in self.events if e.team == self.away_team and e.event_type in [EventType.SHOT, EventType.GOAL])
-        
-        home_corners = sum(1 for e in self.events if e.team == self.home_team and e.event_type == EventType.CORNER)
-        away_corners = sum(1 for e in self.events if e.team == self.away_team and e.event_type == EventType.CORNER)
-        
-        home_fouls = sum(1 for e in self.events if e.team == self.home_team and e.event_type == EventType.FOUL)
-        away_fouls = sum(1 for e in self.events if e.team == self.away_team and e.event_type == EventType.FOUL)
-        
-        total_events = len([e for e in self.events if e.event_type in [EventType.PASS, EventType.SHOT, EventType.GOAL]])
-        home_events = len([e for e in self.events if e.team == self.home_team and e.event_type in [EventType.PASS, EventType.SHOT, EventType.GOAL]])
-        
-        home_possession = (home_events / total_events * 100) if total_events > 0 else 50
-        away_possession = 100 - home_possession
-        
-        return {
-            'possession': {
-                self.home_team: round(home_possession, 1),
-                self.away_team: round(away_possession, 1)
-            },
-            'shots': {
-                self.home_team: home_shots,
-                self.away_team: away_shots
-            },
-            'corners': {
-                self.home_team: home_corners,
-                self.away_team: away_corners
-            },
-            'fouls': {
-                self.home_team: home_fouls,
-                self.away_team: away_fouls
-            },
-            'total_goals': self.home_score + self.away_score
-        }
+    def _add_event(self, event: MatchEvent):
+        self.events.append(event)
+        self.stats.add(event)
+    
+    def match_stats(self) -> Dict:
+        """Stats of the events recorded so far"""
+        return self.stats.to_dict(self.home_score + self.away_score)
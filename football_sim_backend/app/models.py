@@ -56,6 +56,13 @@ class MatchSimulationRequest(BaseModel):
     bet_slip: List[BetSelection] = Field(min_length=1, description="List of bets placed")
     volatility: str = Field(default="medium", description="low, medium, or high")
     seed: Optional[int] = None
+    rng_backend: Optional[str] = Field(
+        default=None, description="Random generator: mt19937, pcg64, philox or sha256 (defaults to RNG_BACKEND)"
+    )
+    client_seed: Optional[str] = Field(
+        default=None, min_length=1, max_length=64,
+        description="Provably-fair mode: the seed is derived from the server seed, this client seed and a nonce"
+    )
 
 
 class BetResult(BaseModel):
@@ -88,6 +95,26 @@ class RTPConfig(BaseModel):
     rtp: float = Field(ge=0.0, le=1.0, description="Return to Player percentage")
 
 
+class ExpectedReturnRequest(BaseModel):
+    score_probabilities: List[ScoreProbability]
+    bet_slip: List[BetSelection] = Field(min_length=1, description="List of bets placed")
+    volatility: str = Field(default="medium", description="low, medium, or high")
+    rtp: Optional[float] = Field(default=None, ge=0.0, le=1.0, description="Defaults to the configured RTP")
+    shared_seed: bool = Field(
+        default=True,
+        description="Bet gates and the final score share the simulation seed, as in every simulation; false prices them as independent draws"
+    )
+
+
+class FairnessVerifyRequest(BaseModel):
+    server_seed: str
+    client_seed: str
+    nonce: int = Field(ge=0)
+    draw_indices: List[int] = Field(
+        default=[], max_length=1000, description="Positions in the simulation's main random stream to recompute"
+    )
+
+
 class Market(BaseModel):
     market_type: MarketType
     name: str
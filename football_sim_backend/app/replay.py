@@ -0,0 +1,77 @@
+"""Seed-only storage: rebuild stored timelines by replaying the simulator.
+
+A replayable row keeps the score probabilities the simulator was given
+(after bet adjustments) plus its seed, volatility and RTP. Rows written
+before player picks were derived from the seed also carry the picked
+player numbers, one hex digit per player event.
+"""
+import json
+import os
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.event_codec import decode_events, encode_events, replace_players
+from app.match_simulator import FootballMatchSimulator
+from app.models import ScoreProbability
+
+REPLAY_CACHE_SIZE = int(os.getenv("REPLAY_CACHE_SIZE", 1024))
+
+
+def replay_inputs(simulation_data: Dict[str, Any]) -> str:
+    """Serialized simulator inputs for a simulation record"""
+    return json.dumps({
+        'score_probabilities': [
+            [sp.home_score, sp.away_score, sp.probability] for sp in simulation_data['score_probabilities']
+        ]
+    }, separators=(',', ':'))
+
+
+@lru_cache(maxsize=REPLAY_CACHE_SIZE)
+def _replay(home_team: str, away_team: str, seed: int, volatility: str, rtp: float, inputs: str,
+            engine: Optional[str]):
+    spec = json.loads(inputs)
+    simulator = FootballMatchSimulator(
+        home_team=home_team,
+        away_team=away_team,
+        score_probabilities=[
+            ScoreProbability(home_score=home, away_score=away, probability=probability)
+            for home, away, probability in spec['score_probabilities']
+        ],
+        rtp=rtp,
+        volatility=volatility,
+        seed=seed,
+        **json.loads(engine or "{}")
+    )
+    events, stats = simulator.simulate_match()
+
+    blob = encode_events(home_team, away_team, [event.model_dump() for event in events])
+    if blob is None:
+        raise ValueError(f"Replayed timeline for seed {seed} cannot be encoded")
+    if 'players' in spec:
+        blob = replace_players(blob, [int(digit, 16) for digit in spec['players']])
+
+    return blob, json.dumps(stats), simulator.home_score, simulator.away_score
+
+
+def replay_simulation(home_team: str, away_team: str, seed: int, volatility: str, rtp: float,
+                      inputs: str, engine: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Dict, int, int]:
+    """Replay a stored simulation: (events, match_stats, home_score, away_score)
+
+    `engine` is the stored JSON of non-default simulator settings.
+    Recently replayed matches are served from an LRU cache; the cached
+    entry is kept encoded so callers always get fresh objects.
+    """
+    blob, stats, home_score, away_score = _replay(home_team, away_team, seed, volatility, rtp, inputs, engine)
+    return decode_events(home_team, away_team, blob), json.loads(stats), home_score, away_score
+
+
+def get_replay_cache_metrics() -> Dict[str, Any]:
+    info = _replay.cache_info()
+    lookups = info.hits + info.misses
+    return {
+        'size': info.currsize,
+        'max_size': info.maxsize,
+        'hits': info.hits,
+        'misses': info.misses,
+        'hit_rate': round(info.hits / lookups, 4) if lookups else 0.0
+    }
@@ -1,26 +1,246 @@
+import os
 import random
 import hashlib
-import time
-from typing import List, Tuple
+import hmac
+import secrets
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from itertools import accumulate
+from typing import Any, List, MutableSequence, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from app.distribution_cache import score_sampler_cache
+
+
+PLAYER_STREAM = 1
+# Stream ids below this are reserved for named substreams like PLAYER_STREAM;
+# GeneratorRandom.spawn hands out the ids above it
+_RESERVED_STREAMS = 16
+
+# mt19937 is random.Random, the generator every historic seed was drawn
+# from; pcg64 and philox are NumPy bit generators; sha256 is counter-based
+# (any draw can be computed on its own) and backs provably-fair simulations
+RNG_BACKENDS = ("mt19937", "pcg64", "philox", "sha256")
+DEFAULT_RNG_BACKEND = "mt19937"
+# Backend for new simulations that do not ask for one
+RNG_BACKEND = os.getenv("RNG_BACKEND", DEFAULT_RNG_BACKEND)
+
+_BIT_GENERATORS = {"pcg64": np.random.PCG64, "philox": np.random.Philox}
+# sha256 doubles keep the top 53 bits of each 64-bit word, as random.Random does
+_INV_2_53 = 1.0 / 9007199254740992.0
+
+
+# Seeds are returned in JSON responses; JavaScript numbers hold integers
+# exactly only up to 2**53, so wider seeds would be rounded by clients.
+SEED_BITS = 53
+
+
+def hash_seed(data: str, key: Optional[str] = None) -> int:
+    """53-bit seed from the SHA-256 of `data`, or its HMAC-SHA256 under `key`"""
+    if key is None:
+        digest = hashlib.sha256(data.encode()).digest()
+    else:
+        digest = hmac.new(key.encode(), data.encode(), hashlib.sha256).digest()
+    return int.from_bytes(digest[:8], "big") >> (64 - SEED_BITS)
+
+
+def new_seed() -> int:
+    """Fresh 53-bit seed from OS entropy.
+
+    Clock-derived seeds repeat whenever two workers seed in the same
+    microsecond; 53 random bits make a repeat unlikely while staying
+    exact in JSON for JavaScript clients.
+    """
+    return secrets.randbits(SEED_BITS)
+
+
+def substream_seed(seed: int, stream: int) -> int:
+    """Seed of an independent substream of `seed`.
+
+    random.Random seeds MT19937 from the 32-bit words of abs(seed);
+    appending the stream id as one more word gives every (seed, stream)
+    pair its own key without disturbing the main stream.
+    """
+    seed = abs(seed)
+    words = max(1, (seed.bit_length() + 31) // 32)
+    return seed | (stream << (32 * words))
+
+
+def seed_sequence(seed: int, stream: int = 0) -> np.random.SeedSequence:
+    """SeedSequence of a NumPy backend stream; substreams are its children"""
+    if stream:
+        return np.random.SeedSequence(abs(seed), spawn_key=(stream,))
+    return np.random.SeedSequence(abs(seed), n_children_spawned=_RESERVED_STREAMS)
+
+
+def numpy_generator(backend: str, seed_seq: np.random.SeedSequence) -> np.random.Generator:
+    return np.random.Generator(_BIT_GENERATORS[backend](seed_seq))
+
+
+class UniformStream(ABC):
+    """random.Random-style draws derived from a stream of doubles.
+
+    Every draw consumes exactly one double (an int below n is
+    floor(u * n)), so a stream is fully described by its sequence of
+    doubles and the batch engine can reproduce it from bulk draws.
+    """
+    
+    @abstractmethod
+    def random(self) -> float:
+        """The next double of the stream, in [0, 1)"""
+    
+    @abstractmethod
+    def random_array(self, n: int) -> np.ndarray:
+        """The next n doubles of the stream in one draw"""
+    
+    def randbelow(self, n: int) -> int:
+        return int(self.random() * n)
+    
+    def randint(self, a: int, b: int) -> int:
+        return a + self.randbelow(b - a + 1)
+    
+    def choice(self, seq: Sequence[Any]) -> Any:
+        return seq[self.randbelow(len(seq))]
+    
+    def shuffle(self, x: MutableSequence[Any]):
+        # Same Fisher-Yates order as random.Random.shuffle
+        for i in reversed(range(1, len(x))):
+            j = self.randbelow(i + 1)
+            x[i], x[j] = x[j], x[i]
+
+
+class GeneratorRandom(UniformStream):
+    """Doubles from a NumPy bit generator, drawn in blocks"""
+    
+    BLOCK_SIZE = 256
+    
+    def __init__(self, backend: str, seed_seq: np.random.SeedSequence):
+        self.backend = backend
+        self._seed_seq = seed_seq
+        self._generator = numpy_generator(backend, seed_seq)
+        self._block: List[float] = []
+        self._pos = 0
+    
+    def random(self) -> float:
+        if self._pos == len(self._block):
+            self._block = self._generator.random(self.BLOCK_SIZE).tolist()
+            self._pos = 0
+        value = self._block[self._pos]
+        self._pos += 1
+        return value
+    
+    def random_array(self, n: int) -> np.ndarray:
+        buffered = self._block[self._pos:self._pos + n]
+        self._pos += len(buffered)
+        return np.concatenate([np.array(buffered), self._generator.random(n - len(buffered))])
+    
+    def spawn(self, n: int) -> List["GeneratorRandom"]:
+        """n statistically independent child streams, for parallel work"""
+        return [GeneratorRandom(self.backend, child) for child in self._seed_seq.spawn(n)]
+
+
+class HashRandom(UniformStream):
+    """Counter-based stream: doubles 4k..4k+3 of stream s are the four
+    64-bit words of SHA-256("{seed}:{s}:{k}"), each shifted to 53 bits.
+    
+    Any draw can be recomputed in O(1) with `value(index)`, without
+    generating the draws before it.
+    """
+    
+    def __init__(self, seed: int, stream: int = 0):
+        self.seed = abs(seed)
+        self.stream = stream
+        self._prefix = hashlib.sha256(f"{self.seed}:{stream}:".encode())
+        self._block: List[float] = []
+        self._index = 0
+    
+    def _doubles(self, block: int) -> List[float]:
+        digest = self._prefix.copy()
+        digest.update(str(block).encode())
+        words = digest.digest()
+        return [(int.from_bytes(words[i:i + 8], "big") >> 11) * _INV_2_53 for i in range(0, 32, 8)]
+    
+    def value(self, index: int) -> float:
+        """Double number `index` of the stream"""
+        return self._doubles(index // 4)[index % 4]
+    
+    def random(self) -> float:
+        lane = self._index % 4
+        if lane == 0:
+            self._block = self._doubles(self._index // 4)
+        self._index += 1
+        return self._block[lane]
+    
+    def random_array(self, n: int) -> np.ndarray:
+        return np.array([self.random() for _ in range(n)])
+
+
+def make_random(backend: str, seed: int, stream: int = 0) -> Union[random.Random, UniformStream]:
+    """Generator for one stream of `seed`: the main stream or a substream"""
+    if backend == "mt19937":
+        return random.Random(substream_seed(seed, stream) if stream else seed)
+    if backend == "sha256":
+        return HashRandom(seed, stream)
+    if backend in _BIT_GENERATORS:
+        return GeneratorRandom(backend, seed_sequence(seed, stream))
+    raise ValueError(f"Unknown RNG backend '{backend}', expected one of {', '.join(RNG_BACKENDS)}")
+
+
+class WeightedSampler:
+    """Weighted choice over a fixed table, built once and drawn from many times.
+
+    Draws bisect a precomputed cumulative array and return exactly what
+    FootballRNG.weighted_choice returns for the same random value, so
+    seeded matches replay unchanged.
+    """
+    
+    def __init__(self, choices: Sequence[Tuple[Any, float]]):
+        if not choices:
+            raise ValueError("WeightedSampler needs at least one choice")
+        self.choices = [choice for choice, _ in choices]
+        self.weights = [weight for _, weight in choices]
+        self.cumulative = list(accumulate(self.weights))
+        self.total = sum(self.weights)
+    
+    def __len__(self) -> int:
+        return len(self.choices)
+    
+    def pick(self, r: float) -> Any:
+        """Choice for a uniform value r in [0, 1)"""
+        index = bisect_left(self.cumulative, r * self.total)
+        return self.choices[min(index, len(self.choices) - 1)]
 
 
 class FootballRNG:
-    def __init__(self, seed: int = None):
+    def __init__(self, seed: int = None, backend: str = DEFAULT_RNG_BACKEND):
         if seed is None:
-            seed = int(time.time() * 1000000) % (2**32)
+            seed = new_seed()
         
         self.seed = seed
-        self.rng = random.Random(seed)
+        self.backend = backend
+        self.rng = make_random(backend, seed)
+        self._player_rng = None
     
     def get_seed(self) -> int:
         return self.seed
     
+    def player_choice(self, pool: List[str]) -> str:
+        # Player picks come from their own substream so the main stream,
+        # and with it every score and event minute, is unchanged.
+        if self._player_rng is None:
+            self._player_rng = make_random(self.backend, self.seed, PLAYER_STREAM)
+        return self._player_rng.choice(pool)
+    
     def next_random(self) -> float:
         return self.rng.random()
     
     def next_int(self, min_val: int, max_val: int) -> int:
         return self.rng.randint(min_val, max_val)
     
+    def shuffle(self, items: MutableSequence[Any]):
+        self.rng.shuffle(items)
+    
     def weighted_choice(self, choices: List[Tuple[any, float]]) -> any:
         total = sum(weight for _, weight in choices)
         r = self.next_random() * total
@@ -33,11 +253,12 @@ class FootballRNG:
         
         return choices[-1][0]
     
-    def deterministic_hash_seed(self, data: str) -> int:
-        hash_obj = hashlib.sha256(data.encode())
-        hash_hex = hash_obj.hexdigest()
-        seed = int(hash_hex[:8], 16)
-        return seed
+    def sample(self, sampler: WeightedSampler) -> Any:
+        return sampler.pick(self.next_random())
+    
+    @staticmethod
+    def deterministic_hash_seed(data: str) -> int:
+        return hash_seed(data)
 
 
 class ProbabilityEngine:
@@ -54,6 +275,15 @@ class ProbabilityEngine:
         return [(choice, prob / total) for choice, prob in probabilities]
     
     def select_final_score(self, score_probabilities: List[Tuple[Tuple[int, int], float]]) -> Tuple[int, int]:
+        return self.rng.sample(self.build_score_sampler(score_probabilities))
+    
+    def build_score_sampler(self, score_probabilities: List[Tuple[Tuple[int, int], float]]) -> WeightedSampler:
+        return score_sampler_cache.get_or_create(
+            (tuple(score_probabilities), self.volatility),
+            lambda: WeightedSampler(self.prepare_score_weights(score_probabilities))
+        )
+    
+    def prepare_score_weights(self, score_probabilities: List[Tuple[Tuple[int, int], float]]) -> List[Tuple[Tuple[int, int], float]]:
         normalized = self.normalize_probabilities(score_probabilities)
         
         if self.volatility == "high":
@@ -75,7 +305,7 @@ class ProbabilityEngine:
                     weighted_probs.append((score, prob * 0.8))
             normalized = self.normalize_probabilities(weighted_probs)
         
-        return self.rng.weighted_choice(normalized)
+        return normalized
     
     def calculate_event_probabilities(self, minute: int, target_goals: int, goals_scored: int) -> dict:
         remaining_minutes = 90 - minute
@@ -0,0 +1,202 @@
+"""Exact win probability, expected payout and RTP for a bet slip.
+
+The calculation follows the /api/simulate pipeline step by step, over
+distributions rather than sampled values:
+
+- every bet draws a uniform rng value and takes its win branch when the
+  value is below BettingEngine.win_gate, which decides how the score
+  probabilities are adjusted;
+- the simulator picks the target score from the adjusted probabilities,
+  reweighted for volatility;
+- goal minutes are a uniform sample of the available minutes and every
+  ordering of home and away goals is equally likely, under either goal
+  schedule;
+- in the minute_walk timeline, a goal scheduled for minute 89 is lost
+  when the minute counter steps from 88 straight past full time, so the
+  final score can be one goal short of the target. The events timeline
+  plays every scheduled goal.
+
+The gate values are drawn from the simulation seed, so the first bet's
+gate and the simulator's target-score pick use the same random value.
+Unseeded simulations draw one fresh seed for both, on every endpoint.
+shared_seed=False prices the gate and the pick as independent draws,
+which is how unseeded single simulations stored before that change were
+played.
+"""
+from bisect import bisect_left
+from itertools import product
+from math import comb
+from typing import Any, Dict, List, Sequence, Tuple
+
+from app.betting_logic import BettingEngine, compile_outcome
+from app.match_simulator import GOAL_MINUTES, TIMELINE
+from app.models import BetSelection, ScoreProbability
+from app.rng_engine import FootballRNG, ProbabilityEngine
+
+# Every combination of win/lose branches is enumerated
+MAX_ANALYTIC_BETS = 12
+
+LAST_GOAL_MINUTE = GOAL_MINUTES[-1]
+
+
+def _reaches(target: int) -> List[float]:
+    """Probability that the simulator's minute counter stops on `target`,
+    by starting minute. The counter advances 1-3 minutes with equal
+    probability and skips straight from 45 to 46."""
+    reach = [0.0] * (target + 4)
+    reach[target] = 1.0
+    for minute in range(target - 1, 0, -1):
+        reach[minute] = sum(reach[46 if step == 45 else step] for step in range(minute + 1, minute + 4)) / 3
+    reach[45] = reach[46]
+    return reach
+
+
+_REACHES_88 = _reaches(LAST_GOAL_MINUTE - 1)
+
+
+def _late_goal_loss(total_goals: int) -> float:
+    """Probability that one of `total_goals` scheduled goals is never played.
+
+    Only a goal at minute 89 can be lost: the counter must stop on 88 and
+    then step 3. The counter restarts the minute after the last goal
+    before it, the highest of the other goal minutes.
+    """
+    slots = len(GOAL_MINUTES)
+    if total_goals == 0 or total_goals > slots:
+        return 0.0
+
+    others = total_goals - 1
+    if others == 0:
+        reach = _REACHES_88[1]
+    else:
+        # The other goals are a uniform sample of the minutes 5-88
+        reach = sum(
+            comb(last - GOAL_MINUTES[0], others - 1) * _REACHES_88[last + 1]
+            for last in range(GOAL_MINUTES[0] + others - 1, LAST_GOAL_MINUTE)
+        ) / comb(slots - 1, others)
+
+    return total_goals / slots * reach / 3
+
+
+def _final_scores(target: Tuple[int, int], probability: float, distribution: Dict[Tuple[int, int], float],
+                  timeline: str):
+    home, away = target
+    total_goals = home + away
+    lost = probability * _late_goal_loss(total_goals) if timeline == "minute_walk" else 0.0
+    distribution[target] = distribution.get(target, 0.0) + probability - lost
+    if lost:
+        # The goal at minute 89 is a uniformly chosen one of the scheduled goals
+        if home:
+            key = (home - 1, away)
+            distribution[key] = distribution.get(key, 0.0) + lost * home / total_goals
+        if away:
+            key = (home, away - 1)
+            distribution[key] = distribution.get(key, 0.0) + lost * away / total_goals
+
+
+def _pick_intervals(score_probabilities: List[ScoreProbability], volatility: str) -> List[Tuple[Tuple[int, int], float, float]]:
+    """(score, low, high): the simulator picks `score` for rng values in (low, high]"""
+    sampler = ProbabilityEngine(FootballRNG(0), volatility=volatility).build_score_sampler([
+        ((sp.home_score, sp.away_score), sp.probability) for sp in score_probabilities
+    ])
+    intervals = []
+    low = 0.0
+    for index, score in enumerate(sampler.choices):
+        if index == len(sampler.choices) - 1:
+            high = 1.0
+        else:
+            high = min(sampler.cumulative[index] / sampler.total, 1.0)
+        intervals.append((score, low, high))
+        low = high
+    return intervals
+
+
+def _target_scores(engine: BettingEngine, score_probabilities: List[ScoreProbability],
+                   bet_slip: List[BetSelection], volatility: str, shared_seed: bool) -> Dict[Tuple[int, int], float]:
+    gates = [min(max(engine.win_gate(bet), 0.0), 1.0) for bet in bet_slip]
+    targets: Dict[Tuple[int, int], float] = {}
+
+    for should_win in product((True, False), repeat=len(bet_slip)):
+        branch_probability = 1.0
+        for gate, win in zip(gates[1:], should_win[1:]):
+            branch_probability *= gate if win else 1.0 - gate
+        if branch_probability == 0.0:
+            continue
+
+        # The first gate's rng value range for this branch
+        low, high = (0.0, gates[0]) if should_win[0] else (gates[0], 1.0)
+        if high <= low:
+            continue
+
+        adjusted = engine.adjust_probabilities_for_branches(score_probabilities, bet_slip, list(should_win))
+        for score, pick_low, pick_high in _pick_intervals(adjusted, volatility):
+            if shared_seed:
+                # Same rng value: the score is picked only inside the branch's range
+                width = max(0.0, min(high, pick_high) - max(low, pick_low))
+            else:
+                width = (high - low) * (pick_high - pick_low)
+            if width:
+                targets[score] = targets.get(score, 0.0) + branch_probability * width
+
+    return targets
+
+
+def calculate_expected_return(score_probabilities: List[ScoreProbability], bet_slip: List[BetSelection],
+                              rtp: float, volatility: str = "medium", shared_seed: bool = True,
+                              timeline: str = TIMELINE) -> Dict[str, Any]:
+    """Exact win probabilities, expected payout and effective RTP of a bet slip
+
+    `timeline` defaults to the one new simulations use.
+    """
+    if not bet_slip:
+        raise ValueError("Bet slip must contain at least one bet")
+    if len(bet_slip) > MAX_ANALYTIC_BETS:
+        raise ValueError(f"Bet slips of more than {MAX_ANALYTIC_BETS} bets cannot be priced analytically")
+    if sum(sp.probability for sp in score_probabilities) <= 0:
+        raise ValueError("Score probabilities must sum to a positive number")
+
+    engine = BettingEngine(rtp=rtp)
+    predicates = [compile_outcome(bet.market, bet.outcome) for bet in bet_slip]
+
+    final_scores: Dict[Tuple[int, int], float] = {}
+    for target, probability in _target_scores(engine, score_probabilities, bet_slip, volatility, shared_seed).items():
+        _final_scores(target, probability, final_scores, timeline)
+
+    bets = []
+    expected_payout = 0.0
+    for bet, predicate in zip(bet_slip, predicates):
+        win_probability = sum(p for (home, away), p in final_scores.items() if predicate(home, away))
+        has_stake_and_odds = bet.stake is not None and bet.odds is not None
+        payout = bet.stake * bet.odds * win_probability if has_stake_and_odds else None
+        if payout is not None:
+            expected_payout += payout
+        bets.append({
+            'market': bet.market,
+            'outcome': bet.outcome,
+            'win_gate': engine.win_gate(bet),
+            'win_probability': win_probability,
+            'expected_payout': payout
+        })
+
+    slip_win_probability = sum(
+        p for (home, away), p in final_scores.items() if all(predicate(home, away) for predicate in predicates)
+    )
+
+    stakes = [bet.stake for bet in bet_slip if bet.stake is not None]
+    total_stake = sum(stakes) if stakes else None
+
+    return {
+        'configured_rtp': rtp,
+        'volatility': volatility,
+        'shared_seed': shared_seed,
+        'timeline': timeline,
+        'bet_slip_win_probability': slip_win_probability,
+        'bets': bets,
+        'total_stake': total_stake,
+        'expected_payout': expected_payout if total_stake is not None else None,
+        'effective_rtp': expected_payout / total_stake if total_stake else None,
+        'final_score_probabilities': [
+            {'home_score': home, 'away_score': away, 'probability': p}
+            for (home, away), p in sorted(final_scores.items(), key=lambda item: -item[1])
+        ]
+    }
@@ -0,0 +1,177 @@
+from typing import Dict, List, Optional
+from app.models import MatchSimulationRequest, MatchSimulationResponse, MatchEvent, ScoreProbability
+from app.match_simulator import SIMULATOR_DEFAULTS, SIMULATOR_SETTINGS, FootballMatchSimulator, engine_overrides
+from app.batch_simulator import BatchMatchSimulator
+from app.betting_logic import BettingEngine
+from app.rng_engine import RNG_BACKEND, FootballRNG, new_seed
+
+
+def resolve_rng_backend(request: MatchSimulationRequest) -> str:
+    return request.rng_backend or RNG_BACKEND
+
+
+def resolve_seed(request: MatchSimulationRequest) -> int:
+    """The request's seed, or a fresh one shared by its bet gates and its match"""
+    return request.seed if request.seed is not None else new_seed()
+
+
+def adjust_probabilities(request: MatchSimulationRequest, betting_engine: BettingEngine, seed: Optional[int]):
+    temp_rng = FootballRNG(seed, resolve_rng_backend(request))
+    rng_values = [temp_rng.next_random() for _ in request.bet_slip]
+    
+    return betting_engine.adjust_probabilities_for_slip(
+        score_probabilities=request.score_probabilities,
+        bet_slip=request.bet_slip,
+        rng_values=rng_values
+    )
+
+
+def build_simulation_result(
+    request: MatchSimulationRequest,
+    betting_engine: BettingEngine,
+    rtp: float,
+    seed: int,
+    home_score: int,
+    away_score: int,
+    events: List[MatchEvent],
+    stats: Dict,
+    score_probabilities: Optional[List[ScoreProbability]] = None,
+    engine: Optional[Dict] = None,
+    fairness: Optional[Dict] = None
+):
+    engine = engine or dict(SIMULATOR_DEFAULTS)
+    bet_results = []
+    for bet in request.bet_slip:
+        result = betting_engine.evaluate_bet(
+            bet_selection=bet,
+            home_team=request.home_team,
+            away_team=request.away_team,
+            home_score=home_score,
+            away_score=away_score
+        )
+        bet_results.append(result)
+    
+    bet_slip_won = all(result.won for result in bet_results)
+    
+    any_bet_has_stake = any(bet.stake is not None for bet in request.bet_slip)
+    
+    if any_bet_has_stake:
+        total_stake = sum(bet.stake for bet in request.bet_slip if bet.stake is not None)
+        total_payout = sum(result.payout for result in bet_results if result.payout is not None)
+        total_profit = total_payout - total_stake
+    else:
+        total_stake = None
+        total_payout = None
+        total_profit = None
+    
+    response = MatchSimulationResponse(
+        home_team=request.home_team,
+        away_team=request.away_team,
+        final_score={
+            request.home_team: home_score,
+            request.away_team: away_score
+        },
+        bet_results=bet_results,
+        bet_slip_won=bet_slip_won,
+        total_stake=total_stake,
+        total_payout=total_payout,
+        total_profit=total_profit,
+        events=events,
+        match_stats=stats,
+        simulation_metadata={
+            "rtp": rtp,
+            "volatility": request.volatility,
+            "seed": seed,
+            "total_events": len(events),
+            "number_of_bets": len(request.bet_slip),
+            "engine": engine,
+            "fairness": fairness
+        }
+    )
+    
+    simulation_data = {
+        'user_id': request.user_id,
+        'home_team': request.home_team,
+        'away_team': request.away_team,
+        'home_score': home_score,
+        'away_score': away_score,
+        'bet_slip_won': bet_slip_won,
+        'total_stake': total_stake,
+        'total_payout': total_payout,
+        'total_profit': total_profit,
+        'configured_rtp': rtp,
+        'seed': seed,
+        'volatility': request.volatility,
+        'total_events': len(events),
+        'number_of_bets': len(request.bet_slip),
+        'bet_results': [result.model_dump() for result in bet_results],
+        'events': [event.model_dump() for event in events],
+        'match_stats': stats,
+        # Simulator inputs, kept for seed-only (replay) storage
+        'score_probabilities': score_probabilities,
+        'engine': engine_overrides(engine),
+        'fairness': fairness
+    }
+    
+    return response, simulation_data
+
+
+def simulate_single(request: MatchSimulationRequest, rtp: float, fairness: Optional[Dict] = None):
+    betting_engine = BettingEngine(rtp=rtp)
+    seed = resolve_seed(request)
+    adjusted_probabilities = adjust_probabilities(request, betting_engine, seed)
+    
+    simulator = FootballMatchSimulator(
+        home_team=request.home_team,
+        away_team=request.away_team,
+        score_probabilities=adjusted_probabilities,
+        rtp=rtp,
+        volatility=request.volatility,
+        seed=seed,
+        rng_backend=resolve_rng_backend(request),
+        **SIMULATOR_SETTINGS
+    )
+    
+    events, stats = simulator.simulate_match()
+    
+    return build_simulation_result(
+        request, betting_engine, rtp, simulator.rng.get_seed(),
+        simulator.home_score, simulator.away_score, events, stats, adjusted_probabilities,
+        simulator.engine, fairness
+    )
+
+
+def simulate_many(requests: List[MatchSimulationRequest], rtp: float,
+                  fairness: Optional[List[Optional[Dict]]] = None):
+    betting_engine = BettingEngine(rtp=rtp)
+    fairness = fairness or [None] * len(requests)
+    
+    seeds = [resolve_seed(request) for request in requests]
+    adjusted = [
+        adjust_probabilities(request, betting_engine, seed)
+        for request, seed in zip(requests, seeds)
+    ]
+    
+    # One batch run per RNG backend, results put back in request order
+    backends = [resolve_rng_backend(request) for request in requests]
+    results = [None] * len(requests)
+    for backend in dict.fromkeys(backends):
+        members = [i for i, request_backend in enumerate(backends) if request_backend == backend]
+        batch = BatchMatchSimulator().simulate(
+            score_probabilities=[adjusted[i] for i in members],
+            seeds=[seeds[i] for i in members],
+            volatility=[requests[i].volatility for i in members],
+            home_teams=[requests[i].home_team for i in members],
+            away_teams=[requests[i].away_team for i in members],
+            rng_backend=backend,
+            **SIMULATOR_SETTINGS
+        )
+        for j, i in enumerate(members):
+            results[i] = build_simulation_result(
+                requests[i], betting_engine, rtp, batch.seeds[j],
+                int(batch.home_score[j]), int(batch.away_score[j]),
+                batch.events(j), batch.match_stats(j), adjusted[i],
+                {'rng_backend': backend, **SIMULATOR_SETTINGS}, fairness[i]
+            )
+    
+    return results
@@ -0,0 +1,267 @@
+import asyncio
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from app.database import save_simulation, save_simulations
+from app.executor import run_db
+from app.models import ScoreProbability
+
+logger = logging.getLogger(__name__)
+
+WRITE_BEHIND_ENABLED = os.getenv("WRITE_BEHIND_ENABLED", "true").lower() in ("1", "true", "yes")
+WRITE_BEHIND_BATCH_SIZE = int(os.getenv("WRITE_BEHIND_BATCH_SIZE", 500))
+WRITE_BEHIND_MAX_DELAY_MS = int(os.getenv("WRITE_BEHIND_MAX_DELAY_MS", 50))
+WRITE_BEHIND_QUEUE_SIZE = int(os.getenv("WRITE_BEHIND_QUEUE_SIZE", 10000))
+WRITE_BEHIND_PUT_TIMEOUT_S = float(os.getenv("WRITE_BEHIND_PUT_TIMEOUT_S", 5))
+WRITE_BEHIND_FSYNC = os.getenv("WRITE_BEHIND_FSYNC", "false").lower() in ("1", "true", "yes")
+# Batches that still fail after the retries are appended here as JSON lines;
+# 'python -m app.cli retry-dead-letters' inserts them once the database is back
+WRITE_BEHIND_DEAD_LETTER_PATH = os.getenv("WRITE_BEHIND_DEAD_LETTER_PATH", "write_behind_dead_letters.jsonl")
+# How often a producer checks for queue room while the queue is full
+WRITE_BEHIND_POLL_S = 0.005
+
+_STOP = object()
+
+
+class WriteQueueFull(Exception):
+    pass
+
+
+class WriteBehindQueue:
+    """Buffers simulation records and inserts them in batched transactions.
+
+    A background thread flushes whenever `batch_size` records are waiting
+    or the oldest waiting record is `max_delay_ms` old. Producers block
+    (up to `put_timeout`) once `max_queue` records are pending. Batches
+    that cannot be inserted are written to `dead_letter_path` rather than
+    dropped, since their clients already have their results.
+    """
+
+    def __init__(self, batch_size: int = 500, max_delay_ms: int = 50, max_queue: int = 10000,
+                 put_timeout: float = 5.0, fsync: bool = False,
+                 dead_letter_path: str = "write_behind_dead_letters.jsonl"):
+        self.batch_size = batch_size
+        self.max_delay = max_delay_ms / 1000
+        self.put_timeout = put_timeout
+        self.fsync = fsync
+        self.dead_letter_path = dead_letter_path
+        # Failed records the dead-letter file could not take either, retried on the next failure or stop
+        self._undelivered: List[Dict[str, Any]] = []
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+        self.enqueued = 0
+        self.flushed = 0
+        self.batches = 0
+        self.failed_batches = 0
+        self.dead_lettered = 0
+        self.rejected = 0
+        self.last_flush_ms = 0.0
+        self.last_failure: Optional[str] = None
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+                self._thread.start()
+
+    def try_put(self, record: Dict[str, Any]) -> bool:
+        self.start()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            return False
+        self.enqueued += 1
+        return True
+
+    def put(self, record: Dict[str, Any]):
+        self.start()
+        try:
+            self._queue.put(record, timeout=self.put_timeout)
+        except queue.Full:
+            raise self._reject()
+        self.enqueued += 1
+
+    async def put_async(self, record: Dict[str, Any]):
+        """put() for the event loop: waits for room without holding a thread"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.put_timeout
+        while not self.try_put(record):
+            if loop.time() >= deadline:
+                raise self._reject()
+            await asyncio.sleep(WRITE_BEHIND_POLL_S)
+
+    def _reject(self) -> WriteQueueFull:
+        self.rejected += 1
+        return WriteQueueFull(f"Write-behind queue is full ({self._queue.maxsize} pending simulations)")
+
+    def stop(self, timeout: Optional[float] = None):
+        """Flush everything already queued, then stop the writer thread"""
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is not None and thread.is_alive():
+            self._queue.put(_STOP)
+            thread.join(timeout)
+        if self._undelivered:
+            self._dead_letter([])
+
+    def _run(self):
+        while True:
+            record = self._queue.get()
+            if record is _STOP:
+                return
+
+            batch = [record]
+            deadline = time.monotonic() + self.max_delay
+            stopping = False
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    record = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if record is _STOP:
+                    stopping = True
+                    break
+                batch.append(record)
+
+            self._flush(batch)
+            if stopping:
+                # Drain whatever producers queued behind the stop marker
+                leftover = []
+                while True:
+                    try:
+                        leftover.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                leftover = [record for record in leftover if record is not _STOP]
+                for start in range(0, len(leftover), self.batch_size):
+                    self._flush(leftover[start:start + self.batch_size])
+                return
+
+    def _flush(self, batch: List[Dict[str, Any]]):
+        started = time.perf_counter()
+        for attempt in range(3):
+            try:
+                save_simulations(batch, durable=self.fsync)
+                break
+            except Exception as e:
+                logger.exception("Write-behind flush of %d simulations failed (attempt %d)", len(batch), attempt + 1)
+                self.last_failure = f"{type(e).__name__}: {e}"
+                time.sleep(0.1 * (attempt + 1))
+        else:
+            self.failed_batches += 1
+            self._dead_letter(batch)
+            return
+
+        self.batches += 1
+        self.flushed += len(batch)
+        self.last_flush_ms = (time.perf_counter() - started) * 1000
+
+    def _dead_letter(self, batch: List[Dict[str, Any]]):
+        records = self._undelivered + batch
+        try:
+            # One append per batch keeps lines from concurrent workers whole
+            with open(self.dead_letter_path, "a", encoding="utf-8") as f:
+                f.write("".join(dump_record(record) + "\n" for record in records))
+                f.flush()
+                os.fsync(f.fileno())
+        except OSError:
+            logger.exception("Could not write %d simulations to %s; keeping them in memory",
+                             len(records), self.dead_letter_path)
+            self._undelivered = records
+            return
+        logger.error("Wrote %d unsaved simulations to %s", len(records), self.dead_letter_path)
+        self._undelivered = []
+        self.dead_lettered += len(records)
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            'enabled': WRITE_BEHIND_ENABLED,
+            'queue_depth': self._queue.qsize(),
+            'max_queue': self._queue.maxsize,
+            'batch_size': self.batch_size,
+            'max_delay_ms': self.max_delay * 1000,
+            'fsync': self.fsync,
+            'enqueued': self.enqueued,
+            'flushed': self.flushed,
+            'batches': self.batches,
+            'failed_batches': self.failed_batches,
+            'dead_lettered': self.dead_lettered,
+            'undelivered': len(self._undelivered),
+            'dead_letter_path': self.dead_letter_path,
+            'last_failure': self.last_failure,
+            'rejected': self.rejected,
+            'last_flush_ms': self.last_flush_ms
+        }
+
+
+def dump_record(record: Dict[str, Any]) -> str:
+    return json.dumps(record, default=lambda value: value.model_dump())
+
+
+def load_record(line: str) -> Dict[str, Any]:
+    record = json.loads(line)
+    if record.get('score_probabilities') is not None:
+        record['score_probabilities'] = [ScoreProbability(**sp) for sp in record['score_probabilities']]
+    return record
+
+
+def retry_dead_letters(path: str = WRITE_BEHIND_DEAD_LETTER_PATH, batch_size: int = 500) -> int:
+    """Insert dead-lettered simulations and remove them from the file.
+
+    The file is moved aside first, so writers that fail meanwhile start a
+    new one. Batches that fail again are appended back to `path`.
+    """
+    claimed = f"{path}.{os.getpid()}.retrying"
+    try:
+        os.replace(path, claimed)
+    except FileNotFoundError:
+        return 0
+
+    with open(claimed, encoding="utf-8") as f:
+        lines = [line for line in f if line.strip()]
+    inserted = 0
+    try:
+        for start in range(0, len(lines), batch_size):
+            save_simulations([load_record(line) for line in lines[start:start + batch_size]], durable=True)
+            inserted = start + len(lines[start:start + batch_size])
+    finally:
+        if inserted < len(lines):
+            with open(path, "a", encoding="utf-8") as f:
+                f.write("".join(lines[inserted:]))
+        os.remove(claimed)
+    return inserted
+
+
+simulation_writer = WriteBehindQueue(
+    batch_size=WRITE_BEHIND_BATCH_SIZE,
+    max_delay_ms=WRITE_BEHIND_MAX_DELAY_MS,
+    max_queue=WRITE_BEHIND_QUEUE_SIZE,
+    put_timeout=WRITE_BEHIND_PUT_TIMEOUT_S,
+    fsync=WRITE_BEHIND_FSYNC,
+    dead_letter_path=WRITE_BEHIND_DEAD_LETTER_PATH
+)
+
+
+async def persist_simulations(records: List[Dict[str, Any]]):
+    """Queue records for the writer, or insert them directly when write-behind is off"""
+    if not WRITE_BEHIND_ENABLED:
+        if len(records) == 1:
+            await run_db(save_simulation, records[0])
+        else:
+            await run_db(save_simulations, records)
+        return
+
+    for record in records:
+        if not simulation_writer.try_put(record):
+            # Queue is full: wait for room on the event loop, so a slow
+            # writer does not tie up the database threads reads depend on
+            await simulation_writer.put_async(record)
@@ -0,0 +1,50 @@
+import os
+import tempfile
+
+# app.database opens simulations.db in the working directory on import, and
+# the executors and write-behind queue read their settings on import too
+os.environ.setdefault("SIMULATION_WORKERS", "0")
+os.environ.setdefault("WRITE_BEHIND_ENABLED", "false")
+os.chdir(tempfile.mkdtemp(prefix="football-sim-tests-"))
+
+import pytest
+
+from app import database
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """A fresh, initialized database for the test"""
+    monkeypatch.setattr(database, "DATABASE_PATH", str(tmp_path / "simulations.db"))
+    database.close_db_connections()
+    database._count_cache.clear()
+    database.init_db()
+    yield database
+    database.close_db_connections()
+
+
+@pytest.fixture
+def client(db):
+    from fastapi.testclient import TestClient
+
+    from app.main import app
+
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+def match_request(seed=1, **overrides):
+    request = {
+        "user_id": "tester",
+        "home_team": "Arsenal",
+        "away_team": "Barcelona",
+        "seed": seed,
+        "score_probabilities": [
+            {"home_score": 1, "away_score": 0, "probability": 0.5},
+            {"home_score": 2, "away_score": 2, "probability": 0.3},
+            {"home_score": 0, "away_score": 1, "probability": 0.2}
+        ],
+        "bet_slip": [{"market": "1X2", "outcome": "1", "stake": 10.0, "odds": 2.0}]
+    }
+    request.update(overrides)
+    return request
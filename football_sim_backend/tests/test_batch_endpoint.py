@@ -0,0 +1,55 @@
+import asyncio
+import json
+
+from app import main
+from app.models import MatchSimulationRequest
+from tests.conftest import match_request
+
+
+def _lines(response):
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def test_batch_streams_one_line_per_request_in_order(client):
+    requests = [match_request(seed) for seed in range(5)]
+    requests[2]["rng_backend"] = "nope"
+
+    lines = _lines(client.post("/api/simulate/batch", json=requests))
+
+    assert [line["index"] for line in lines] == list(range(5))
+    assert "rng_backend" in lines[2]["error"]
+    single = client.post("/api/simulate", json=requests[0]).json()
+    assert lines[0]["result"]["events"] == single["events"]
+    assert lines[0]["result"]["bet_results"] == single["bet_results"]
+    assert client.get("/api/history", params={"user_id": "tester"}).json()["pagination"]["total"] == 5
+
+
+def test_failed_chunk_reports_errors_and_stream_continues(client, monkeypatch):
+    monkeypatch.setattr(main, "BATCH_CHUNK_SIZE", 2)
+    simulate_many = main.simulate_many
+
+    def flaky(requests, rtp, fairness=None):
+        if requests[0].seed == 2:
+            raise ValueError("engine failure")
+        return simulate_many(requests, rtp, fairness)
+
+    monkeypatch.setattr(main, "simulate_many", flaky)
+
+    lines = _lines(client.post("/api/simulate/batch", json=[match_request(seed) for seed in range(6)]))
+
+    assert [line["index"] for line in lines] == list(range(6))
+    assert [line.get("error") for line in lines] == [None, None, "engine failure", "engine failure", None, None]
+
+
+def test_fair_requests_leave_the_callers_requests_untouched(db):
+    requests = [MatchSimulationRequest(**match_request(None, client_seed="player-seed")) for _ in range(3)]
+
+    async def run():
+        response = await main.simulate_match_batch(requests)
+        return [json.loads(line) async for line in response.body_iterator]
+
+    lines = asyncio.run(run())
+
+    assert all(request.seed is None and request.rng_backend is None for request in requests)
+    nonces = [line["result"]["simulation_metadata"]["fairness"]["nonce"] for line in lines]
+    assert nonces == sorted(set(nonces))
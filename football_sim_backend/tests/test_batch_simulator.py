@@ -0,0 +1,94 @@
+import random
+
+import numpy as np
+import pytest
+
+from app.batch_simulator import BatchMatchSimulator, MT19937Streams, first_draws
+from app.determinism import DEFAULT_SCORE_PROBABILITIES
+from app.match_simulator import TIMELINES, FootballMatchSimulator
+from app.rng_engine import RNG_BACKENDS, FootballRNG
+
+SEEDS = [0, 1, 42, 2 ** 32 - 1, 2 ** 32, 2 ** 63 - 1, 2 ** 64 + 12345, -7, 3 ** 80]
+
+
+def test_streams_match_random_random():
+    streams = MT19937Streams(SEEDS)
+    expected = [random.Random(seed) for seed in SEEDS]
+    rows = np.arange(len(SEEDS))
+
+    # Enough draws to cross several state refills
+    for _ in range(800):
+        values = streams.random(rows)
+        assert values.tolist() == [rng.random() for rng in expected]
+
+
+def test_streams_advance_independently():
+    streams = MT19937Streams(SEEDS)
+    expected = [random.Random(seed) for seed in SEEDS]
+
+    for step in range(700):
+        # Only some rows draw on each step, so the streams drift apart
+        rows = np.array([i for i in range(len(SEEDS)) if (step + i) % 3])
+        assert streams.random(rows).tolist() == [expected[i].random() for i in rows]
+
+
+def test_very_long_seed_key_falls_back_to_cpython_seeding():
+    seed = 7 ** 20000  # more than 624 32-bit words
+    assert MT19937Streams([seed]).random(np.array([0])).tolist() == [random.Random(seed).random()]
+
+
+@pytest.mark.parametrize("n", [1, 2, 3, 7, 85, 1000, 2 ** 20 + 1])
+def test_randbelow_matches_random_random(n):
+    streams = MT19937Streams(SEEDS)
+    expected = [random.Random(seed) for seed in SEEDS]
+    rows = np.arange(len(SEEDS))
+
+    for _ in range(200):
+        assert streams.randbelow(rows, n).tolist() == [rng._randbelow(n) for rng in expected]
+
+
+def test_batch_matches_scalar_simulator():
+    seeds = list(range(200))
+    batch = BatchMatchSimulator(chunk_size=64).simulate(
+        score_probabilities=DEFAULT_SCORE_PROBABILITIES, seeds=seeds, home_teams="Arsenal", away_teams="Barcelona"
+    )
+
+    assert len(batch) == len(seeds)
+    for i, seed in enumerate(seeds):
+        simulator = FootballMatchSimulator("Arsenal", "Barcelona", DEFAULT_SCORE_PROBABILITIES, seed=seed)
+        events, stats = simulator.simulate_match()
+        assert batch.final_score(i) == {"Arsenal": simulator.home_score, "Barcelona": simulator.away_score}
+        assert batch.events(i) == events
+        assert batch.match_stats(i) == stats
+        assert batch.total_events[i] == len(events)
+
+
+@pytest.mark.parametrize("timeline", TIMELINES)
+def test_shots_on_target_never_exceed_shots(timeline):
+    seeds = list(range(2000))
+    batch = BatchMatchSimulator().simulate(
+        score_probabilities=DEFAULT_SCORE_PROBABILITIES, seeds=seeds, home_teams="Arsenal", away_teams="Barcelona",
+        timeline=timeline
+    )
+
+    for i, seed in enumerate(seeds):
+        simulator = FootballMatchSimulator("Arsenal", "Barcelona", DEFAULT_SCORE_PROBABILITIES, seed=seed,
+                                           timeline=timeline)
+        _, scalar_stats = simulator.simulate_match()
+        for stats in (scalar_stats, batch.match_stats(i)):
+            for team in ("Arsenal", "Barcelona"):
+                assert stats["shots_on_target"][team] <= stats["shots"][team], (seed, team)
+
+
+def test_per_match_inputs_must_line_up():
+    with pytest.raises(ValueError):
+        BatchMatchSimulator().simulate(
+            score_probabilities=DEFAULT_SCORE_PROBABILITIES, seeds=[1, 2, 3], home_teams=["A", "B"]
+        )
+
+
+@pytest.mark.parametrize("backend", RNG_BACKENDS)
+def test_first_draws_match_the_scalar_rng(backend):
+    seeds = [abs(seed) for seed in SEEDS] + list(range(100))
+
+    assert first_draws(backend, seeds).tolist() == [FootballRNG(seed, backend).next_random() for seed in seeds]
@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+from app import certification, simulation_service
+from app.batch_simulator import BatchMatchSimulator
+from app.betting_logic import BettingEngine, compile_outcome
+from app.determinism import DEFAULT_SCORE_PROBABILITIES
+from app.match_simulator import SIMULATOR_SETTINGS
+from app.models import MarketType, MatchSimulationRequest
+from app.rng_engine import RNG_BACKENDS
+
+
+def _reference_unit(unit, seed_sequence, rtp):
+    # One adjust_probabilities call per match, as /api/simulate does
+    market, outcome, volatility, matches = unit
+    engine = BettingEngine(rtp=rtp)
+    bet = certification._bet(engine, market, outcome)
+    request = MatchSimulationRequest(
+        user_id="certification", home_team="Home", away_team="Away",
+        score_probabilities=DEFAULT_SCORE_PROBABILITIES, bet_slip=[bet], volatility=volatility
+    )
+    seeds = seed_sequence.generate_state(matches, np.uint64).tolist()
+    batch = BatchMatchSimulator().simulate(
+        score_probabilities=[simulation_service.adjust_probabilities(request, engine, seed) for seed in seeds],
+        seeds=seeds, volatility=volatility, home_teams="Home", away_teams="Away",
+        rng_backend=simulation_service.resolve_rng_backend(request), **SIMULATOR_SETTINGS
+    )
+    wins = int(np.count_nonzero(compile_outcome(market, outcome)(batch.home_score, batch.away_score)))
+    return (market, volatility), matches, bet.odds * wins, bet.odds ** 2 * wins
+
+
+@pytest.mark.parametrize("backend", RNG_BACKENDS)
+@pytest.mark.parametrize("unit", [
+    (MarketType.MATCH_RESULT_1X2, "1", "medium", 300),
+    (MarketType.OVER_UNDER, "under_2.5", "high", 300),
+    (MarketType.CORRECT_SCORE, "2-1", "low", 300),
+])
+def test_unit_matches_per_match_probability_adjustment(monkeypatch, backend, unit):
+    monkeypatch.setattr(simulation_service, "RNG_BACKEND", backend)
+
+    expected = _reference_unit(unit, np.random.SeedSequence(9), 0.96)
+
+    assert certification._run_unit(unit, np.random.SeedSequence(9), DEFAULT_SCORE_PROBABILITIES, 0.96) == expected
+
+
+def test_certification_is_reproducible_from_its_seed():
+    first = certification.certify_rtp(2000, 0.96, workers=0, seed=3)
+    second = certification.certify_rtp(2000, 0.96, workers=0, seed=3)
+
+    assert first == second
+    assert first["matches"] == sum(row["matches"] for row in first["results"])
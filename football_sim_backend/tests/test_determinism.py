@@ -0,0 +1,42 @@
+import pytest
+
+from app import determinism
+from app.batch_simulator import BatchMatchSimulator
+from app.determinism import check_determinism
+from app.match_simulator import GOAL_SCHEDULES, SIMULATOR_DEFAULTS, SIMULATOR_SETTINGS, TIMELINES
+from app.rng_engine import RNG_BACKENDS
+
+
+@pytest.mark.parametrize("timeline", TIMELINES)
+@pytest.mark.parametrize("goal_schedule", GOAL_SCHEDULES)
+@pytest.mark.parametrize("rng_backend", RNG_BACKENDS)
+def test_seeds_replay_identically(rng_backend, goal_schedule, timeline):
+    # Scalar, scalar on threads after reseeding `random`, and batch engine
+    result = check_determinism(range(1000), rng_backend=rng_backend, goal_schedule=goal_schedule,
+                               timeline=timeline)
+    assert result['mismatches'] == []
+    assert result['checked'] == 1000
+
+
+@pytest.mark.parametrize("engine", [SIMULATOR_DEFAULTS, SIMULATOR_SETTINGS], ids=["stored", "new"])
+def test_default_engines_replay_identically(engine):
+    result = check_determinism(range(1000, 6000), **engine)
+    assert result['mismatches'] == []
+
+
+@pytest.mark.parametrize("event_rate", [0.02, 1.0])
+def test_event_rate_extremes_replay_identically(event_rate):
+    result = check_determinism(range(500), timeline="events", goal_schedule="floyd", event_rate=event_rate)
+    assert result['mismatches'] == []
+
+
+def test_mismatches_are_reported(monkeypatch):
+    class ShiftedBatch(BatchMatchSimulator):
+        def simulate(self, seeds, **kwargs):
+            return super().simulate(seeds=[seed + 1 for seed in seeds], **kwargs)
+
+    monkeypatch.setattr(determinism, "BatchMatchSimulator", ShiftedBatch)
+    result = check_determinism(range(20))
+
+    assert result['mismatched'] == 20
+    assert all(mismatch['failed'] == ["batch"] for mismatch in result['mismatches'])
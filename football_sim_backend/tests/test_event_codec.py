@@ -0,0 +1,73 @@
+import pytest
+
+from app import database
+from app.determinism import DEFAULT_SCORE_PROBABILITIES
+from app.event_codec import FORMAT_VERSION, decode_events, encode_events, replace_players
+from app.match_simulator import FootballMatchSimulator, TIMELINES
+from app.models import MatchSimulationRequest
+from app.simulation_service import simulate_single
+from tests.conftest import match_request
+
+
+def _timeline(seed, home="Arsenal", away="Barcelona", timeline="minute_walk"):
+    simulator = FootballMatchSimulator(home, away, DEFAULT_SCORE_PROBABILITIES, seed=seed, timeline=timeline)
+    events, _ = simulator.simulate_match()
+    return [event.model_dump(mode="json") for event in events]
+
+
+@pytest.mark.parametrize("timeline", TIMELINES)
+@pytest.mark.parametrize("home, away", [("Arsenal", "Barcelona"), ("Derby", "Derby")])
+def test_simulated_timelines_round_trip(timeline, home, away):
+    for seed in range(200):
+        events = _timeline(seed, home, away, timeline)
+        blob = encode_events(home, away, events)
+        assert blob is not None
+        assert len(blob) == 3 + 2 * len(events)
+        assert decode_events(home, away, blob) == events
+
+
+@pytest.mark.parametrize("edit", [
+    lambda event: event.update(description="Hand-edited"),
+    lambda event: event.update(player="Player 16"),
+    lambda event: event.update(minute=200),
+    lambda event: event.pop("event_type"),
+])
+def test_timelines_that_do_not_round_trip_are_not_encoded(edit):
+    events = _timeline(3)
+    edit(events[len(events) // 2])
+    assert encode_events("Arsenal", "Barcelona", events) is None
+
+
+def test_unknown_format_version_is_rejected():
+    blob = encode_events("Arsenal", "Barcelona", _timeline(1))
+    with pytest.raises(ValueError):
+        decode_events("Arsenal", "Barcelona", bytes([FORMAT_VERSION + 1]) + blob[1:])
+
+
+def test_replace_players_swaps_named_players_only():
+    events = _timeline(5)
+    blob = encode_events("Arsenal", "Barcelona", events)
+    named = [event for event in events if event['player']]
+
+    decoded = decode_events("Arsenal", "Barcelona", replace_players(blob, [1] * len(named)))
+
+    assert [event['player'] for event in decoded if event['player']] == [
+        f"{event['player'].rsplit(' ', 1)[0]} 1" for event in named
+    ]
+    with pytest.raises(ValueError):
+        replace_players(blob, [1])
+
+
+def test_compact_events_rewrites_json_rows(db, monkeypatch):
+    monkeypatch.setattr(database, "EVENT_ENCODING", "json")
+    for seed in range(5):
+        db.save_simulation(simulate_single(MatchSimulationRequest(**match_request(seed)), 0.96)[1])
+    before = db.get_simulations(limit=10)
+
+    assert db.compact_events(dry_run=True)['rows_compacted'] == 5
+    result = db.compact_events()
+
+    assert result['rows_compacted'] == 5
+    assert result['binary_bytes'] < result['json_bytes']
+    assert db.compact_events()['rows_scanned'] == 0
+    assert db.get_simulations(limit=10) == before
@@ -0,0 +1,69 @@
+import hashlib
+import hmac
+
+import pytest
+
+from app.fairness import fair_draw, fair_seed, server_seed_hash
+from app.rng_engine import HashRandom
+from tests.conftest import match_request
+
+
+def test_fair_seed_is_the_documented_hmac():
+    digest = hmac.new(b"server", b"client:7", hashlib.sha256).digest()
+    assert fair_seed("server", "client", 7) == int.from_bytes(digest[:8], "big") >> 11
+
+
+def test_hash_stream_matches_its_published_construction():
+    stream = HashRandom(12345, stream=2)
+    draws = [stream.random() for _ in range(10)]
+
+    digest = hashlib.sha256(b"12345:2:1").digest()
+    assert draws[5] == (int.from_bytes(digest[8:16], "big") >> 11) / 2 ** 53
+    assert [HashRandom(12345, stream=2).value(index) for index in range(10)] == draws
+
+
+def test_fair_draw_recomputes_any_draw_in_place():
+    stream = HashRandom(fair_seed("server", "client", 3))
+    draws = [stream.random() for _ in range(50)]
+    assert [fair_draw("server", "client", 3, index) for index in (0, 17, 49)] == [draws[0], draws[17], draws[49]]
+
+
+def test_fair_simulations_verify_after_the_seed_is_revealed(client, db):
+    commitment = client.get("/api/fairness").json()
+    assert "server_seed" not in commitment
+
+    results = [client.post("/api/simulate", json=match_request(None, client_seed="lucky")).json() for _ in range(3)]
+    fairness = [result['simulation_metadata']['fairness'] for result in results]
+    assert [record['nonce'] for record in fairness] == [0, 1, 2]
+    assert {record['server_seed_hash'] for record in fairness} == {commitment['server_seed_hash']}
+    assert "server_seed" not in client.get(f"/api/fairness/seeds/{commitment['id']}").json()
+
+    rotated = client.post("/api/fairness/rotate").json()
+    [revealed] = rotated['revealed']
+    assert server_seed_hash(revealed['server_seed']) == commitment['server_seed_hash']
+    assert rotated['active']['id'] != commitment['id']
+
+    for result, record in zip(results, fairness):
+        check = client.post("/api/fairness/verify", json={
+            "server_seed": revealed['server_seed'], "client_seed": "lucky", "nonce": record['nonce']
+        }).json()
+        assert check['seed'] == result['simulation_metadata']['seed']
+        replay = client.post("/api/simulate", json=match_request(check['seed'], rng_backend=check['rng_backend']))
+        assert replay.json()['events'] == result['events']
+
+    assert db.verify_fairness()['mismatched'] == 0
+
+
+def test_nonces_restart_under_a_new_server_seed(db):
+    first_seed, first_nonce = db.reserve_fair_nonces("player", 5)
+    db.rotate_server_seed()
+    second_seed, second_nonce = db.reserve_fair_nonces("player")
+
+    assert (first_nonce, second_nonce) == (0, 0)
+    assert first_seed['id'] != second_seed['id']
+
+
+@pytest.mark.parametrize("overrides", [{"seed": 5}, {"rng_backend": "mt19937"}])
+def test_client_seed_cannot_be_combined_with_other_seeding(client, overrides):
+    request = {**match_request(None, client_seed="lucky"), **overrides}
+    assert client.post("/api/simulate", json=request).status_code == 422
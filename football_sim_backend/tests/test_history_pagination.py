@@ -0,0 +1,67 @@
+from app import database
+from app.distribution_cache import LRUCache
+from tests.conftest import match_request
+
+
+def _simulate(client, seeds, **overrides):
+    for seed in seeds:
+        assert client.post("/api/simulate", json=match_request(seed, **overrides)).status_code == 200
+
+
+def _page(client, **params):
+    response = client.get("/api/history", params=params)
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_cursor_pages_cover_history_once_newest_first(client):
+    _simulate(client, range(23))
+
+    ids = []
+    page = _page(client, limit=10)
+    while True:
+        ids.extend(simulation['id'] for simulation in page['simulations'])
+        if not page['pagination']['has_more']:
+            break
+        page = _page(client, limit=10, cursor=page['pagination']['next_cursor'])
+
+    assert len(ids) == 23
+    assert ids == sorted(ids, reverse=True)
+
+
+def test_new_simulations_do_not_shift_later_pages(client):
+    _simulate(client, range(6))
+    first = _page(client, limit=3)
+    _simulate(client, range(100, 104))
+
+    second = _page(client, limit=3, cursor=first['pagination']['next_cursor'])
+
+    assert [s['id'] for s in second['simulations']] == [s['id'] - 3 for s in first['simulations']]
+
+
+def test_invalid_cursor_is_rejected(client):
+    assert client.get("/api/history", params={"cursor": "not-a-cursor"}).status_code == 400
+
+
+def test_total_modes(client):
+    _simulate(client, range(4))
+    _simulate(client, range(3), user_id="other")
+
+    assert _page(client, total="exact", user_id="other")['pagination']['total'] == 3
+    assert _page(client, total="approximate")['pagination']['total'] == 7
+    assert _page(client, total="approximate", user_id="other")['pagination']['total'] == 3
+    assert _page(client, total="none")['pagination']['total'] is None
+
+
+def test_only_approximate_counts_are_cached_and_the_cache_is_bounded(db, monkeypatch):
+    cache = LRUCache("history_counts", 2, ttl=60)
+    monkeypatch.setattr(database, "_count_cache", cache)
+
+    for user_id in ("a", "b", "c", "d"):
+        db.get_count(user_id=user_id)
+    assert cache.metrics()['size'] == 0
+
+    for user_id in ("a", "b", "c", "d", "d"):
+        db.get_count(user_id=user_id, approximate=True)
+    metrics = cache.metrics()
+    assert (metrics['size'], metrics['evictions'], metrics['hits']) == (2, 2, 1)
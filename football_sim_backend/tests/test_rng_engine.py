@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+
+from app.fairness import fair_seed
+from app.rng_engine import GeneratorRandom, HashRandom, UniformStream, hash_seed, new_seed
+from tests.conftest import match_request
+
+# Largest integer a JavaScript number holds exactly
+MAX_SAFE_INTEGER = 2 ** 53 - 1
+
+
+class Constant(UniformStream):
+    def __init__(self, value):
+        self.value = value
+
+    def random(self):
+        return self.value
+
+    def random_array(self, n):
+        return np.full(n, self.value)
+
+
+def test_stream_without_draws_cannot_be_instantiated():
+    class Incomplete(UniformStream):
+        def random(self):
+            return 0.5
+
+    with pytest.raises(TypeError, match="random_array"):
+        Incomplete()
+
+
+def test_derived_draws_consume_one_double_each():
+    stream = Constant(0.75)
+
+    assert stream.randbelow(10) == 7
+    assert stream.randint(1, 4) == 4
+    assert stream.choice("abcd") == "d"
+
+
+@pytest.mark.parametrize("stream", [
+    lambda: GeneratorRandom("pcg64", np.random.SeedSequence(42)),
+    lambda: HashRandom(42),
+], ids=["generator", "hash"])
+def test_random_array_continues_the_scalar_stream(stream):
+    scalar, bulk = stream(), stream()
+
+    expected = [scalar.random() for _ in range(600)]
+
+    assert list(bulk.random_array(300)) + [bulk.random() for _ in range(300)] == expected
+
+
+def test_generated_seeds_survive_a_javascript_number():
+    seeds = [new_seed() for _ in range(1000)] + [hash_seed(str(i)) for i in range(1000)]
+    seeds += [fair_seed("server", "client", nonce) for nonce in range(1000)]
+
+    assert max(seeds) <= MAX_SAFE_INTEGER
+    assert max(seeds) > 2 ** 50
+
+
+def test_unseeded_simulation_returns_an_exact_json_seed(client):
+    first = client.post("/api/simulate", json=match_request(None)).json()
+    # What a JavaScript client holds after JSON.parse
+    seed = int(float(first["simulation_metadata"]["seed"]))
+
+    replayed = client.post("/api/simulate", json=match_request(seed)).json()
+
+    assert replayed["simulation_metadata"]["seed"] == first["simulation_metadata"]["seed"]
+    assert replayed["events"] == first["events"]
+    assert replayed["bet_results"] == first["bet_results"]
@@ -0,0 +1,79 @@
+import pytest
+
+from app.models import MatchSimulationRequest
+from app.simulation_service import simulate_single
+from tests.conftest import match_request
+
+
+def _save(db, seed, user_id="tester", staked=True, rtp=0.96):
+    bet = {"market": "1X2", "outcome": "1"}
+    if staked:
+        bet.update(stake=5.0 + seed, odds=1.5 + seed / 10)
+    request = MatchSimulationRequest(**match_request(seed, user_id=user_id, bet_slip=[bet]))
+    record = simulate_single(request, rtp)[1]
+    db.save_simulation(record)
+    return record
+
+
+def _expected(records):
+    staked = [record for record in records if record['total_stake'] is not None]
+    return {
+        'total_simulations': len(staked),
+        'won_slips': sum(record['bet_slip_won'] for record in staked),
+        'total_staked': pytest.approx(sum(record['total_stake'] for record in staked)),
+        'total_paid_out': pytest.approx(sum(record['total_payout'] for record in staked)),
+        'avg_configured_rtp': pytest.approx(sum(record['configured_rtp'] for record in staked) / len(staked)),
+    }
+
+
+def _subset(stats):
+    return {key: stats[key] for key in ('total_simulations', 'won_slips', 'total_staked', 'total_paid_out',
+                                        'avg_configured_rtp')}
+
+
+def test_empty_database_has_zero_rollups(db):
+    stats = db.get_simulation_stats()
+    assert stats['total_simulations'] == 0
+    assert stats['won_slips'] == stats['lost_slips'] == 0
+    assert db.get_all_players() == []
+
+
+def test_insert_trigger_keeps_rollups_current(db):
+    records = [_save(db, seed, user_id=f"player-{seed % 3}", rtp=0.9 + seed / 100) for seed in range(12)]
+    records.append(_save(db, 99, user_id="player-0", staked=False))
+
+    assert _subset(db.get_simulation_stats()) == _expected(records)
+    for user_id in ("player-0", "player-1", "player-2"):
+        player_records = [record for record in records if record['user_id'] == user_id]
+        assert _subset(db.get_player_stats(user_id)) == _expected(player_records)
+    assert {player['user_id'] for player in db.get_all_players()} == {"player-0", "player-1", "player-2"}
+
+
+def test_batched_inserts_update_rollups(db):
+    records = [simulate_single(MatchSimulationRequest(**match_request(seed)), 0.96)[1] for seed in range(20)]
+    db.save_simulations(records)
+
+    assert _subset(db.get_simulation_stats()) == _expected(records)
+
+
+def test_rebuild_matches_incremental_rollups(db):
+    for seed in range(10):
+        _save(db, seed, user_id=f"player-{seed % 2}")
+    incremental = (db.get_simulation_stats(), db.get_player_stats("player-0"), db.get_player_stats("player-1"))
+
+    assert db.rebuild_rollups() == 2
+    assert (db.get_simulation_stats(), db.get_player_stats("player-0"), db.get_player_stats("player-1")) == incremental
+
+
+def test_rollups_are_backfilled_when_first_created(db):
+    records = [_save(db, seed) for seed in range(5)]
+    with db.get_db() as conn:
+        conn.execute("DROP TRIGGER trg_simulations_rollup")
+        conn.execute("DROP TABLE player_rollups")
+        conn.execute("DROP TABLE global_rollup")
+        conn.commit()
+
+    db.init_db()
+
+    assert _subset(db.get_simulation_stats()) == _expected(records)
+    assert _subset(db.get_player_stats("tester")) == _expected(records)
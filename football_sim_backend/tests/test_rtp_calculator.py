@@ -0,0 +1,23 @@
+import itertools
+
+from app import simulation_service
+from app.models import MatchSimulationRequest
+from app.rtp_calculator import calculate_expected_return
+from tests.conftest import match_request
+
+
+def test_default_prices_unseeded_simulations(monkeypatch):
+    # Fresh seeds from a counter keep the sample reproducible
+    monkeypatch.setattr(simulation_service, "new_seed", itertools.count(1).__next__)
+    request = MatchSimulationRequest(**match_request(None))
+    matches = 4000
+
+    won = sum(simulation_service.simulate_single(request, 0.96)[1]['bet_slip_won'] for _ in range(matches))
+
+    expected = calculate_expected_return(request.score_probabilities, request.bet_slip, 0.96, request.volatility)
+    independent = calculate_expected_return(request.score_probabilities, request.bet_slip, 0.96, request.volatility,
+                                            shared_seed=False)
+    p = expected['bet_slip_win_probability']
+    margin = 4 * (p * (1 - p) / matches) ** 0.5
+    assert abs(won / matches - p) < margin
+    assert abs(won / matches - independent['bet_slip_win_probability']) > margin
@@ -0,0 +1,25 @@
+import itertools
+
+import pytest
+
+from app import rng_engine, simulation_service
+from app.models import MatchSimulationRequest
+from tests.conftest import match_request
+
+
+@pytest.mark.parametrize("simulate", [
+    lambda request: simulation_service.simulate_single(request, 0.96)[1],
+    lambda request: simulation_service.simulate_many([request], 0.96)[0][1],
+], ids=["single", "batch"])
+def test_unseeded_simulations_gate_and_play_from_one_seed(monkeypatch, simulate):
+    # Every fresh seed differs, so a second draw would show up as a mismatch
+    fresh = itertools.count(1000).__next__
+    monkeypatch.setattr(rng_engine, "new_seed", fresh)
+    monkeypatch.setattr(simulation_service, "new_seed", fresh)
+
+    for _ in range(50):
+        unseeded = simulate(MatchSimulationRequest(**match_request(None)))
+        seeded = simulate(MatchSimulationRequest(**match_request(unseeded['seed'])))
+
+        for key in ("score_probabilities", "home_score", "away_score", "events", "bet_results"):
+            assert unseeded[key] == seeded[key], key
@@ -0,0 +1,74 @@
+import asyncio
+import json
+
+from app import main
+from app.models import MatchSimulationRequest
+from tests.conftest import match_request
+
+
+def _messages(text):
+    messages = []
+    for block in text.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines())
+        messages.append((fields["event"], fields["data"]))
+    return messages
+
+
+def _history_total(client):
+    return client.get("/api/history", params={"user_id": "tester"}).json()["pagination"]["total"]
+
+
+def test_stream_matches_simulate(client):
+    single = client.post("/api/simulate", json=match_request(7)).json()
+
+    messages = _messages(client.post("/api/simulate/stream", json=match_request(7)).text)
+
+    assert [kind for kind, _ in messages] == ["event"] * len(single["events"]) + ["result"]
+    assert [json.loads(data) for _, data in messages[:-1]] == single["events"]
+    result = json.loads(messages[-1][1])
+    assert "events" not in result
+    assert result["bet_results"] == single["bet_results"]
+    assert result["match_stats"] == single["match_stats"]
+    assert _history_total(client) == 2
+
+
+def test_simulation_runs_off_the_event_loop(client, monkeypatch):
+    calls = []
+    run_simulation = main.run_simulation
+
+    async def tracking(fn, *args):
+        calls.append(fn)
+        return await run_simulation(fn, *args)
+
+    monkeypatch.setattr(main, "run_simulation", tracking)
+
+    client.post("/api/simulate/stream", json=match_request(3))
+
+    assert calls == [main.simulate_single]
+
+
+def test_disconnect_still_stores_the_simulation_once(db):
+    request = MatchSimulationRequest(**match_request(11))
+
+    async def run():
+        response = await main.simulate_match_stream(request, seconds_per_minute=main.MAX_SECONDS_PER_MINUTE)
+        stream = response.body_iterator
+        await stream.__anext__()
+        await stream.aclose()
+
+    asyncio.run(run())
+
+    assert db.get_count(user_id="tester") == 1
+
+
+def test_failed_simulation_is_an_http_error_and_is_not_stored(client, monkeypatch):
+    def broken(request, rtp, fairness=None):
+        raise ValueError("bad probabilities")
+
+    monkeypatch.setattr(main, "simulate_single", broken)
+
+    response = client.post("/api/simulate/stream", json=match_request(5))
+
+    assert response.status_code == 422
+    assert response.json()["detail"] == "bad probabilities"
+    assert _history_total(client) == 0
@@ -0,0 +1,97 @@
+import sqlite3
+
+import pytest
+
+from app.database import normalize_team_name
+from tests.conftest import match_request
+
+FIXTURES = [
+    ("Arsenal", "Barcelona"),
+    ("Arsenal Women", "Chelsea"),
+    ("ÉTOILE Rouge", "Zürich"),
+    ("Ｆｕｌｌｗｉｄｔｈ FC", "Barcelona"),
+]
+
+
+@pytest.fixture
+def teams(client):
+    for seed, (home, away) in enumerate(FIXTURES):
+        response = client.post("/api/simulate", json=match_request(seed, home_team=home, away_team=away))
+        assert response.status_code == 200
+    return client
+
+
+def _count(client, team, team_match=None):
+    params = {"team": team}
+    if team_match:
+        params["team_match"] = team_match
+    response = client.get("/api/history", params=params)
+    assert response.status_code == 200
+    return response.json()['pagination']['total']
+
+
+def test_substring_matching_is_the_default(teams):
+    assert _count(teams, "senal") == 2
+    assert _count(teams, "women") == 1
+    assert _count(teams, "ZÜ") == 1
+
+
+@pytest.mark.parametrize("term, team_match, expected", [
+    ("rouge", "substring", 1),
+    ("ürich", "substring", 1),
+    ("dth f", "substring", 1),
+    ('a"b', "substring", 0),
+    ("senal", "prefix", 0),
+    ("arsenal", "exact", 1),
+    ("  ARSENAL ", "exact", 1),
+    ("étoile rouge", "exact", 1),
+    ("Étoile", "prefix", 1),
+    ("ZÜRICH", "exact", 1),
+    ("fullwidth", "prefix", 1),
+    ("barcelona", "exact", 2),
+    ("senal", "fuzzy", 2),
+    ("Barcelnoa", "fuzzy", 2),
+    ("nobody", "prefix", 0),
+])
+def test_team_match_modes(teams, term, team_match, expected):
+    assert _count(teams, term, team_match) == expected
+
+
+def test_unknown_team_match_is_rejected(client):
+    assert client.get("/api/history", params={"team": "x", "team_match": "regex"}).status_code == 422
+
+
+def test_rows_written_without_the_app_are_indexed(teams, db):
+    # A plain connection, as the sqlite3 CLI or another tool would open
+    with sqlite3.connect(db.DATABASE_PATH) as conn:
+        conn.execute("""
+            INSERT INTO simulations (user_id, home_team, away_team, home_score, away_score, bet_slip_won,
+                configured_rtp, volatility, total_events, number_of_bets, bet_results, events, match_stats)
+            VALUES ('tool', 'Étoile Rouge', 'Real Zürich', 0, 0, 0, 0.96, 'medium', 0, 0, '[]', '[]', '{}')
+        """)
+
+    assert _count(teams, "real z") == 1
+
+    db.init_db()
+
+    assert _count(teams, "étoile rouge", "exact") == 2
+    assert _count(teams, "ZÜRICH") == 2
+
+
+def test_stale_ascii_normalization_is_repaired_on_startup(teams, db):
+    with db.get_db() as conn:
+        conn.execute("UPDATE teams SET name_norm = lower(trim(name))")
+        conn.commit()
+
+    db.init_db()
+
+    assert _count(teams, "étoile rouge", "exact") == 1
+
+
+def test_fuzzy_matches_are_not_bound_by_the_variable_limit(db):
+    with db.get_db() as conn:
+        conn.executemany("INSERT INTO teams (name, name_norm) VALUES (?, ?)",
+                         [(f"Club {i}", f"club {i}") for i in range(40000)])
+        conn.commit()
+
+    assert db.get_count(team="club", team_match="fuzzy") == 0
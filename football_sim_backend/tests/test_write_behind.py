@@ -0,0 +1,88 @@
+import asyncio
+import time
+
+import pytest
+
+from app import write_behind
+from app.models import MatchSimulationRequest
+from app.simulation_service import simulate_single
+from app.write_behind import WriteBehindQueue, WriteQueueFull, retry_dead_letters
+from tests.conftest import match_request
+
+
+def _records(count):
+    return [simulate_single(MatchSimulationRequest(**match_request(seed)), 0.96)[1] for seed in range(count)]
+
+
+def _saved(db):
+    return db.get_count(user_id="tester")
+
+
+def test_queued_records_are_flushed_in_batches(db):
+    writer = WriteBehindQueue(batch_size=4, max_delay_ms=5)
+    for record in _records(10):
+        writer.put(record)
+    writer.stop(timeout=5)
+
+    assert _saved(db) == 10
+    assert writer.metrics()['flushed'] == 10
+    assert writer.metrics()['batches'] >= 3
+
+
+def test_failed_batches_are_dead_lettered_and_retried(db, tmp_path, monkeypatch):
+    path = tmp_path / "dead_letters.jsonl"
+    writer = WriteBehindQueue(batch_size=10, max_delay_ms=5, dead_letter_path=str(path))
+
+    def unavailable(batch, durable=False):
+        raise RuntimeError("database unavailable")
+
+    monkeypatch.setattr(write_behind, "save_simulations", unavailable)
+    for record in _records(3):
+        writer.put(record)
+    writer.stop(timeout=5)
+    monkeypatch.undo()
+
+    metrics = writer.metrics()
+    assert metrics['dead_lettered'] == 3
+    assert metrics['last_failure'] == "RuntimeError: database unavailable"
+    assert _saved(db) == 0
+
+    assert retry_dead_letters(str(path)) == 3
+    assert _saved(db) == 3
+    assert not path.exists()
+
+
+def test_records_are_kept_in_memory_when_the_dead_letter_file_is_unwritable(db, tmp_path, monkeypatch):
+    writer = WriteBehindQueue(batch_size=10, max_delay_ms=5, dead_letter_path=str(tmp_path / "missing" / "dl.jsonl"))
+    monkeypatch.setattr(write_behind, "save_simulations", lambda batch, durable=False: 1 / 0)
+
+    for record in _records(2):
+        writer.put(record)
+    writer.stop(timeout=5)
+
+    assert writer.metrics()['undelivered'] == 2
+    assert writer.metrics()['dead_lettered'] == 0
+
+
+def test_replay_storage_records_survive_the_dead_letter_round_trip(db, tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "SIMULATION_STORAGE", "replay")
+    path = tmp_path / "dead_letters.jsonl"
+    record = _records(1)[0]
+    path.write_text(write_behind.dump_record(record) + "\n")
+
+    assert retry_dead_letters(str(path)) == 1
+    [stored] = db.get_simulations(user_id="tester")
+    assert stored['events'] == record['events']
+
+
+def test_full_queue_waits_on_the_event_loop_then_rejects(monkeypatch):
+    writer = WriteBehindQueue(max_queue=1, put_timeout=0.1)
+    monkeypatch.setattr(writer, "start", lambda: None)
+    writer.try_put({})
+
+    started = time.monotonic()
+    with pytest.raises(WriteQueueFull):
+        asyncio.run(writer.put_async({}))
+
+    assert time.monotonic() - started >= 0.1
+    assert writer.metrics()['rejected'] == 1